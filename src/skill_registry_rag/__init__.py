@@ -3,12 +3,13 @@
 from .backends import RetrievalBackend
 from .backends.memory import InMemoryBackend
 from .models import ExpertCard, RetrievalHit, ToolCard
-from .registry import load_registry
+from .registry import RegistryLoader, load_registry
 from .retriever import SkillRetriever
 
 __all__ = [
     "ExpertCard",
     "InMemoryBackend",
+    "RegistryLoader",
     "RetrievalBackend",
     "RetrievalHit",
     "SkillRetriever",
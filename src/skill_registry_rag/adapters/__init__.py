@@ -1,4 +1,11 @@
-from .claude import render_claude_context
-from .codex import render_codex_context
+from .claude import render_claude_card, render_claude_context
+from .codex import render_codex_card, render_codex_context
+from .renderer import ContextRenderer
 
-__all__ = ["render_codex_context", "render_claude_context"]
+__all__ = [
+    "ContextRenderer",
+    "render_claude_card",
+    "render_claude_context",
+    "render_codex_card",
+    "render_codex_context",
+]
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from ..models import RetrievalHit
+from collections.abc import Iterable, Iterator
+
+from ..models import RetrievalHit, ToolCard
 
 
 def _trim(text: str, n: int) -> str:
@@ -10,31 +12,46 @@ def _trim(text: str, n: int) -> str:
     return txt[:n].rstrip() + " ..."
 
 
+def render_claude_card(card: ToolCard, *, instruction_chars: int = 700) -> tuple[str, str]:
+    """Return the static text of a card block before and after its score line."""
+    c = card
+    head: list[str] = []
+    head.append("  <card>")
+    head.append(f"    <id>{c.id}</id>")
+    head.append(f"    <title>{c.title}</title>")
+    head.append(f"    <domain>{c.domain}</domain>")
+
+    tail: list[str] = []
+    tail.append(f"    <description>{_trim(c.description, 260)}</description>")
+    if c.tags:
+        tail.append(f"    <tags>{', '.join(c.tags[:12])}</tags>")
+    if c.tool_hints:
+        tail.append(f"    <tool_hints>{', '.join(c.tool_hints[:8])}</tool_hints>")
+    if c.dependencies:
+        tail.append(f"    <dependencies>{', '.join(c.dependencies[:8])}</dependencies>")
+    if c.risk_level:
+        tail.append(f"    <risk_level>{c.risk_level}</risk_level>")
+    if c.output_artifacts:
+        tail.append(f"    <output_artifacts>{', '.join(c.output_artifacts[:6])}</output_artifacts>")
+    tail.append("    <instructions>")
+    tail.append(_trim(c.instruction_text, instruction_chars))
+    tail.append("    </instructions>")
+    tail.append("  </card>")
+    return "\n".join(head) + "\n", "\n".join(tail) + "\n"
+
+
+def iter_claude_context(
+    query: str, hits: list[RetrievalHit], fragments: Iterable[tuple[str, str]]
+) -> Iterator[str]:
+    yield "<retrieved_cards>\n"
+    yield f"  <query>{query}</query>\n"
+    for hit, (head, tail) in zip(hits, fragments):
+        yield head
+        yield f"    <score>{hit.score:.4f}</score>\n"
+        yield tail
+    yield "</retrieved_cards>\n"
+
+
 def render_claude_context(query: str, hits: list[RetrievalHit], *, instruction_chars: int = 700) -> str:
-    lines: list[str] = []
-    lines.append("<retrieved_cards>")
-    lines.append(f"  <query>{query}</query>")
-    for hit in hits:
-        c = hit.card
-        lines.append("  <card>")
-        lines.append(f"    <id>{c.id}</id>")
-        lines.append(f"    <title>{c.title}</title>")
-        lines.append(f"    <domain>{c.domain}</domain>")
-        lines.append(f"    <score>{hit.score:.4f}</score>")
-        lines.append(f"    <description>{_trim(c.description, 260)}</description>")
-        if c.tags:
-            lines.append(f"    <tags>{', '.join(c.tags[:12])}</tags>")
-        if c.tool_hints:
-            lines.append(f"    <tool_hints>{', '.join(c.tool_hints[:8])}</tool_hints>")
-        if c.dependencies:
-            lines.append(f"    <dependencies>{', '.join(c.dependencies[:8])}</dependencies>")
-        if c.risk_level:
-            lines.append(f"    <risk_level>{c.risk_level}</risk_level>")
-        if c.output_artifacts:
-            lines.append(f"    <output_artifacts>{', '.join(c.output_artifacts[:6])}</output_artifacts>")
-        lines.append("    <instructions>")
-        lines.append(_trim(c.instruction_text, instruction_chars))
-        lines.append("    </instructions>")
-        lines.append("  </card>")
-    lines.append("</retrieved_cards>")
-    return "\n".join(lines) + "\n"
+    fragments = (render_claude_card(h.card, instruction_chars=instruction_chars) for h in hits)
+    return "".join(iter_claude_context(query, hits, fragments))
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from ..models import RetrievalHit
+from collections.abc import Iterable, Iterator
+
+from ..models import RetrievalHit, ToolCard
 
 
 def _trim(text: str, n: int) -> str:
@@ -10,31 +12,48 @@ def _trim(text: str, n: int) -> str:
     return txt[:n].rstrip() + " ..."
 
 
+def render_codex_card(card: ToolCard, *, instruction_chars: int = 700) -> tuple[str, str]:
+    """Return the static text of a card section before and after its score line.
+
+    The head omits the ``## {rank}. `` prefix, which depends on the hit position.
+    """
+    c = card
+    head: list[str] = []
+    head.append(f"{c.title} (`{c.id}`)")
+    head.append(f"Domain: {c.domain}")
+    if c.description:
+        head.append(f"Purpose: {_trim(c.description, 260)}")
+    if c.tags:
+        head.append(f"Tags: {', '.join(c.tags[:12])}")
+    if c.tool_hints:
+        head.append(f"Tool hints: {', '.join(c.tool_hints[:8])}")
+    if c.dependencies:
+        head.append(f"Dependencies: {', '.join(c.dependencies[:8])}")
+    if c.risk_level:
+        head.append(f"Risk level: {c.risk_level}")
+    if c.output_artifacts:
+        head.append(f"Output artifacts: {', '.join(c.output_artifacts[:6])}")
+
+    tail: list[str] = []
+    tail.append("Instructions:")
+    tail.append("```md")
+    tail.append(_trim(c.instruction_text, instruction_chars))
+    tail.append("```")
+    return "\n".join(head) + "\n", "\n".join(tail) + "\n"
+
+
+def iter_codex_context(
+    query: str, hits: list[RetrievalHit], fragments: Iterable[tuple[str, str]]
+) -> Iterator[str]:
+    yield "# Retrieved SkillMesh Cards\n"
+    yield f"Query: {query}\n"
+    for idx, (hit, (head, tail)) in enumerate(zip(hits, fragments), start=1):
+        yield f"\n## {idx}. "
+        yield head
+        yield f"Score: {hit.score:.4f}\n"
+        yield tail
+
+
 def render_codex_context(query: str, hits: list[RetrievalHit], *, instruction_chars: int = 700) -> str:
-    lines: list[str] = []
-    lines.append("# Retrieved SkillMesh Cards")
-    lines.append(f"Query: {query}")
-    lines.append("")
-    for idx, hit in enumerate(hits, start=1):
-        c = hit.card
-        lines.append(f"## {idx}. {c.title} (`{c.id}`)")
-        lines.append(f"Domain: {c.domain}")
-        if c.description:
-            lines.append(f"Purpose: {_trim(c.description, 260)}")
-        if c.tags:
-            lines.append(f"Tags: {', '.join(c.tags[:12])}")
-        if c.tool_hints:
-            lines.append(f"Tool hints: {', '.join(c.tool_hints[:8])}")
-        if c.dependencies:
-            lines.append(f"Dependencies: {', '.join(c.dependencies[:8])}")
-        if c.risk_level:
-            lines.append(f"Risk level: {c.risk_level}")
-        if c.output_artifacts:
-            lines.append(f"Output artifacts: {', '.join(c.output_artifacts[:6])}")
-        lines.append(f"Score: {hit.score:.4f}")
-        lines.append("Instructions:")
-        lines.append("```md")
-        lines.append(_trim(c.instruction_text, instruction_chars))
-        lines.append("```")
-        lines.append("")
-    return "\n".join(lines).rstrip() + "\n"
+    fragments = (render_codex_card(h.card, instruction_chars=instruction_chars) for h in hits)
+    return "".join(iter_codex_context(query, hits, fragments))
@@ -0,0 +1,243 @@
+"""Provider context assembly from cached per-card render fragments."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+
+from ..models import RetrievalHit, ToolCard
+from ..tokens import TokenCounter, get_token_counter
+from .claude import iter_claude_context, render_claude_card
+from .codex import iter_codex_context, render_codex_card
+
+_PROVIDERS = {
+    "claude": (render_claude_card, iter_claude_context),
+    "codex": (render_codex_card, iter_codex_context),
+}
+
+Fragment = tuple[str, str]
+
+# Smallest instruction excerpt worth emitting when shrinking a card to fit.
+_MIN_INSTRUCTION_CHARS = 100
+
+
+class _Variant:
+    __slots__ = ("fragments", "tokens")
+
+    def __init__(self) -> None:
+        self.fragments: dict[str, Fragment] = {}
+        self.tokens: dict[str, int] = {}
+
+
+class ContextRenderer:
+    """Cache of static per-card fragments keyed by provider and ``instruction_chars``.
+
+    Everything in a rendered card except its score (and, for Codex, its rank)
+    is fixed for a given card and ``instruction_chars``, so each card block is
+    rendered once and contexts are assembled by concatenating fragments. Only
+    the ``max_variants`` most recently used (provider, instruction_chars)
+    tables are kept.
+
+    Token counts of the fragments are cached next to them, so packing a
+    ``max_tokens`` budget at request time is a sum over precomputed counts.
+    """
+
+    def __init__(
+        self, *, max_variants: int = 4, token_counter: TokenCounter | None = None
+    ) -> None:
+        self.max_variants = max(1, int(max_variants))
+        self._token_counter = token_counter
+        self._tables: OrderedDict[tuple[str, int], _Variant] = OrderedDict()
+        self._hit_overhead: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def token_counter(self) -> TokenCounter:
+        if self._token_counter is None:
+            self._token_counter = get_token_counter()
+        return self._token_counter
+
+    def warm(
+        self,
+        cards: Iterable[ToolCard],
+        *,
+        instruction_chars: int = 700,
+        providers: Iterable[str] = ("claude", "codex"),
+        count_tokens: bool = True,
+    ) -> None:
+        """Prerender fragments (and their token counts) for ``cards``."""
+        cards = list(cards)
+        for provider in providers:
+            render_card, _ = _PROVIDERS[provider]
+            fragments = {
+                c.id: render_card(c, instruction_chars=instruction_chars) for c in cards
+            }
+            tokens = (
+                {card_id: self._count(frag) for card_id, frag in fragments.items()}
+                if count_tokens
+                else {}
+            )
+            with self._lock:
+                variant = self._variant(provider, instruction_chars)
+                variant.fragments.update(fragments)
+                variant.tokens.update(tokens)
+
+    def fragment(self, provider: str, card: ToolCard, *, instruction_chars: int = 700) -> Fragment:
+        render_card, _ = _PROVIDERS[provider]
+        with self._lock:
+            cached = self._variant(provider, instruction_chars).fragments.get(card.id)
+        if cached is not None:
+            return cached
+        rendered = render_card(card, instruction_chars=instruction_chars)
+        with self._lock:
+            self._variant(provider, instruction_chars).fragments[card.id] = rendered
+        return rendered
+
+    def fragment_tokens(
+        self, provider: str, card: ToolCard, *, instruction_chars: int = 700
+    ) -> int:
+        """Return the token count of a card's fragment (score line excluded)."""
+        with self._lock:
+            cached = self._variant(provider, instruction_chars).tokens.get(card.id)
+        if cached is not None:
+            return cached
+        count = self._count(self.fragment(provider, card, instruction_chars=instruction_chars))
+        with self._lock:
+            self._variant(provider, instruction_chars).tokens[card.id] = count
+        return count
+
+    def iter_render(
+        self,
+        provider: str,
+        query: str,
+        hits: list[RetrievalHit],
+        *,
+        instruction_chars: int = 700,
+        max_tokens: int | None = None,
+    ) -> Iterator[str]:
+        """Yield the provider context for ``hits`` chunk by chunk.
+
+        With ``max_tokens``, cards are packed in hit order while they fit the
+        budget; the first card that does not fit has its instructions
+        shortened to the remaining budget (down to 100 characters) and the
+        cards after it are dropped.
+        """
+        _, iter_context = _PROVIDERS[provider]
+        if max_tokens is None:
+            fragments = (
+                self.fragment(provider, h.card, instruction_chars=instruction_chars) for h in hits
+            )
+            return iter_context(query, hits, fragments)
+        packed_hits, packed_fragments = self._pack(
+            provider, query, hits, instruction_chars=instruction_chars, max_tokens=max_tokens
+        )
+        return iter_context(query, packed_hits, packed_fragments)
+
+    def render(
+        self,
+        provider: str,
+        query: str,
+        hits: list[RetrievalHit],
+        *,
+        instruction_chars: int = 700,
+        max_tokens: int | None = None,
+    ) -> str:
+        return "".join(
+            self.iter_render(
+                provider,
+                query,
+                hits,
+                instruction_chars=instruction_chars,
+                max_tokens=max_tokens,
+            )
+        )
+
+    def invalidate(self, card_ids: Iterable[str] | None = None) -> None:
+        """Drop cached fragments for ``card_ids``, or all of them when omitted."""
+        with self._lock:
+            if card_ids is None:
+                self._tables.clear()
+                return
+            ids = set(card_ids)
+            for variant in self._tables.values():
+                for card_id in ids:
+                    variant.fragments.pop(card_id, None)
+                    variant.tokens.pop(card_id, None)
+
+    def _pack(
+        self,
+        provider: str,
+        query: str,
+        hits: list[RetrievalHit],
+        *,
+        instruction_chars: int,
+        max_tokens: int,
+    ) -> tuple[list[RetrievalHit], list[Fragment]]:
+        render_card, iter_context = _PROVIDERS[provider]
+        used = self._count("".join(iter_context(query, [], [])))
+        per_hit = self._per_hit_overhead(provider)
+
+        packed_hits: list[RetrievalHit] = []
+        packed_fragments: list[Fragment] = []
+        for hit in hits:
+            cost = per_hit + self.fragment_tokens(
+                provider, hit.card, instruction_chars=instruction_chars
+            )
+            if used + cost <= max_tokens:
+                packed_hits.append(hit)
+                packed_fragments.append(
+                    self.fragment(provider, hit.card, instruction_chars=instruction_chars)
+                )
+                used += cost
+                continue
+
+            # Shrink the instruction excerpt in proportion to the overshoot
+            # until the card fits or the excerpt gets too short to be useful.
+            chars = instruction_chars
+            overshoot = used + cost - max_tokens
+            while chars > _MIN_INSTRUCTION_CHARS:
+                chars = max(_MIN_INSTRUCTION_CHARS, int(chars * (1 - overshoot / max(cost, 1))) - 1)
+                fragment = render_card(hit.card, instruction_chars=chars)
+                cost = per_hit + self._count(fragment)
+                if used + cost <= max_tokens:
+                    packed_hits.append(hit)
+                    packed_fragments.append(fragment)
+                    break
+                overshoot = used + cost - max_tokens
+            break
+        return packed_hits, packed_fragments
+
+    def _per_hit_overhead(self, provider: str) -> int:
+        """Tokens each hit adds beyond its fragment (score line, rank prefix)."""
+        cached = self._hit_overhead.get(provider)
+        if cached is not None:
+            return cached
+        _, iter_context = _PROVIDERS[provider]
+        probe = RetrievalHit(
+            card=ToolCard(id="", title="", domain="", instruction_file=""),
+            score=0.1234,
+            sparse_score=0.0,
+        )
+        empty = self._count("".join(iter_context("", [], [])))
+        single = self._count("".join(iter_context("", [probe], [("", "")])))
+        overhead = max(0, single - empty)
+        self._hit_overhead[provider] = overhead
+        return overhead
+
+    def _count(self, text: str | Fragment) -> int:
+        if isinstance(text, tuple):
+            return sum(self.token_counter(part) for part in text)
+        return self.token_counter(text)
+
+    def _variant(self, provider: str, instruction_chars: int) -> _Variant:
+        # Caller must hold self._lock.
+        key = (provider, int(instruction_chars))
+        variant = self._tables.get(key)
+        if variant is None:
+            variant = self._tables[key] = _Variant()
+            while len(self._tables) > self.max_variants:
+                self._tables.popitem(last=False)
+        else:
+            self._tables.move_to_end(key)
+        return variant
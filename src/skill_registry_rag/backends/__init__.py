@@ -2,14 +2,20 @@
 
 from __future__ import annotations
 
-from typing import Protocol, runtime_checkable
+from typing import TYPE_CHECKING, Protocol, runtime_checkable
 
 from ..models import ExpertCard, RetrievalHit
 
+if TYPE_CHECKING:
+    from ..corpus import Corpus
+
 
 @runtime_checkable
 class RetrievalBackend(Protocol):
-    def index(self, cards: list[ExpertCard]) -> None: ...
+    def index(self, cards: list[ExpertCard], *, corpus: Corpus | None = None) -> None: ...
     def query(self, text: str, top_k: int = 3) -> list[RetrievalHit]: ...
+    def upsert(self, cards: list[ExpertCard]) -> None: ...
+    def remove(self, card_ids: list[str]) -> None: ...
+
 
 __all__ = ["RetrievalBackend"]
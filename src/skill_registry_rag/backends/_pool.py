@@ -0,0 +1,42 @@
+"""Shared worker threads for overlapping query-time work (e.g. dense encoding)."""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _workers() -> int:
+    raw = os.getenv("SKILLMESH_QUERY_WORKERS", "").strip()
+    if raw:
+        try:
+            return max(1, int(raw))
+        except ValueError as exc:
+            raise ValueError(f"SKILLMESH_QUERY_WORKERS must be an integer, got: {raw!r}") from exc
+    return min(4, os.cpu_count() or 1)
+
+
+def submit(fn: Callable[..., T], *args: Any) -> Future[T]:
+    """Run ``fn(*args)`` on the shared pool in a copy of the caller's context.
+
+    Copying the context keeps per-request timing collection working inside
+    the worker thread.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=_workers(), thread_name_prefix="skillmesh-query"
+                )
+    ctx = contextvars.copy_context()
+    return _pool.submit(ctx.run, fn, *args)
@@ -1,48 +1,110 @@
 from __future__ import annotations
 
 import hashlib
+import logging
 import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 import numpy as np
-from rank_bm25 import BM25Okapi
 
+from .. import deadline, timing
+from ..cache import QueryCache
+from ..corpus import Corpus, card_content_hash, compose_doc, derive_fingerprint, tokenize
 from ..models import ExpertCard, RetrievalHit
-from .memory import _tokenize
+from ._lock import FileLock
+from ._pool import submit
+from .embedders import Embedder, get_embedder
+from .sparse import IncrementalSparseIndex, SparseIndex
+
+logger = logging.getLogger(__name__)
+
+# How often a process waiting on another's build checks whether it finished.
+_ATTACH_INTERVAL = 1.0
+# Earlier collections of one registry lineage kept after an upsert or
+# remove; older ones are deleted (see prune_collections).
+_KEEP_VERSIONS = 4
+# Fold the changed rows into a new base collection once they reach this
+# many, or this share of the live cards, whichever is larger.
+_COMPACT_MIN_CHANGES = 64
+_COMPACT_RATIO = 0.25
+# Rows read per request when copying collection rows.
+_COPY_BATCH = 1000
 
 
 def _default_data_dir() -> Path:
     return Path(os.environ.get("SKILLMESH_DATA_DIR", Path.home() / ".skillmesh" / "chroma"))
 
 
-def _card_hash(card: ExpertCard) -> str:
-    content = f"{card.id}|{card.title}|{card.description}|{','.join(card.tags)}|{card.instruction_text[:500]}"
-    return hashlib.sha256(content.encode()).hexdigest()[:16]
-
-
-def _compose_doc(card: ExpertCard) -> str:
-    input_contract_text = ", ".join(f"{k}:{v}" for k, v in card.input_contract.items())
-    metadata_text = ", ".join(f"{k}:{v}" for k, v in card.metadata.items())
-    return "\n".join([
-        card.id, card.title, card.domain, card.description,
-        "tags: " + ", ".join(card.tags),
-        "tool_hints: " + ", ".join(card.tool_hints),
-        "examples: " + " | ".join(card.examples),
-        "aliases: " + ", ".join(card.aliases),
-        "dependencies: " + ", ".join(card.dependencies),
-        "output_artifacts: " + ", ".join(card.output_artifacts),
-        "quality_checks: " + ", ".join(card.quality_checks),
-        "constraints: " + ", ".join(card.constraints),
-        "input_contract: " + input_contract_text,
-        "risk_level: " + card.risk_level,
-        "maturity: " + card.maturity,
-        "metadata: " + metadata_text,
-        card.instruction_text[:2000],
-    ])
+def _lock_timeout() -> float:
+    raw = os.getenv("SKILLMESH_INDEX_LOCK_TIMEOUT", "").strip()
+    if not raw:
+        return 0.0
+    try:
+        return float(raw)
+    except ValueError as exc:
+        raise ValueError(
+            f"SKILLMESH_INDEX_LOCK_TIMEOUT must be a number of seconds, got: {raw!r}"
+        ) from exc
+
+
+@dataclass(frozen=True, slots=True)
+class _IndexView:
+    """The cards and postings a query reads, swapped as one object on every change."""
+
+    cards: list[ExpertCard] = field(default_factory=list)
+    sparse: SparseIndex | IncrementalSparseIndex | None = None
+    slots: dict[str, int] = field(default_factory=dict)  # live card id -> slot
+    alive: Optional[np.ndarray] = None  # None while every slot is live
+    version: str = ""
+    corpus: Optional[Corpus] = None
+    # Dense side: the base collection, plus a small collection of the rows
+    # changed since it was built. Base rows of the ``changed`` ids are
+    # outdated (or removed) and never returned.
+    collection: Any = None
+    delta: Any = None
+    changed: frozenset[str] = frozenset()
+
+    @property
+    def n_live(self) -> int:
+        return len(self.slots)
 
 
 class ChromaBackend:
+    """BM25 plus a Chroma vector collection, fused by weighted score.
+
+    Card and query embeddings come from an :class:`~.embedders.Embedder`
+    (``embedder``, or the process-wide one for ``dense_model``) and are
+    passed to Chroma explicitly, so Chroma never loads an embedding model of
+    its own and dense scores match :class:`~.memory.InMemoryBackend`.
+
+    Collections are named ``<collection_name>-<hash>`` from the registry
+    fingerprint and embedding model, so processes serving different
+    registries never touch each other's collection, and a process finding a
+    complete collection for its registry reuses it instead of re-indexing.
+    Builds of a persistent collection hold a file lock under
+    ``<data_dir>/locks``; other processes wait up to ``lock_timeout``
+    seconds (default ``SKILLMESH_INDEX_LOCK_TIMEOUT``, ``0``) and then
+    answer sparse-only until the build is published.
+
+    :meth:`upsert` and :meth:`remove` update BM25 incrementally and leave
+    the base collection as it is, since other processes may be serving it.
+    Changed rows go to a small delta collection published under the derived
+    registry version, so other processes applying the same change reuse
+    it; queries merge the two. Each change copies only the previous delta
+    plus the new rows. Once the changes reach a quarter of the catalog they
+    are folded into a new base collection. Collections of earlier versions of
+    the same registry lineage are pruned by :meth:`prune_collections`.
+    Changes made while another process is still building leave this
+    backend sparse-only until it is re-indexed.
+
+    Queries may run on any number of threads: each reads one immutable
+    snapshot of the cards and postings, which writers replace as a whole.
+    """
+
     def __init__(
         self,
         *,
@@ -54,6 +116,11 @@ class ChromaBackend:
         dense_weight: float = 0.2,
         min_dense_candidates: int = 100,
         dense_candidates_multiplier: int = 10,
+        initial_dense_candidates: int = 20,
+        dense_score_gap: float = 0.1,
+        dense_model: str | None = None,
+        embedder: Embedder | None = None,
+        lock_timeout: float | None = None,
     ):
         self._collection_name = collection_name
         self._ephemeral = ephemeral
@@ -64,135 +131,662 @@ class ChromaBackend:
             self._sparse_weight = 1.0
         self._min_dense_candidates = max(1, int(min_dense_candidates))
         self._dense_candidates_multiplier = max(1, int(dense_candidates_multiplier))
+        self._initial_dense_candidates = max(1, int(initial_dense_candidates))
+        self._dense_score_gap = max(0.0, float(dense_score_gap))
 
         self._client = None
+        self._lock_dir: Path | None = None
+        self.embedder: Embedder | None = None
         if self._use_dense:
+            self.embedder = embedder or get_embedder(dense_model)
             import chromadb
 
             if ephemeral:
                 self._client = chromadb.Client()
             else:
-                persist_dir = str(Path(data_dir) if data_dir else _default_data_dir())
-                self._client = chromadb.PersistentClient(path=persist_dir)
+                persist_dir = Path(data_dir) if data_dir else _default_data_dir()
+                self._client = chromadb.PersistentClient(path=str(persist_dir))
+                self._lock_dir = persist_dir / "locks"
+        self._lock_timeout = _lock_timeout() if lock_timeout is None else float(lock_timeout)
+
+        self.collection_name = collection_name
+        self._view = _IndexView()
+        self._dense_status = "off"
+        self._next_attach = 0.0
+        # Serializes writers; readers never take it.
+        self._lock = threading.Lock()
+
+    @property
+    def _cards(self) -> list[ExpertCard]:
+        return self._view.cards
+
+    @_cards.setter
+    def _cards(self, cards: list[ExpertCard]) -> None:
+        self._view = _IndexView(
+            cards=cards, sparse=self._view.sparse, slots={c.id: i for i, c in enumerate(cards)}
+        )
+
+    @property
+    def _bm25(self) -> SparseIndex | IncrementalSparseIndex | None:
+        return self._view.sparse
+
+    @property
+    def _collection(self):
+        return self._view.collection
+
+    @_collection.setter
+    def _collection(self, collection) -> None:
+        self._view = replace(self._view, collection=collection, delta=None, changed=frozenset())
+
+    @property
+    def _corpus(self) -> Optional[Corpus]:
+        return self._view.corpus
+
+    @property
+    def embedding_cache(self) -> QueryCache | None:
+        return self.embedder.cache if self.embedder is not None else None
+
+    @property
+    def dense_status(self) -> str:
+        """One of ``off``, ``loading`` (another process is building), ``ready`` or ``failed``."""
+        return self._dense_status
 
-        self._cards: list[ExpertCard] = []
-        self._card_map: dict[str, ExpertCard] = {}
-        self._bm25: Optional[BM25Okapi] = None
-        self._tokens: list[list[str]] = []
+    def collection_name_for(self, fingerprint: str) -> str:
+        """Collection name for a registry fingerprint under the current embedder."""
+        return f"{self._collection_name}-{self._digest(fingerprint)}"
+
+    def _digest(self, fingerprint: str) -> str:
+        model = self.embedder.name if self.embedder is not None else ""
+        return hashlib.sha256(f"{fingerprint}|{model}".encode()).hexdigest()[:16]
+
+    def index(self, cards: list[ExpertCard], *, corpus: Corpus | None = None) -> None:
+        with self._lock:
+            self._index(cards, corpus)
+
+    def _index(self, cards: list[ExpertCard], corpus: Corpus | None) -> None:
         self._collection = None
+        self._dense_status = "off"
+        if not cards:
+            self._view = _IndexView()
+            return
+
+        if corpus is None:
+            corpus = Corpus(cards)
+        self._view = _IndexView(
+            cards=list(cards),
+            sparse=corpus.sparse,
+            slots={c.id: i for i, c in enumerate(cards)},
+            version=corpus.fingerprint,
+            corpus=corpus,
+        )
 
-    def index(self, cards: list[ExpertCard]) -> None:
+        if not self._use_dense or self._client is None or self.embedder is None:
+            return
+        self.collection_name = self.collection_name_for(corpus.fingerprint)
+        self._collection = self._open_collection()
+        if self._collection is not None:
+            self._dense_status = "ready"
+            return
+        if self._lock_dir is None:
+            self._build_collection(corpus)
+            return
+
+        lock = FileLock(self._lock_dir / f"{self.collection_name}.lock")
+        if not lock.acquire(self._lock_timeout):
+            # Another process is building this collection: answer sparse-only
+            # and attach once it has been published.
+            logger.info("Collection %s is being built elsewhere", self.collection_name)
+            self._dense_status = "loading"
+            self._next_attach = time.monotonic() + _ATTACH_INTERVAL
+            return
+        try:
+            # The previous holder may have finished it while we waited.
+            self._collection = self._open_collection()
+            if self._collection is not None:
+                self._dense_status = "ready"
+            else:
+                self._build_collection(corpus)
+        finally:
+            lock.release()
+
+    def upsert(self, cards: list[ExpertCard]) -> None:
+        """Add ``cards``, replacing any indexed card with the same id."""
+        cards = list({card.id: card for card in cards}.values())
         if not cards:
-            self._cards = []
-            self._card_map = {}
-            self._bm25 = None
-            self._tokens = []
-            self._collection = None
             return
+        with timing.stage("tokenize"):
+            docs = [compose_doc(card) for card in cards]
+            token_lists = [tokenize(doc) for doc in docs]
+        with self._lock:
+            self._upsert(cards, docs, token_lists)
+
+    def _upsert(
+        self, cards: list[ExpertCard], docs: list[str], token_lists: list[list[str]]
+    ) -> None:
+        view = self._view
+        if not view.cards or view.sparse is None:
+            self._index(cards, None)
+            return
+        slots = dict(view.slots)
+        replaced = [slots[card.id] for card in cards if card.id in slots]
+        sparse, new_slots = self._incremental(view).apply(add=token_lists, remove=replaced)
+        slots.update((card.id, slot) for card, slot in zip(cards, new_slots))
+        updated = replace(
+            view,
+            cards=view.cards + cards,
+            sparse=sparse,
+            slots=slots,
+            alive=sparse.alive,
+            version=derive_fingerprint(view.version, upserted=cards),
+        )
+
+        if view.collection is None or self.embedder is None:
+            self._view = updated
+            return
+        try:
+            with timing.stage("dense_encode"):
+                vectors = self.embedder.embed_documents(docs, view.corpus)
+        except Exception:
+            logger.warning("Could not embed upserted cards; serving sparse-only", exc_info=True)
+            self._view = replace(updated, collection=None, delta=None, changed=frozenset())
+            self._dense_status = "failed"
+            return
+        self._view = self._publish_version(
+            updated, cards, np.asarray(vectors, dtype=np.float32), []
+        )
 
-        self._cards = cards
-        self._card_map = {c.id: c for c in cards}
+    def remove(self, card_ids: list[str]) -> None:
+        """Drop the cards with these ids; unknown ids are ignored."""
+        with self._lock:
+            self._remove(card_ids)
 
-        doc_texts = [_compose_doc(c) for c in cards]
-        self._tokens = [_tokenize(d) for d in doc_texts]
-        self._bm25 = BM25Okapi(self._tokens) if self._tokens else None
+    def _remove(self, card_ids: list[str]) -> None:
+        view = self._view
+        slots = dict(view.slots)
+        dropped = {card_id: slots.pop(card_id) for card_id in card_ids if card_id in slots}
+        if not dropped or view.sparse is None:
+            return
+        sparse, _ = self._incremental(view).apply(remove=dropped.values())
+        updated = replace(
+            view,
+            sparse=sparse,
+            slots=slots,
+            alive=sparse.alive,
+            version=derive_fingerprint(view.version, removed=list(dropped)),
+        )
 
-        if not self._use_dense or self._client is None:
-            self._collection = None
+        if view.collection is None or self.embedder is None:
+            self._view = updated
             return
+        self._view = self._publish_version(updated, [], None, list(dropped))
+
+    @staticmethod
+    def _incremental(view: _IndexView) -> IncrementalSparseIndex:
+        if isinstance(view.sparse, IncrementalSparseIndex):
+            return view.sparse
+        assert view.sparse is not None
+        return IncrementalSparseIndex(view.sparse)
+
+    def _publish_version(
+        self,
+        view: _IndexView,
+        cards: list[ExpertCard],
+        vectors: Optional[np.ndarray],
+        removed: list[str],
+    ) -> _IndexView:
+        """``view`` with its dense side moved to its version, which is published for reuse.
+
+        ``view`` still holds the previous version's collections. The base
+        collection is kept and a new delta holds every row changed since it:
+        the previous delta's rows (minus those changed again) plus ``cards``.
+        Once the changes reach :data:`_COMPACT_RATIO` of the catalog they are
+        written to a new base collection instead. No collection of the
+        previous version is modified, since other processes may still serve it.
+        """
+        assert self.embedder is not None and view.collection is not None
+        touched = {card.id for card in cards} | set(removed)
+        changed = view.changed | touched
+        base, previous = view.collection, view.delta
+        lineage = _lineage(base)
+
+        def fill(collection, skip_base: bool) -> None:
+            if skip_base:
+                _copy_rows(base, collection, skip=changed)
+            if previous is not None:
+                _copy_rows(previous, collection, skip=touched)
+            if cards:
+                collection.upsert(
+                    ids=[card.id for card in cards],
+                    embeddings=vectors,
+                    metadatas=[_card_metadata(card) for card in cards],
+                )
+
+        if len(changed) >= max(_COMPACT_MIN_CHANGES, _COMPACT_RATIO * view.n_live):
+            with timing.stage("compact"):
+                name = self.collection_name_for(view.version)
+                collection = self._publish(
+                    name,
+                    lambda c: self._valid(c, view.version, view.n_live),
+                    lambda c: fill(c, True),
+                    {"fingerprint": view.version, "lineage": lineage},
+                )
+            if collection is None:
+                return self._lose_dense(view)
+            self.collection_name = name
+            updated = replace(view, collection=collection, delta=None, changed=frozenset())
+        else:
+            n_rows = sum(1 for card_id in changed if card_id in view.slots)
+            delta = None
+            if n_rows:
+                # Named after the base as well: a process that built the
+                # catalog at another version may reach this one on another base.
+                delta = self._publish(
+                    f"{base.name}-{self._digest(view.version)}",
+                    lambda c: self._valid(c, view.version, n_rows, base=base.name),
+                    lambda c: fill(c, False),
+                    {"fingerprint": view.version, "lineage": lineage, "base": base.name},
+                )
+                if delta is None:
+                    return self._lose_dense(view)
+            updated = replace(view, delta=delta, changed=frozenset(changed))
+        self.prune_collections(view=updated)
+        return updated
+
+    def _publish(self, name: str, valid, fill, metadata: dict[str, Any]):
+        """Collection ``name``, reused when ``valid``, else filled as a scratch copy and renamed.
 
+        Returns None when it could not be published.
+        """
+        assert self._client is not None and self.embedder is not None
+        existing = self._get_collection(name)
+        if existing is not None and valid(existing):
+            return existing
+        scratch = f"{name}-tmp-{os.getpid()}-{threading.get_ident()}"
         try:
-            self._client.delete_collection(self._collection_name)
+            collection = self._client.create_collection(
+                name=scratch,
+                metadata={
+                    "hnsw:space": "cosine",
+                    "embedding_model": self.embedder.name,
+                    "published_at": time.time(),
+                    **metadata,
+                },
+                embedding_function=None,
+            )
+            fill(collection)
         except Exception:
-            pass
+            logger.warning("Could not publish collection %s", name, exc_info=True)
+            self._drop_collection(scratch)
+            return None
+        try:
+            collection.modify(name=name)
+            return collection
+        except Exception:
+            # Another process published it first (or left an invalid one):
+            # use theirs if it is complete and drop our scratch copy.
+            logger.debug("Could not rename collection to %s", name, exc_info=True)
+            self._drop_collection(scratch)
+        existing = self._get_collection(name)
+        return existing if existing is not None and valid(existing) else None
+
+    def _lose_dense(self, view: _IndexView) -> _IndexView:
+        logger.warning("Serving sparse-only: the dense collection could not be updated")
+        self._dense_status = "failed"
+        return replace(view, collection=None, delta=None, changed=frozenset())
+
+    def prune_collections(
+        self, keep: int = _KEEP_VERSIONS, *, view: _IndexView | None = None
+    ) -> list[str]:
+        """Delete old collections of this backend's registry lineage; return their names.
+
+        A lineage starts at a full build and continues through the versions
+        derived from it by :meth:`upsert` and :meth:`remove`; collections of
+        other registries, and of other builds, are never touched. The
+        collections being served, the ``keep`` most recently published
+        others, and the base collections those read are kept.
+        """
+        view = self._view if view is None else view
+        if self._client is None or view.collection is None:
+            return []
+        lineage = _lineage(view.collection)
+        serving = {view.collection.name} | ({view.delta.name} if view.delta is not None else set())
+        prefix = f"{self._collection_name}-"
+        published: list[tuple[float, str, str]] = []
+        try:
+            for collection in self._client.list_collections():
+                name = collection if isinstance(collection, str) else collection.name
+                if not name.startswith(prefix) or "-tmp" in name[len(prefix) :]:
+                    continue
+                if name in serving:
+                    continue
+                if isinstance(collection, str):  # chromadb 0.6 lists names only
+                    collection = self._client.get_collection(name, embedding_function=None)
+                if _lineage(collection) != lineage:
+                    continue
+                meta = collection.metadata or {}
+                published.append(
+                    (float(meta.get("published_at", 0.0)), name, str(meta.get("base", "")))
+                )
+        except Exception:
+            logger.debug("Could not list collections", exc_info=True)
+            return []
+        published.sort(reverse=True)
+        needed = serving | {base for _, _, base in published[: max(0, keep)]}
+        stale = [name for _, name, _ in published[max(0, keep) :] if name not in needed]
+        for name in stale:
+            self._drop_collection(name)
+        return stale
 
-        self._collection = self._client.get_or_create_collection(
-            name=self._collection_name,
-            metadata={"hnsw:space": "cosine"},
+    def _get_collection(self, name: str):
+        assert self._client is not None
+        try:
+            return self._client.get_collection(name, embedding_function=None)
+        except Exception:
+            return None
+
+    def _valid(self, collection, version: str, n_rows: int, *, base: str | None = None) -> bool:
+        assert self.embedder is not None
+        meta = collection.metadata or {}
+        return (
+            meta.get("fingerprint") == version
+            and meta.get("embedding_model") == self.embedder.name
+            and (base is None or meta.get("base") == base)
+            and collection.count() == n_rows
         )
 
-        ids = [c.id for c in cards]
-        documents = doc_texts
-        metadatas = [
-            {
-                "domain": c.domain,
-                "risk_level": c.risk_level or "",
-                "maturity": c.maturity or "",
-                "tags": ",".join(c.tags[:20]),
-                "content_hash": _card_hash(c),
-            }
-            for c in cards
-        ]
+    def _drop_collection(self, name: str) -> None:
+        try:
+            self._client.delete_collection(name)
+        except Exception:
+            pass
+
+    def _open_collection(self, view: _IndexView | None = None):
+        """Return the published collection for the current registry, or None."""
+        view = self._view if view is None else view
+        assert self._client is not None and self.embedder is not None
+        try:
+            collection = self._client.get_collection(
+                self.collection_name, embedding_function=None
+            )
+        except Exception:
+            return None
+        meta = collection.metadata or {}
+        if (
+            meta.get("fingerprint") != view.version
+            or meta.get("embedding_model") != self.embedder.name
+            or collection.count() != view.n_live
+        ):
+            return None
+        return collection
+
+    def _build_collection(self, corpus: Corpus) -> None:
+        assert self._client is not None and self.embedder is not None
+        try:
+            embeddings = self.embedder.embed_corpus(corpus)
+        except Exception:
+            logger.warning(
+                "Dense model %s unavailable; serving sparse-only", self.embedder.name,
+                exc_info=True,
+            )
+            self._dense_status = "failed"
+            return
+
+        # Build under a scratch name and rename when complete, so other
+        # processes never attach to a half-filled collection.
+        name = self.collection_name
+        scratch = f"{name}-tmp"
+        for stale in (scratch, name):
+            try:
+                self._client.delete_collection(stale)
+            except Exception:
+                pass
+        collection = self._client.create_collection(
+            name=scratch,
+            metadata={
+                "hnsw:space": "cosine",
+                "embedding_model": self.embedder.name,
+                "fingerprint": corpus.fingerprint,
+                "lineage": corpus.fingerprint,
+                "published_at": time.time(),
+            },
+            embedding_function=None,
+        )
 
+        cards = corpus.cards
         batch_size = 500
-        for i in range(0, len(ids), batch_size):
-            end = min(i + batch_size, len(ids))
-            self._collection.upsert(
-                ids=ids[i:end],
-                documents=documents[i:end],
-                metadatas=metadatas[i:end],
+        hashes = corpus.content_hashes
+        for i in range(0, len(cards), batch_size):
+            end = min(i + batch_size, len(cards))
+            batch = cards[i:end]
+            collection.upsert(
+                ids=[c.id for c in batch],
+                embeddings=np.asarray(embeddings[i:end], dtype=np.float32),
+                metadatas=[_card_metadata(c, h) for c, h in zip(batch, hashes[i:end])],
             )
+        collection.modify(name=name)
+        self._collection = collection
+        self._dense_status = "ready"
+
+    def _maybe_attach(self, view: _IndexView) -> None:
+        now = time.monotonic()
+        if now < self._next_attach:
+            return
+        self._next_attach = now + _ATTACH_INTERVAL
+        collection = self._open_collection(view)
+        if collection is not None and self._view is view:
+            self._collection = collection
+            self._dense_status = "ready"
+
+    def _drop_dense(self, view: _IndexView) -> None:
+        # Never wait for a writer from the query path; it replaces the view anyway.
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self._view is view:
+                self._view = replace(view, collection=None, delta=None, changed=frozenset())
+                self._dense_status = "failed"
+        finally:
+            self._lock.release()
 
-    def _sparse_scores(self, query: str) -> np.ndarray:
-        n = len(self._cards)
-        if n == 0:
-            return np.array([], dtype=np.float32)
-        q_tokens = _tokenize(query)
-        if not q_tokens:
-            return np.zeros(n, dtype=np.float32)
-        if self._bm25 is not None:
-            scores = np.asarray(self._bm25.get_scores(q_tokens), dtype=np.float32)
+    def _sparse_candidates(self, view: _IndexView, query: str) -> tuple[np.ndarray, np.ndarray]:
+        """BM25 scores (max-normalized) of the cards matching any query term; others score 0."""
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if view.sparse is None:
+            return empty
+        index = view.sparse
+        with timing.stage("tokenize"):
+            tokens = tokenize(query)
+            q_ids = index.encode_query(tokens) if isinstance(index, SparseIndex) else None
+        if q_ids is not None and not len(q_ids):
+            return empty
+        with timing.stage("bm25"):
+            if q_ids is None:
+                docs, scores = index.get_candidate_scores(tokens)
+            else:
+                docs, scores = index.get_candidate_scores_for_ids(q_ids)
+            scores = scores.astype(np.float32)
             mx = float(np.max(scores)) if len(scores) else 0.0
-            return scores / mx if mx > 0 else scores
-        return np.zeros(n, dtype=np.float32)
+            return docs, (scores / mx if mx > 0 else scores)
+
+    def _dense_candidates(
+        self, view: _IndexView, collection, text: str, top_k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Nearest cards and their cosine similarities, fetched adaptively.
+
+        Starts with ``initial_dense_candidates`` neighbours and grows the
+        request geometrically up to ``max(top_k * multiplier, min)`` only
+        while the similarity of the last neighbour is within
+        ``dense_score_gap`` of the best one. Past that gap the remaining
+        cards sit in the flat tail of the dense score and cannot change the
+        ranking much, so the large HNSW fetch is skipped.
+        """
+        # The query is embedded once, through the shared embedder and its cache.
+        # Base rows of changed cards are dropped and the delta's nearest rows
+        # merged in by similarity.
+        q_vec = self.embedder.cached_query(text)
+        if q_vec is None:
+            q_vec = self.embedder.embed_query(text, view.corpus)
+        n_cards = view.n_live
+        cap = min(n_cards, max(top_k * self._dense_candidates_multiplier, self._min_dense_candidates))
+        n = min(cap, max(top_k * 2, self._initial_dense_candidates))
+        fetches = 0
+        while True:
+            with timing.stage("chroma_query"):
+                ids, dists = _nearest(collection, q_vec, n + len(view.changed), view.changed)
+                if view.delta is not None:
+                    delta_ids, delta_dists = _nearest(view.delta, q_vec, n, frozenset())
+                    if dists is None or delta_dists is None:
+                        ids, dists = ids + delta_ids, None
+                    else:
+                        merged = sorted(zip(dists + delta_dists, ids + delta_ids))[:n]
+                        dists = [dist for dist, _ in merged]
+                        ids = [card_id for _, card_id in merged]
+            fetches += 1
+            if dists is not None:
+                sims = 1.0 - np.asarray(dists, dtype=np.float32)
+            else:
+                sims = 1.0 / np.arange(1, len(ids) + 1, dtype=np.float32)
+            if (
+                n >= cap
+                or len(ids) < n
+                or dists is None
+                or float(sims[0] - sims[-1]) >= self._dense_score_gap
+            ):
+                break
+            n = min(cap, n * 4)
+        timing.count("dense_fetches", fetches)
+        timing.count("dense_candidates", len(ids))
+
+        slots = view.slots
+        keep = [i for i, cid in enumerate(ids) if cid in slots]
+        idx = np.fromiter((slots[ids[i]] for i in keep), dtype=np.int64, count=len(keep))
+        return idx, sims[keep] if len(keep) else np.empty(0, dtype=np.float32)
 
     def query(self, text: str, top_k: int = 3) -> list[RetrievalHit]:
-        if not self._cards:
+        view = self._view
+        if not view.n_live:
             return []
-        top_k = max(1, min(int(top_k), min(20, len(self._cards))))
-
-        sparse = self._sparse_scores(text)
-        n = len(self._cards)
-        dense_scores = np.zeros(n, dtype=np.float32)
-        if self._use_dense and self._collection is not None:
-            n_candidates = min(
-                len(self._cards),
-                max(top_k * self._dense_candidates_multiplier, self._min_dense_candidates),
-            )
-            results = self._collection.query(query_texts=[text], n_results=n_candidates)
-
-            id_to_idx = {c.id: i for i, c in enumerate(self._cards)}
-            if results and results["ids"] and results["ids"][0]:
-                chroma_ids = results["ids"][0]
-                chroma_dists = results["distances"][0] if results.get("distances") else None
-                for rank, cid in enumerate(chroma_ids):
-                    if cid in id_to_idx:
-                        idx = id_to_idx[cid]
-                        if chroma_dists is not None:
-                            dense_scores[idx] = 1.0 - chroma_dists[rank]
-                        else:
-                            dense_scores[idx] = 1.0 / (rank + 1)
-
-            mx = float(np.max(dense_scores)) if np.any(dense_scores) else 0.0
-            mn = float(np.min(dense_scores[dense_scores > 0])) if np.any(dense_scores > 0) else 0.0
-            if mx - mn > 1e-9:
-                mask = dense_scores > 0
-                dense_scores[mask] = (dense_scores[mask] - mn) / (mx - mn)
+        top_k = max(1, min(int(top_k), min(20, view.n_live)))
+        alive = view.alive
 
+        pending = None
+        if self._dense_status == "loading":
+            self._maybe_attach(view)
+            view = self._view
+        collection = view.collection
+        if self._use_dense and collection is not None:
+            # The query is embedded and searched on a worker thread while BM25 runs here.
+            pending = submit(self._dense_candidates, view, collection, text, top_k)
+        sparse_docs, sparse_vals = self._sparse_candidates(view, text)
+
+        # Score only the union of BM25 hits and dense candidates; every other
+        # card has zero sparse and dense score.
+        # Past the request's deadline, answer sparse-only.
+        dense = None
+        if pending is not None:
+            try:
+                dense = deadline.optional_result(pending, "dense")
+            except Exception:
+                # E.g. the collection was deleted under us: answer sparse-only
+                # until the next index().
+                logger.warning("Dense search failed; serving sparse-only", exc_info=True)
+                self._drop_dense(view)
+        if dense is not None:
+            dense_docs, dense_vals = dense
+            mask = dense_vals > 0
+            if np.any(mask):
+                mx, mn = float(dense_vals[mask].max()), float(dense_vals[mask].min())
+                if mx - mn > 1e-9:
+                    dense_vals = dense_vals.copy()
+                    dense_vals[mask] = (dense_vals[mask] - mn) / (mx - mn)
+            cand = np.union1d(sparse_docs, dense_docs)
+        else:
+            dense_docs = np.empty(0, dtype=np.int64)
+            dense_vals = np.empty(0, dtype=np.float32)
+            cand = np.asarray(sparse_docs, dtype=np.int64)
+        timing.count("sparse_candidates", len(sparse_docs))
+
+        sparse = np.zeros(len(cand), dtype=np.float32)
+        sparse[np.searchsorted(cand, sparse_docs)] = sparse_vals
+        if dense is not None:
+            dense_scores = np.zeros(len(cand), dtype=np.float32)
+            dense_scores[np.searchsorted(cand, dense_docs)] = dense_vals
             hybrid = (self._sparse_weight * sparse) + (self._dense_weight * dense_scores)
         else:
+            dense_scores = None
             hybrid = sparse
 
-        idx = np.argsort(-hybrid)[:top_k]
-        hits: list[RetrievalHit] = []
-        for i in idx:
-            dense_score = None if not self._use_dense else float(dense_scores[int(i)])
-            hits.append(
-                RetrievalHit(
-                    card=self._cards[int(i)],
-                    score=float(hybrid[int(i)]),
-                    sparse_score=float(sparse[int(i)]),
-                    dense_score=dense_score,
+        with timing.stage("fusion"):
+            order = np.argsort(-hybrid, kind="stable")[:top_k]
+            picked = [(int(cand[j]), float(hybrid[j]), float(sparse[j]), j) for j in order]
+            if len(picked) < top_k:
+                # Fewer matches than requested: fill with zero-score cards.
+                seen = set(cand.tolist())
+                for i in range(len(view.cards)):
+                    if len(picked) >= top_k:
+                        break
+                    if i not in seen and (alive is None or alive[i]):
+                        picked.append((i, 0.0, 0.0, None))
+            hits: list[RetrievalHit] = []
+            for i, score, sparse_score, j in picked:
+                if dense_scores is None:
+                    dense_score = None
+                else:
+                    dense_score = float(dense_scores[j]) if j is not None else 0.0
+                hits.append(
+                    RetrievalHit(
+                        card=view.cards[i],
+                        score=score,
+                        sparse_score=sparse_score,
+                        dense_score=dense_score,
+                        mode="hybrid" if dense is not None else "sparse",
+                    )
                 )
-            )
         return hits
+
+
+def _lineage(collection) -> str:
+    """The fingerprint of the full build ``collection`` descends from."""
+    meta = collection.metadata or {}
+    return str(meta.get("lineage") or meta.get("fingerprint") or collection.name)
+
+
+def _nearest(collection, q_vec, n: int, skip: frozenset[str]) -> tuple[list[str], list | None]:
+    """Ids and distances of ``collection``'s ``n`` nearest rows, minus those in ``skip``."""
+    results = collection.query(query_embeddings=[q_vec], n_results=n)
+    ids = list(results["ids"][0]) if results and results["ids"] else []
+    dists = list(results["distances"][0]) if results.get("distances") else None
+    if skip:
+        keep = [i for i, card_id in enumerate(ids) if card_id not in skip]
+        ids = [ids[i] for i in keep]
+        dists = [dists[i] for i in keep] if dists is not None else None
+    return ids, dists
+
+
+def _copy_rows(source, target, skip: set[str]) -> None:
+    """Copy every row of collection ``source`` into ``target`` except the ids in ``skip``."""
+    offset = 0
+    while True:
+        batch = source.get(include=["embeddings", "metadatas"], limit=_COPY_BATCH, offset=offset)
+        ids = batch["ids"]
+        if not ids:
+            return
+        offset += len(ids)
+        keep = [i for i, card_id in enumerate(ids) if card_id not in skip]
+        if keep:
+            embeddings = np.asarray(batch["embeddings"], dtype=np.float32)
+            target.add(
+                ids=[ids[i] for i in keep],
+                embeddings=embeddings[keep],
+                metadatas=[batch["metadatas"][i] for i in keep],
+            )
+
+
+def _card_metadata(card: ExpertCard, content_hash: str | None = None) -> dict[str, str]:
+    return {
+        "domain": card.domain,
+        "risk_level": card.risk_level or "",
+        "maturity": card.maturity or "",
+        "tags": ",".join(card.tags[:20]),
+        "content_hash": content_hash or card_content_hash(card),
+    }
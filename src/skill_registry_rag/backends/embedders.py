@@ -0,0 +1,161 @@
+"""Dense embedders shared by every backend in a process.
+
+Backends embed cards and queries through an embedder instead of loading
+models themselves, so the in-memory and Chroma backends use the same model,
+the same cached card embeddings (see :meth:`Corpus.embeddings`) and the same
+query-embedding cache, and their dense scores are comparable.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Protocol
+
+import numpy as np
+
+from .. import timing
+from ..cache import QueryCache
+from .lsa import DEFAULT_LSA_DIMS, LSA_MODEL_NAME
+
+if TYPE_CHECKING:
+    from ..corpus import Corpus
+
+BGE_SMALL = "BAAI/bge-small-en-v1.5"
+
+_ALIASES = {
+    "bge": BGE_SMALL,
+    "bge-small": BGE_SMALL,
+    "lsa": LSA_MODEL_NAME,
+}
+
+
+def resolve_dense_model(name: str | None = None) -> str:
+    """Resolve a dense model name.
+
+    ``name`` defaults to ``SKILLMESH_DENSE_MODEL`` or ``"auto"``. ``"lsa"``
+    selects the built-in NumPy LSA embeddings; ``"bge-small"`` (or any other
+    sentence-transformers model id) needs the ``dense`` extra. ``"auto"``
+    uses bge-small when sentence-transformers is installed and LSA otherwise.
+    """
+    raw = (name or os.getenv("SKILLMESH_DENSE_MODEL", "").strip() or "auto").strip()
+    lowered = raw.lower()
+    if lowered == "auto":
+        if importlib.util.find_spec("sentence_transformers") is not None:
+            return BGE_SMALL
+        return LSA_MODEL_NAME
+    return _ALIASES.get(lowered, raw)
+
+
+@lru_cache(maxsize=2)
+def load_sentence_transformer(model_name: str):
+    """Load a sentence-transformers model once per process."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+def _query_key(query: str) -> str:
+    return " ".join(str(query or "").lower().split())
+
+
+class Embedder(Protocol):
+    name: str
+    # True when query encoding is cheap enough to run inline, uncached.
+    inline: bool
+    cache: QueryCache | None
+
+    def embed_corpus(self, corpus: Corpus) -> np.ndarray: ...
+    def embed_documents(self, docs: list[str], corpus: Corpus) -> np.ndarray: ...
+    def cached_query(self, query: str) -> np.ndarray | None: ...
+    def embed_query(self, query: str, corpus: Corpus, *, use_cache: bool = True) -> np.ndarray: ...
+
+
+class SentenceTransformerEmbedder:
+    """Embeds with a sentence-transformers model, loaded on first use.
+
+    Query embeddings are kept in a bounded, non-expiring LRU keyed on the
+    lowercased, whitespace-collapsed query text: they depend only on the
+    text and the model, so registry reloads keep them valid.
+    """
+
+    inline = False
+
+    def __init__(self, model_name: str, *, cache_size: int = 1024) -> None:
+        self.name = model_name
+        self.cache = QueryCache(maxsize=cache_size, ttl=None) if int(cache_size) > 0 else None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            return load_sentence_transformer(self.name)
+
+    def embed_corpus(self, corpus: Corpus) -> np.ndarray:
+        model = self.model
+        return corpus.embeddings(
+            self.name, lambda docs: model.encode(docs, normalize_embeddings=True)
+        )
+
+    def embed_documents(self, docs: list[str], corpus: Corpus) -> np.ndarray:
+        """Embed documents added after ``corpus`` was embedded."""
+        with timing.stage("dense_encode"):
+            vectors = self.model.encode(docs, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def cached_query(self, query: str) -> np.ndarray | None:
+        if self.cache is None:
+            return None
+        q_vec = self.cache.get(_query_key(query))
+        if q_vec is not None:
+            timing.count("embedding_cache_hit")
+        return q_vec
+
+    def embed_query(self, query: str, corpus: Corpus, *, use_cache: bool = True) -> np.ndarray:
+        with timing.stage("dense_encode"):
+            q = self.model.encode([query], normalize_embeddings=True)
+        q_vec = np.asarray(q[0], dtype=np.float32)
+        if use_cache and self.cache is not None:
+            timing.count("embedding_cache_miss")
+            self.cache.put(_query_key(query), q_vec)
+        return q_vec
+
+
+class LSAEmbedder:
+    """Built-in NumPy LSA embeddings fitted to each corpus (see :mod:`.lsa`)."""
+
+    inline = True
+    cache = None
+
+    def __init__(self, dims: int = DEFAULT_LSA_DIMS) -> None:
+        self.name = LSA_MODEL_NAME
+        self.dims = dims
+
+    def embed_corpus(self, corpus: Corpus) -> np.ndarray:
+        return corpus.lsa(self.dims).doc_vectors
+
+    def embed_documents(self, docs: list[str], corpus: Corpus) -> np.ndarray:
+        """Fold new documents into the LSA space fitted on ``corpus``."""
+        with timing.stage("dense_encode"):
+            return corpus.lsa(self.dims).encode(docs)
+
+    def cached_query(self, query: str) -> np.ndarray | None:
+        return None
+
+    def embed_query(self, query: str, corpus: Corpus, *, use_cache: bool = True) -> np.ndarray:
+        with timing.stage("dense_encode"):
+            return corpus.lsa(self.dims).encode([query])[0]
+
+
+def get_embedder(name: str | None = None) -> Embedder:
+    """Return the process-wide embedder for ``name`` (resolved as in :func:`resolve_dense_model`)."""
+    return _embedder_for(resolve_dense_model(name))
+
+
+@lru_cache(maxsize=4)
+def _embedder_for(resolved: str) -> Embedder:
+    if resolved == LSA_MODEL_NAME:
+        return LSAEmbedder()
+    return SentenceTransformerEmbedder(resolved)
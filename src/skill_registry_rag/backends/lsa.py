@@ -0,0 +1,161 @@
+"""Torch-free dense embeddings: latent semantic analysis over the card corpus.
+
+A truncated SVD of the TF-IDF card/term matrix maps cards and queries into
+one low-dimensional space. Card vectors are computed once per corpus; a query
+vector is the TF-IDF-weighted sum of a few rows of a static term table, so
+encoding costs microseconds and needs only NumPy.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Callable, Iterable, Mapping
+
+import numpy as np
+
+from .sparse import SparseIndex, Vocabulary
+
+LSA_MODEL_NAME = "lsa"
+LSA_VERSION = 1
+DEFAULT_LSA_DIMS = 128
+
+# Sparse products are computed in blocks of about this many matrix entries
+# to bound temporary memory on large catalogs.
+_BLOCK = 1 << 22
+# Gathering a posting row costs roughly as much as this many dense
+# multiply-adds, so denser blocks go through BLAS instead.
+_GATHER_COST = 150
+
+
+class _CSR:
+    """Minimal row-compressed sparse matrix supporting ``self @ dense``."""
+
+    __slots__ = ("data", "indices", "indptr", "n_cols")
+
+    def __init__(
+        self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, n_cols: int
+    ) -> None:
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data.astype(np.float32)
+        self.n_cols = n_cols
+
+    def matmul(self, dense: np.ndarray) -> np.ndarray:
+        dense = np.asarray(dense, dtype=np.float32)
+        n_rows = len(self.indptr) - 1
+        out = np.zeros((n_rows, dense.shape[1]), dtype=np.float32)
+        if len(self.indices) * _GATHER_COST > n_rows * self.n_cols:
+            # Dense enough: expand row blocks and let BLAS do the product.
+            step = max(1, _BLOCK // max(self.n_cols, 1))
+            for start in range(0, n_rows, step):
+                end = min(start + step, n_rows)
+                lo, hi = int(self.indptr[start]), int(self.indptr[end])
+                block = np.zeros((end - start, self.n_cols), dtype=np.float32)
+                rows = np.repeat(np.arange(end - start), np.diff(self.indptr[start : end + 1]))
+                block[rows, self.indices[lo:hi]] = self.data[lo:hi]
+                out[start:end] = block @ dense
+            return out
+
+        row_of = np.repeat(np.arange(n_rows), np.diff(self.indptr))
+        step = max(1, _BLOCK // max(dense.shape[1], 1))
+        for start in range(0, len(self.indices), step):
+            end = min(start + step, len(self.indices))
+            block = dense[self.indices[start:end]] * self.data[start:end, None]
+            # Rows are sorted, so each row's entries are contiguous in the block.
+            rows, firsts = np.unique(row_of[start:end], return_index=True)
+            out[rows] += np.add.reduceat(block, firsts, axis=0)
+        return out
+
+
+def _orthonormal(matrix: np.ndarray) -> np.ndarray:
+    q, _ = np.linalg.qr(matrix)
+    return q
+
+
+def build_lsa(
+    sparse: SparseIndex, *, dims: int = DEFAULT_LSA_DIMS, seed: int = 0, power_iters: int = 2
+) -> dict[str, np.ndarray]:
+    """Fit LSA on the postings of ``sparse``.
+
+    Returns ``doc_vectors`` (cards x dims, L2-normalized) and
+    ``term_vectors`` (terms x dims, IDF folded in), both float32.
+    """
+    n_docs, n_terms = sparse.n_docs, len(sparse.vocab)
+    k = max(1, min(int(dims), n_docs - 1, n_terms - 1)) if n_docs > 1 and n_terms > 1 else 1
+
+    # TF-IDF with sublinear tf and smoothed idf, rows L2-normalized.
+    df = np.diff(sparse.post_offsets).astype(np.float64)
+    idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+    post_terms = np.repeat(np.arange(n_terms), np.diff(sparse.post_offsets))
+    weights = (1.0 + np.log(np.asarray(sparse.post_tfs, dtype=np.float64))) * idf[post_terms]
+    post_docs = np.asarray(sparse.post_docs)
+    norms = np.sqrt(np.bincount(post_docs, weights=weights * weights, minlength=n_docs))
+    weights = weights / np.where(norms > 0, norms, 1.0)[post_docs]
+
+    # X^T is the postings as stored (term-major); X is the same entries
+    # reordered by document.
+    xt = _CSR(np.asarray(sparse.post_offsets), post_docs, weights, n_docs)
+    by_doc = np.argsort(post_docs, kind="stable")
+    doc_indptr = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(post_docs, minlength=n_docs), out=doc_indptr[1:])
+    x = _CSR(doc_indptr, post_terms[by_doc], weights[by_doc], n_terms)
+
+    # Randomized range finder (Halko et al.) followed by an exact SVD of
+    # the small projected matrix.
+    rng = np.random.default_rng(seed)
+    rank = min(k + 10, n_docs, n_terms)
+    q = _orthonormal(x.matmul(rng.standard_normal((n_terms, rank))))
+    for _ in range(power_iters):
+        q = _orthonormal(x.matmul(_orthonormal(xt.matmul(q))))
+    b_t = xt.matmul(q)  # (Q^T X)^T, terms x rank
+    u_b, s, vt_b = np.linalg.svd(b_t.T, full_matrices=False)
+    u_b, s, v = u_b[:, :k], s[:k], vt_b[:k].T
+
+    doc_vectors = (q @ u_b) * s
+    lengths = np.linalg.norm(doc_vectors, axis=1, keepdims=True)
+    doc_vectors = doc_vectors / np.where(lengths > 0, lengths, 1.0)
+    # Folding a query in is q_tfidf @ V; pre-multiplying V by idf leaves only
+    # the sublinear tf weight to apply at query time.
+    term_vectors = v * idf[:, None]
+    return {
+        "doc_vectors": doc_vectors.astype(np.float32),
+        "term_vectors": term_vectors.astype(np.float32),
+    }
+
+
+class LSAEncoder:
+    """Query encoder over a fitted LSA term table.
+
+    Exposes ``encode(texts, normalize_embeddings=True)`` like a
+    sentence-transformers model so backends can use either interchangeably.
+    """
+
+    name = LSA_MODEL_NAME
+
+    def __init__(
+        self,
+        vocab: Vocabulary,
+        arrays: Mapping[str, np.ndarray],
+        tokenizer: Callable[[str], list[str]],
+    ) -> None:
+        self.vocab = vocab
+        self.term_vectors = arrays["term_vectors"]
+        self.doc_vectors = arrays["doc_vectors"]
+        self._tokenize = tokenizer
+
+    def encode(self, texts: Iterable[str], normalize_embeddings: bool = True) -> np.ndarray:
+        rows = [self._encode_one(text, normalize_embeddings) for text in texts]
+        if not rows:
+            return np.empty((0, self.term_vectors.shape[1]), dtype=np.float32)
+        return np.vstack(rows)
+
+    def _encode_one(self, text: str, normalize: bool) -> np.ndarray:
+        vec = np.zeros(self.term_vectors.shape[1], dtype=np.float32)
+        ids = self.vocab.encode(self._tokenize(text))
+        for tid, tf in Counter(ids.tolist()).items():
+            vec += (1.0 + np.log(tf)) * self.term_vectors[tid]
+        if normalize:
+            length = float(np.linalg.norm(vec))
+            if length > 0:
+                vec /= length
+        return vec
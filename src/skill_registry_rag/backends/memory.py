@@ -2,157 +2,565 @@
 
 from __future__ import annotations
 
-import re
+import logging
+import threading
+from dataclasses import dataclass, field, replace
+from itertools import islice
+from pathlib import Path
 from typing import Optional
 
 import numpy as np
-from rank_bm25 import BM25Okapi
 
+from .. import deadline, timing
+from ..cache import QueryCache
+from ..corpus import Corpus, compose_doc, derive_fingerprint, tokenize
 from ..models import ExpertCard, RetrievalHit
+from ._pool import submit
+from .embedders import Embedder, get_embedder
+from .shards import default_shards, sharded_top_k
+from .sparse import IncrementalSparseIndex, SparseIndex
 
+logger = logging.getLogger(__name__)
 
-def _tokenize(text: str) -> list[str]:
-    return re.findall(r"[a-zA-Z0-9_\.]+", str(text or "").lower())
+# Compact once the changes since the last full build reach this many, or
+# this share of the live cards, whichever is larger.
+_COMPACT_MIN_CHANGES = 64
+_COMPACT_RATIO = 0.25
+
+
+@dataclass(frozen=True, slots=True)
+class _DenseState:
+    embedder: Embedder
+    embeddings: np.ndarray
+    corpus: Corpus
+
+
+@dataclass(frozen=True, slots=True)
+class _IndexView:
+    """Everything a query reads, swapped as one object on every change.
+
+    ``cards`` and the dense embedding rows are addressed by slot; removed
+    slots stay in place, marked dead in ``alive``, until compaction.
+    """
+
+    cards: list[ExpertCard]
+    sparse: SparseIndex | IncrementalSparseIndex | None
+    version: str = ""
+    slots: dict[str, int] = field(default_factory=dict)
+    alive: Optional[np.ndarray] = None  # None while every slot is live
+    dense: Optional[_DenseState] = None
+    segment: Optional[Path] = None  # published sparse segment, when sharding
+
+    @property
+    def n_live(self) -> int:
+        return len(self.slots)
+
+
+_EMPTY_VIEW = _IndexView(cards=[], sparse=None)
 
 
 def _rrf(ranks: list[np.ndarray], n_docs: int, k: int = 60) -> np.ndarray:
     scores = np.zeros(n_docs, dtype=np.float32)
     for order in ranks:
-        for rank, idx in enumerate(order, start=1):
-            scores[int(idx)] += 1.0 / (k + rank)
+        scores[np.asarray(order)] += 1.0 / (k + np.arange(1, len(order) + 1, dtype=np.float32))
     return scores
 
 
 class InMemoryBackend:
-    """BM25 + optional dense retrieval, fully in-process."""
+    """BM25 + optional dense retrieval, fully in-process.
 
-    def __init__(self, *, use_dense: bool = False) -> None:
+    The BM25 postings and card embeddings come from a shared
+    :class:`~skill_registry_rag.corpus.Corpus`. A corpus built here
+    publishes them as read-only segments keyed by registry fingerprint under
+    ``segment_dir`` (default ``SKILLMESH_SEGMENT_DIR``, else
+    ``$SKILLMESH_DATA_DIR/segments``, else ``~/.skillmesh/segments``), and later
+    constructions indexing the same cards, in any process, memory-map those
+    segments instead of building a private copy.
+
+    ``dense_model`` (default ``SKILLMESH_DENSE_MODEL``) picks the dense
+    encoder: the built-in NumPy ``"lsa"`` embeddings or a
+    sentence-transformers model such as ``"bge-small"``. The encoder is the
+    process-wide :func:`~.embedders.get_embedder` instance unless an
+    ``embedder`` is passed, so backends share the model and its
+    query-embedding cache. With
+    ``background_dense`` the model load and card embedding run on a
+    background thread; until they finish, queries are answered sparse-only
+    (``dense_score=None``, ``mode="sparse"``) and the dense state is then
+    swapped in atomically.
+
+    :meth:`upsert` and :meth:`remove` change single cards without
+    re-indexing the rest: BM25 statistics are updated incrementally, only
+    the changed cards are embedded, and a background compaction folds the
+    changes into a fresh index once they add up.
+
+    With ``shards`` (default ``SKILLMESH_SHARDS``) above 1, sparse-only
+    queries are scored by that many worker processes, each over a range of
+    the cards, and the per-shard top-k merged; the workers memory-map the
+    published BM25 segment. :meth:`query_batch` sends a whole batch to each
+    shard in one task. Hybrid queries, indexes with pending upserts, and
+    corpora whose segments could not be published score in-process.
+    """
+
+    def __init__(
+        self,
+        *,
+        use_dense: bool = False,
+        segment_dir: str | Path | None = None,
+        dense_model: str | None = None,
+        embedder: Embedder | None = None,
+        background_dense: bool = False,
+        shards: int | None = None,
+    ) -> None:
         self.use_dense = use_dense
-        self._cards: list[ExpertCard] = []
-        self._doc_texts: list[str] = []
-        self._tokens: list[list[str]] = []
-        self._bm25: Optional[BM25Okapi] = None
-        self._dense_model = None
-        self._dense_embeddings: Optional[np.ndarray] = None
+        self.embedder = (embedder or get_embedder(dense_model)) if use_dense else None
+        self.dense_model_name = self.embedder.name if self.embedder is not None else None
+        self._segment_dir = segment_dir
+        self.background_dense = bool(background_dense)
+        self.shards = default_shards() if shards is None else max(0, int(shards))
+        # Read once per query and replaced wholesale, never mutated, so a
+        # query sees a consistent set of cards, postings and embeddings.
+        self._view = _EMPTY_VIEW
+        self._dense_status = "off"
+        self._dense_thread: Optional[threading.Thread] = None
+        self._compact_thread: Optional[threading.Thread] = None
+        self._generation = 0
+        # Serializes writers; readers never take it.
+        self._lock = threading.Lock()
+
+    @property
+    def _cards(self) -> list[ExpertCard]:
+        return self._view.cards
+
+    @property
+    def _bm25(self) -> SparseIndex | IncrementalSparseIndex | None:
+        return self._view.sparse
+
+    @property
+    def _dense(self) -> Optional[_DenseState]:
+        return self._view.dense
+
+    @_dense.setter
+    def _dense(self, state: Optional[_DenseState]) -> None:
+        self._view = replace(self._view, dense=state)
 
     # ------------------------------------------------------------------
     # RetrievalBackend interface
     # ------------------------------------------------------------------
 
-    def index(self, cards: list[ExpertCard]) -> None:
-        self._cards = cards
-        self._doc_texts = [self._compose_doc(c) for c in cards]
-        self._tokens = [_tokenize(d) for d in self._doc_texts]
-        self._bm25 = BM25Okapi(self._tokens) if self._tokens else None
-        self._dense_model = None
-        self._dense_embeddings = None
-        if self.use_dense:
-            self._init_dense()
+    def index(self, cards: list[ExpertCard], *, corpus: Corpus | None = None) -> None:
+        if cards and corpus is None:
+            corpus = Corpus(cards, segment_dir=self._segment_dir)
+        with self._lock:
+            self._generation += 1
+            self._dense_status = "off"
+            if not cards:
+                self._view = _EMPTY_VIEW
+                return
+            assert corpus is not None
+            self._view = _IndexView(
+                cards=list(cards),
+                sparse=corpus.sparse,
+                version=corpus.fingerprint,
+                slots={card.id: i for i, card in enumerate(cards)},
+                segment=self._shard_segment(corpus),
+            )
+        if not self.use_dense:
+            return
+        self._dense_status = "loading"
+        if self.background_dense:
+            self._dense_thread = threading.Thread(
+                target=self._load_dense,
+                args=(corpus, self._generation),
+                name="skillmesh-dense-init",
+                daemon=True,
+            )
+            self._dense_thread.start()
+        else:
+            self._load_dense(corpus, self._generation)
+
+    @property
+    def embedding_cache(self) -> QueryCache | None:
+        return self.embedder.cache if self.embedder is not None else None
+
+    @property
+    def dense_status(self) -> str:
+        """One of ``off``, ``loading``, ``ready`` or ``failed``."""
+        return self._dense_status
+
+    def wait_dense(self, timeout: float | None = None) -> bool:
+        """Block until background dense loading finishes; return True if dense is ready."""
+        thread = self._dense_thread
+        if thread is not None:
+            thread.join(timeout)
+        return self._dense_status == "ready"
+
+    def upsert(self, cards: list[ExpertCard]) -> None:
+        """Add ``cards``, replacing any indexed card with the same id."""
+        cards = list({card.id: card for card in cards}.values())
+        if not cards:
+            return
+        if not self._view.cards:
+            self.index(cards)
+            return
+        with timing.stage("tokenize"):
+            token_lists = [tokenize(compose_doc(card)) for card in cards]
+        with self._lock:
+            view = self._view
+            replaced = [view.slots[card.id] for card in cards if card.id in view.slots]
+            sparse, new_slots = self._incremental(view).apply(add=token_lists, remove=replaced)
+            slots = dict(view.slots)
+            slots.update((card.id, slot) for card, slot in zip(cards, new_slots))
+            view = replace(
+                view,
+                cards=view.cards + cards,
+                sparse=sparse,
+                version=derive_fingerprint(view.version, upserted=cards),
+                slots=slots,
+                alive=sparse.alive,
+                segment=None,
+            )
+            self._view = replace(view, dense=self._extend_dense(view, view.dense))
+        self._maybe_compact()
+
+    def remove(self, card_ids: list[str]) -> None:
+        """Drop the cards with these ids; unknown ids are ignored."""
+        with self._lock:
+            view = self._view
+            slots = dict(view.slots)
+            dropped = [slots.pop(card_id) for card_id in card_ids if card_id in slots]
+            if not dropped:
+                return
+            sparse, _ = self._incremental(view).apply(remove=dropped)
+            self._view = replace(
+                view,
+                sparse=sparse,
+                version=derive_fingerprint(view.version, removed=card_ids),
+                slots=slots,
+                alive=sparse.alive,
+                segment=None,
+            )
+        self._maybe_compact()
+
+    def compact(self) -> bool:
+        """Rebuild the index over the live cards, folding in upserts and removals.
+
+        Runs off the lock, so queries and further changes proceed meanwhile;
+        returns False if there was nothing to compact or a change landed
+        first (the next change will try again).
+        """
+        view = self._view
+        if not isinstance(view.sparse, IncrementalSparseIndex):
+            return False
+        live = np.flatnonzero(view.alive) if view.alive is not None else np.arange(len(view.cards))
+        cards = [view.cards[i] for i in live]
+        corpus = Corpus(cards, fingerprint=view.version, segment_dir=self._segment_dir)
+        with timing.stage("compact"):
+            sparse = corpus.sparse
+        with self._lock:
+            current = self._view
+            if current.sparse is not view.sparse:
+                return False
+            dense = current.dense
+            if dense is not None:
+                dense = _DenseState(dense.embedder, dense.embeddings[live], dense.corpus)
+            self._view = _IndexView(
+                cards=cards,
+                sparse=sparse,
+                version=view.version,
+                slots={card.id: i for i, card in enumerate(cards)},
+                dense=dense,
+                segment=self._shard_segment(corpus),
+            )
+        return True
+
+    def query_batch(self, texts: list[str], top_k: int = 3) -> list[list[RetrievalHit]]:
+        """Answer several queries; with sharding, each shard scores the whole batch at once."""
+        view = self._view
+        if view.segment is None or view.dense is not None or not texts:
+            return [self.query(text, top_k) for text in texts]
+        top_k = max(1, min(int(top_k), min(20, view.n_live)))
+        with timing.stage("tokenize"):
+            queries = [view.sparse.encode_query(tokenize(text)) for text in texts]
+        ranked = self._shard_rank(view, queries, top_k)
+        if ranked is None:
+            return [self.query(text, top_k) for text in texts]
+        return [self._sparse_hits(view, docs, raw, top_k) for docs, raw in ranked]
 
     def query(self, text: str, top_k: int = 3) -> list[RetrievalHit]:
-        if not self._cards:
+        view = self._view
+        if not view.n_live:
             return []
-        top_k = max(1, min(int(top_k), min(20, len(self._cards))))
+        top_k = max(1, min(int(top_k), min(20, view.n_live)))
 
-        sparse = self._sparse_scores(text)
-        dense = self._dense_scores(text)
+        state = view.dense
+        if state is None and view.alive is None and isinstance(view.sparse, SparseIndex):
+            return self._sparse_top_k(text, view, top_k)
+        # Encode the query on a worker thread while BM25 scores on this one;
+        # the encoder releases the GIL, so the two overlap.
+        q_vec = state.embedder.cached_query(text) if state is not None else None
+        pending = None
+        if q_vec is None and state is not None:
+            if state.embedder.inline:
+                q_vec = self._encode_query(text, state)
+            else:
+                pending = submit(self._encode_query, text, state)
+        sparse = self._sparse_scores(text, view)
+        if pending is not None:
+            # Past the request's deadline, answer sparse-only.
+            q_vec = deadline.optional_result(pending, "dense")
+        dense = self._dense_scores(q_vec, state, view.alive)
+        mode = "sparse" if dense is None else "hybrid"
+        alive = view.alive
 
-        sparse_rank = np.argsort(-sparse)
-        if dense is None:
-            hybrid = sparse
-        else:
-            dense_rank = np.argsort(-dense)
-            hybrid = _rrf([sparse_rank, dense_rank], n_docs=len(self._cards))
-
-        idx = np.argsort(-hybrid)[:top_k]
-        hits: list[RetrievalHit] = []
-        for i in idx:
-            dense_score = None if dense is None else float(dense[int(i)])
-            hits.append(
-                RetrievalHit(
-                    card=self._cards[int(i)],
-                    score=float(hybrid[int(i)]),
-                    sparse_score=float(sparse[int(i)]),
-                    dense_score=dense_score,
+        with timing.stage("fusion"):
+            sparse_rank = np.argsort(-sparse)
+            if alive is not None:
+                sparse_rank = sparse_rank[alive[sparse_rank]]
+            if dense is None:
+                hybrid = sparse
+            else:
+                dense_rank = np.argsort(-dense)
+                if alive is not None:
+                    dense_rank = dense_rank[alive[dense_rank]]
+                hybrid = _rrf([sparse_rank, dense_rank], n_docs=len(view.cards))
+
+            idx = np.argsort(-hybrid)
+            if alive is not None:
+                idx = idx[alive[idx]]
+            hits: list[RetrievalHit] = []
+            for i in idx[:top_k]:
+                dense_score = None if dense is None else float(dense[int(i)])
+                hits.append(
+                    RetrievalHit(
+                        card=view.cards[int(i)],
+                        score=float(hybrid[int(i)]),
+                        sparse_score=float(sparse[int(i)]),
+                        dense_score=dense_score,
+                        mode=mode,
+                    )
                 )
-            )
         return hits
 
+    def dense_rank(
+        self, text: str, top_k: int = 3, *, use_cache: bool = True
+    ) -> Optional[list[tuple[ExpertCard, float]]]:
+        """The ``top_k`` cards by dense similarity alone, with their normalized scores.
+
+        ``None`` while dense retrieval is not ready or when the query cannot
+        be encoded. ``use_cache=False`` runs the encoder even for a cached query.
+        """
+        view = self._view
+        state = view.dense
+        if state is None or not view.n_live:
+            return None
+        q_vec = self._encode_query(text, state, use_cache=use_cache)
+        scores = self._dense_scores(q_vec, state, view.alive)
+        if scores is None:
+            return None
+        order = np.argsort(-scores, kind="stable")
+        if view.alive is not None:
+            order = order[view.alive[order]]
+        return [(view.cards[int(i)], float(scores[int(i)])) for i in order[: max(0, top_k)]]
+
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
 
+    def _load_dense(self, corpus: Corpus, generation: int) -> None:
+        state = self._build_dense(corpus)
+        with self._lock:
+            if generation != self._generation:
+                return  # re-indexed meanwhile; this result is stale
+            view = self._view
+            if state is not None:
+                # Cards upserted or compacted away while loading: realign the
+                # rows with the current slots, embedding only the new cards.
+                if view.cards[: len(corpus)] != corpus.cards:
+                    state = self._rebase_dense(view, state, corpus)
+                state = self._extend_dense(view, state)
+            self._view = replace(view, dense=state)
+            self._dense_status = "ready" if state is not None else "failed"
+
     @staticmethod
-    def _compose_doc(card: ExpertCard) -> str:
-        input_contract_text = ", ".join(
-            f"{k}:{v}" for k, v in card.input_contract.items()
-        )
-        metadata_text = ", ".join(f"{k}:{v}" for k, v in card.metadata.items())
-        return "\n".join(
-            [
-                card.id,
-                card.title,
-                card.domain,
-                card.description,
-                "tags: " + ", ".join(card.tags),
-                "tool_hints: " + ", ".join(card.tool_hints),
-                "examples: " + " | ".join(card.examples),
-                "aliases: " + ", ".join(card.aliases),
-                "dependencies: " + ", ".join(card.dependencies),
-                "output_artifacts: " + ", ".join(card.output_artifacts),
-                "quality_checks: " + ", ".join(card.quality_checks),
-                "constraints: " + ", ".join(card.constraints),
-                "input_contract: " + input_contract_text,
-                "risk_level: " + card.risk_level,
-                "maturity: " + card.maturity,
-                "metadata: " + metadata_text,
-                card.instruction_text[:2000],
-            ]
-        )
+    def _incremental(view: _IndexView) -> IncrementalSparseIndex:
+        if isinstance(view.sparse, IncrementalSparseIndex):
+            return view.sparse
+        assert view.sparse is not None
+        return IncrementalSparseIndex(view.sparse)
 
-    def _init_dense(self) -> None:
+    def _rebase_dense(
+        self, view: _IndexView, state: _DenseState, corpus: Corpus
+    ) -> Optional[_DenseState]:
+        """Reorder rows of ``state`` (one per ``corpus`` card) into the slots of ``view``."""
+        rows = {id(card): i for i, card in enumerate(corpus.cards)}
+        order = np.asarray([rows.get(id(card), -1) for card in view.cards], dtype=np.int64)
+        known = order >= 0
+        embeddings = np.zeros((len(order), state.embeddings.shape[1]), dtype=np.float32)
+        embeddings[known] = state.embeddings[order[known]]
+        missing = np.flatnonzero(~known)
+        if len(missing):
+            try:
+                docs = [compose_doc(view.cards[i]) for i in missing]
+                embeddings[missing] = state.embedder.embed_documents(docs, state.corpus)
+            except Exception:
+                logger.debug("Dense model %s unavailable", self.dense_model_name, exc_info=True)
+                return None
+        return _DenseState(state.embedder, embeddings, state.corpus)
+
+    def _extend_dense(
+        self, view: _IndexView, state: Optional[_DenseState]
+    ) -> Optional[_DenseState]:
+        """Embed the cards in ``view`` that have no row in ``state`` yet."""
+        if state is None:
+            return None
+        missing = view.cards[len(state.embeddings):]
+        if not missing:
+            return state
         try:
-            from sentence_transformers import SentenceTransformer
+            docs = [compose_doc(card) for card in missing]
+            vectors = state.embedder.embed_documents(docs, state.corpus)
+        except Exception:
+            logger.warning(
+                "Dense model %s failed on upserted cards; serving sparse-only",
+                self.dense_model_name, exc_info=True,
+            )
+            self._dense_status = "failed"
+            return None
+        embeddings = np.vstack([state.embeddings, np.asarray(vectors, dtype=np.float32)])
+        return _DenseState(state.embedder, embeddings, state.corpus)
+
+    def _maybe_compact(self) -> None:
+        sparse = self._view.sparse
+        if not isinstance(sparse, IncrementalSparseIndex):
+            return
+        if sparse.changes < max(_COMPACT_MIN_CHANGES, _COMPACT_RATIO * sparse.n_live):
+            return
+        thread = self._compact_thread
+        if thread is not None and thread.is_alive():
+            return
+        self._compact_thread = threading.Thread(
+            target=self.compact, name="skillmesh-compact", daemon=True
+        )
+        self._compact_thread.start()
 
-            model = SentenceTransformer("BAAI/bge-small-en-v1.5")
-            embs = model.encode(self._doc_texts, normalize_embeddings=True)
-            self._dense_model = model
-            self._dense_embeddings = np.asarray(embs, dtype=np.float32)
+    def _build_dense(self, corpus: Corpus) -> Optional[_DenseState]:
+        assert self.embedder is not None
+        try:
+            return _DenseState(self.embedder, self.embedder.embed_corpus(corpus), corpus)
         except Exception:
-            self._dense_model = None
-            self._dense_embeddings = None
+            logger.debug("Dense model %s unavailable", self.dense_model_name, exc_info=True)
+            return None
 
-    def _sparse_scores(self, query: str) -> np.ndarray:
-        n = len(self._cards)
+    def _sparse_scores(self, query: str, view: _IndexView) -> np.ndarray:
+        n = len(view.cards)
         if n == 0:
             return np.array([], dtype=np.float32)
-        q_tokens = _tokenize(query)
-        if not q_tokens:
+        index = view.sparse
+        if index is None:
+            return np.zeros(n, dtype=np.float32)
+        if isinstance(index, IncrementalSparseIndex):
+            with timing.stage("tokenize"):
+                tokens = tokenize(query)
+            with timing.stage("bm25"):
+                scores = np.asarray(index.get_scores(tokens), dtype=np.float32)
+                mx = float(np.max(scores)) if len(scores) else 0.0
+                return scores / mx if mx > 0 else scores
+        with timing.stage("tokenize"):
+            q_ids = index.encode_query(tokenize(query))
+        if not len(q_ids):
             return np.zeros(n, dtype=np.float32)
 
-        if self._bm25 is not None:
-            scores = np.asarray(self._bm25.get_scores(q_tokens), dtype=np.float32)
+        with timing.stage("bm25"):
+            scores = np.asarray(index.get_scores_for_ids(q_ids), dtype=np.float32)
             mx = float(np.max(scores)) if len(scores) else 0.0
             return scores / mx if mx > 0 else scores
 
-        q_set = set(q_tokens)
-        overlaps = []
-        for toks in self._tokens:
-            d_set = set(toks)
-            inter = len(q_set & d_set)
-            union = len(q_set | d_set)
-            overlaps.append((inter / union) if union else 0.0)
-        return np.asarray(overlaps, dtype=np.float32)
-
-    def _dense_scores(self, query: str) -> Optional[np.ndarray]:
-        if self._dense_model is None or self._dense_embeddings is None:
+    def _sparse_top_k(self, text: str, view: _IndexView, top_k: int) -> list[RetrievalHit]:
+        """Sparse-only query answered from the top-k postings, never scoring the full corpus."""
+        index = view.sparse
+        with timing.stage("tokenize"):
+            q_ids = index.encode_query(tokenize(text))
+        ranked = self._shard_rank(view, [q_ids], top_k) if view.segment is not None else None
+        if ranked is not None:
+            docs, raw = ranked[0]
+        else:
+            with timing.stage("bm25"):
+                docs, raw = index.top_k(q_ids, top_k)
+        return self._sparse_hits(view, docs, raw, top_k)
+
+    def _shard_segment(self, corpus: Corpus) -> Optional[Path]:
+        if self.shards <= 1:
+            return None
+        segment = corpus.sparse_segment
+        if segment is None:
+            logger.warning("BM25 segment not published; scoring %d cards in-process", len(corpus))
+        return segment
+
+    def _shard_rank(
+        self, view: _IndexView, queries: list[np.ndarray], top_k: int
+    ) -> Optional[list[tuple[np.ndarray, np.ndarray]]]:
+        try:
+            return sharded_top_k(view.segment, len(view.cards), self.shards, queries, top_k)
+        except Exception:
+            logger.warning("Sharded scoring failed; scoring in-process", exc_info=True)
+            # Stop fanning out for this index (its segment may have been pruned).
+            with self._lock:
+                if self._view is view:
+                    self._view = replace(view, segment=None)
+            return None
+
+    def _sparse_hits(
+        self, view: _IndexView, docs: np.ndarray, raw: np.ndarray, top_k: int
+    ) -> list[RetrievalHit]:
+        # Max-normalised as in the full path: the best score is the first hit's.
+        scores = raw.astype(np.float32)
+        if len(scores) and scores[0] > 0:
+            scores = scores / float(scores[0])
+
+        with timing.stage("fusion"):
+            picked = docs.tolist()
+            if len(picked) < top_k:
+                # Fewer matches than requested: pad with zero-score cards, as
+                # the full ranking would.
+                seen = set(picked)
+                picked += islice((i for i in range(len(view.cards)) if i not in seen),
+                                 top_k - len(picked))
+            hits: list[RetrievalHit] = []
+            for rank, i in enumerate(picked):
+                score = float(scores[rank]) if rank < len(scores) else 0.0
+                hits.append(
+                    RetrievalHit(
+                        card=view.cards[i],
+                        score=score,
+                        sparse_score=score,
+                        dense_score=None,
+                        mode="sparse",
+                    )
+                )
+        return hits
+
+    def _encode_query(
+        self, query: str, state: _DenseState, *, use_cache: bool = True
+    ) -> Optional[np.ndarray]:
+        try:
+            return state.embedder.embed_query(query, state.corpus, use_cache=use_cache)
+        except Exception:
+            return None
+
+    def _dense_scores(
+        self,
+        q_vec: Optional[np.ndarray],
+        state: Optional[_DenseState],
+        alive: Optional[np.ndarray] = None,
+    ) -> Optional[np.ndarray]:
+        if q_vec is None or state is None:
             return None
         try:
-            q = self._dense_model.encode([query], normalize_embeddings=True)
-            q_vec = np.asarray(q[0], dtype=np.float32)
-            scores = self._dense_embeddings @ q_vec
-            mn = float(np.min(scores))
-            mx = float(np.max(scores))
+            with timing.stage("dense_score"):
+                scores = state.embeddings @ q_vec
+            live = scores if alive is None else scores[alive]
+            mn = float(np.min(live))
+            mx = float(np.max(live))
             if mx - mn < 1e-9:
                 return np.zeros_like(scores, dtype=np.float32)
             return ((scores - mn) / (mx - mn)).astype(np.float32)
@@ -0,0 +1,210 @@
+"""Read-only index segments shared between processes through memory-mapped files.
+
+A segment is a directory of ``.npy`` arrays plus ``meta.json``. Builders
+write it under a temporary name and publish it with an atomic rename, so a
+segment is either complete or absent. Readers memory-map the arrays
+read-only; every process attached to the same segment shares one copy of the
+pages through the OS page cache instead of holding a private index.
+
+The store doubles as a persistent index cache: opening a segment marks it
+used, and publishing prunes the least recently used segments once the store
+outgrows its size limit.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_FORMAT = 1
+DEFAULT_SEGMENT_CACHE_MB = 1024
+# Scratch directories older than this are left over from crashed writers.
+_STALE_SCRATCH_SECONDS = 3600.0
+
+
+def default_segment_dir() -> Path | None:
+    """Return the segment directory, or None if segments are disabled.
+
+    ``SKILLMESH_SEGMENT_DIR`` if set (``off`` disables segments), else
+    ``segments`` under ``SKILLMESH_DATA_DIR`` (next to Chroma's files, which
+    leave it alone), else ``~/.skillmesh/segments``. Segments never go
+    outside the directory an operator configured.
+    """
+    raw = os.environ.get("SKILLMESH_SEGMENT_DIR", "").strip()
+    if raw.lower() in {"off", "0", "none", "false"}:
+        return None
+    if raw:
+        return Path(raw).expanduser()
+    data_dir = os.environ.get("SKILLMESH_DATA_DIR", "").strip()
+    if data_dir:
+        return Path(data_dir).expanduser() / "segments"
+    return Path.home() / ".skillmesh" / "segments"
+
+
+def _default_max_bytes() -> int:
+    raw = os.environ.get("SKILLMESH_SEGMENT_CACHE_MB", "").strip()
+    if not raw:
+        return DEFAULT_SEGMENT_CACHE_MB * 1024 * 1024
+    try:
+        return int(float(raw) * 1024 * 1024)
+    except ValueError as exc:
+        raise ValueError(
+            f"SKILLMESH_SEGMENT_CACHE_MB must be a number of megabytes, got: {raw!r}"
+        ) from exc
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for entry in os.scandir(path):
+        try:
+            total += entry.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+class Segment:
+    __slots__ = ("arrays", "meta", "path")
+
+    def __init__(self, path: Path, arrays: dict[str, np.ndarray], meta: dict[str, Any]) -> None:
+        self.path = path
+        self.arrays = arrays
+        self.meta = meta
+
+
+class SegmentStore:
+    """Directory of published segments addressed by key (e.g. a fingerprint).
+
+    ``max_bytes`` (default ``SKILLMESH_SEGMENT_CACHE_MB``, 1024 MB) caps the
+    total size; see :meth:`prune`.
+    """
+
+    def __init__(self, root: str | Path, *, max_bytes: int | None = None) -> None:
+        self.root = Path(root).expanduser()
+        self.max_bytes = _default_max_bytes() if max_bytes is None else int(max_bytes)
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key
+
+    def open(self, key: str) -> Segment | None:
+        """Attach to a published segment, or return None if it does not exist."""
+        path = self.path_for(key)
+        meta_path = path / "meta.json"
+        if not meta_path.exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if meta.get("format") != SEGMENT_FORMAT:
+            return None
+        try:
+            arrays = {
+                name: np.load(path / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+                for name in meta.get("arrays", [])
+            }
+            # The meta file's mtime records the last use, for LRU pruning.
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None  # pruned by another process while opening
+        return Segment(path, arrays, meta)
+
+    def publish(
+        self, key: str, arrays: Mapping[str, np.ndarray], meta: Mapping[str, Any]
+    ) -> Segment:
+        """Write ``arrays`` as segment ``key`` and return it memory-mapped.
+
+        If another process published the same key first, its segment is kept
+        and returned instead. If the store cannot be written, the arrays are
+        returned in memory.
+        """
+        existing = self.open(key)
+        if existing is not None:
+            return existing
+
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = Path(tempfile.mkdtemp(prefix=f".tmp-{key}-", dir=self.root))
+        except OSError:
+            logger.warning("Cannot write index segments under %s", self.root, exc_info=True)
+            return Segment(self.path_for(key), dict(arrays), dict(meta))
+        try:
+            for name, array in arrays.items():
+                np.save(tmp / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+            full_meta = {**meta, "format": SEGMENT_FORMAT, "arrays": sorted(arrays)}
+            (tmp / "meta.json").write_text(json.dumps(full_meta), encoding="utf-8")
+            try:
+                os.rename(tmp, self.path_for(key))
+            except OSError:
+                # Lost the race to a concurrent builder; use its segment.
+                shutil.rmtree(tmp, ignore_errors=True)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            logger.warning("Cannot write index segment %s", key, exc_info=True)
+            return Segment(self.path_for(key), dict(arrays), dict(meta))
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        published = self.open(key)
+        if published is None:
+            raise OSError(f"Failed to publish index segment: {self.path_for(key)}")
+        self.prune(keep=key)
+        return published
+
+    def prune(self, *, keep: str | None = None) -> list[str]:
+        """Delete least recently used segments until the store fits ``max_bytes``.
+
+        Returns the deleted keys. ``keep`` is never deleted. Processes that
+        have a deleted segment mapped keep reading it; the OS frees its pages
+        once they unmap it.
+        """
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return []
+        now = time.time()
+        segments: list[tuple[float, int, str]] = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                try:
+                    if now - entry.stat().st_mtime > _STALE_SCRATCH_SECONDS:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                except OSError:
+                    pass
+                continue
+            try:
+                last_used = os.stat(Path(entry.path) / "meta.json").st_mtime
+                size = _dir_size(Path(entry.path))
+            except OSError:
+                continue
+            segments.append((last_used, size, entry.name))
+
+        total = sum(size for _, size, _ in segments)
+        removed: list[str] = []
+        for _, size, name in sorted(segments):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            # Move it aside first so readers never see a half-deleted segment.
+            trash = self.root / f".trash-{name}-{os.getpid()}"
+            try:
+                os.rename(self.root / name, trash)
+            except OSError:
+                continue
+            shutil.rmtree(trash, ignore_errors=True)
+            total -= size
+            removed.append(name)
+        return removed
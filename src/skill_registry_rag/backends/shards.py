@@ -0,0 +1,139 @@
+"""Sharded BM25 scoring on a pool of worker processes.
+
+A shard is a contiguous range of document ids. Every worker memory-maps the
+same published sparse segment (see :mod:`.segments`), so the postings are
+shared through the OS page cache rather than copied per process, and any
+worker can score any shard. Shards keep the global IDF and length
+normalization, so merging the per-shard top-k gives exactly the
+single-process top-k.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import numpy as np
+
+from .. import timing
+from .segments import SegmentStore
+from .sparse import SparseIndex
+
+# Sparse indexes a worker keeps attached, least recently used first.
+_WORKER_INDEXES = 4
+
+_executor: ProcessPoolExecutor | None = None
+_executor_size = 0
+_executor_lock = threading.Lock()
+_attached: OrderedDict[str, SparseIndex] = OrderedDict()
+
+
+def default_shards() -> int:
+    """Shard count from ``SKILLMESH_SHARDS``; 0 or 1 (the default) scores in-process."""
+    raw = os.getenv("SKILLMESH_SHARDS", "").strip()
+    if not raw:
+        return 0
+    if raw.lower() == "auto":
+        return os.cpu_count() or 1
+    try:
+        return max(0, int(raw))
+    except ValueError as exc:
+        raise ValueError(
+            f"SKILLMESH_SHARDS must be an integer or 'auto', got: {raw!r}"
+        ) from exc
+
+
+def shard_bounds(n_docs: int, shards: int) -> list[tuple[int, int]]:
+    """Split ``range(n_docs)`` into at most ``shards`` contiguous, non-empty ranges."""
+    edges = np.linspace(0, n_docs, max(1, min(shards, n_docs)) + 1).astype(int).tolist()
+    return [(lo, hi) for lo, hi in zip(edges, edges[1:]) if hi > lo]
+
+
+def sharded_top_k(
+    segment: Path,
+    n_docs: int,
+    shards: int,
+    queries: list[np.ndarray],
+    k: int,
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Top ``k`` ``(docs, scores)`` per query, scored shard by shard on the worker pool.
+
+    ``segment`` is the published sparse segment of the index the term ids
+    in ``queries`` were encoded with. Each shard scores the whole batch in
+    one task.
+    """
+    bounds = shard_bounds(n_docs, shards)
+    pool = _pool(shards)
+    with timing.stage("shard_fanout"):
+        try:
+            futures = [
+                pool.submit(_score_shard, str(segment), lo, hi, queries, k) for lo, hi in bounds
+            ]
+            parts = [future.result() for future in futures]
+        except BrokenProcessPool:
+            _discard(pool)  # a worker died; start afresh on the next call
+            raise
+    timing.count("shard_tasks", len(bounds))
+    with timing.stage("shard_merge"):
+        return [_merge([part[i] for part in parts], k) for i in range(len(queries))]
+
+
+def _merge(parts: list[tuple[np.ndarray, np.ndarray]], k: int) -> tuple[np.ndarray, np.ndarray]:
+    docs = np.concatenate([docs for docs, _ in parts])
+    scores = np.concatenate([scores for _, scores in parts])
+    order = np.lexsort((docs, -scores))[:k]
+    return docs[order], scores[order]
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    """The shared worker pool, grown to at least ``workers`` processes."""
+    global _executor, _executor_size
+    workers = max(1, workers)
+    if _executor is None or _executor_size < workers:
+        with _executor_lock:
+            if _executor is None or _executor_size < workers:
+                if _executor is not None:
+                    _executor.shutdown(wait=False)
+                # Spawned, not forked: the parent runs threads (dense loading,
+                # compaction, query encoding) that a fork could catch mid-lock.
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                _executor_size = workers
+    return _executor
+
+
+def _discard(pool: ProcessPoolExecutor) -> None:
+    global _executor, _executor_size
+    with _executor_lock:
+        if _executor is pool:
+            _executor, _executor_size = None, 0
+    pool.shutdown(wait=False)
+
+
+def _score_shard(
+    segment: str, lo: int, hi: int, queries: list[np.ndarray], k: int
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Worker side: score documents ``lo <= doc < hi`` for every query in the batch."""
+    index = _attach(segment)
+    return [index.top_k_in_range(term_ids, k, lo, hi) for term_ids in queries]
+
+
+def _attach(segment: str) -> SparseIndex:
+    index = _attached.get(segment)
+    if index is not None:
+        _attached.move_to_end(segment)
+        return index
+    path = Path(segment)
+    opened = SegmentStore(path.parent).open(path.name)
+    if opened is None:
+        raise FileNotFoundError(f"Sparse index segment is gone: {segment}")
+    index = _attached[segment] = SparseIndex(opened.arrays, opened.meta)
+    while len(_attached) > _WORKER_INDEXES:
+        _attached.popitem(last=False)
+    return index
@@ -0,0 +1,561 @@
+"""Array-backed BM25 index whose state can live in shared read-only memory."""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any
+
+import numpy as np
+
+from .. import timing
+
+# Bump when term hashing or array layout changes so persisted indexes rebuild.
+SPARSE_INDEX_VERSION = 3
+# Below this many postings for the query terms, top_k just scores them all.
+_PRUNE_MIN_POSTINGS = 30_000
+# Postings per query term scored up front by SparseIndex.top_k to set its threshold.
+_TOP_K_SEED = 16
+# Relative error allowed for float32 impacts when bounding scores.
+_IMPACT_SLACK = 1e-5
+# Rough cost of exactly scoring one pruned candidate, per query term, in
+# postings of a full scan; above it top_k scores every posting instead.
+_PRUNED_POSTING_COST = 8
+
+
+def term_hash(term: str) -> int:
+    """Stable 64-bit hash of a term, identical across processes and runs."""
+    return int.from_bytes(
+        hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+class Vocabulary:
+    """Maps terms to int32 ids without keeping the term strings.
+
+    Ids are positions in a sorted array of 64-bit term hashes, so the
+    vocabulary is one flat array that can be memory-mapped and shared.
+    """
+
+    __slots__ = ("term_hashes",)
+
+    def __init__(self, term_hashes: np.ndarray) -> None:
+        self.term_hashes = term_hashes
+
+    def __len__(self) -> int:
+        return len(self.term_hashes)
+
+    def term_id(self, term: str) -> int:
+        h = np.uint64(term_hash(term))
+        pos = int(np.searchsorted(self.term_hashes, h))
+        if pos < len(self.term_hashes) and self.term_hashes[pos] == h:
+            return pos
+        return -1
+
+    def encode(self, tokens: Iterable[str]) -> np.ndarray:
+        """Return the int32 ids of the known ``tokens``, in order; unknown terms are dropped."""
+        ids = self.lookup(np.fromiter((term_hash(t) for t in tokens), dtype=np.uint64))
+        return ids[ids >= 0].astype(np.int32)
+
+    def lookup(self, hashes: np.ndarray) -> np.ndarray:
+        """Return the id of each term hash, or -1 for hashes not in the vocabulary."""
+        if not len(hashes) or not len(self.term_hashes):
+            return np.full(len(hashes), -1, dtype=np.int64)
+        pos = np.searchsorted(self.term_hashes, hashes).astype(np.int64)
+        pos[pos >= len(self.term_hashes)] = 0
+        return np.where(self.term_hashes[pos] == hashes, pos, -1)
+
+
+class TokenizedCorpus:
+    """Documents as one flat int32 term-id array plus int64 offsets."""
+
+    __slots__ = ("offsets", "term_ids")
+
+    def __init__(self, term_ids: np.ndarray, offsets: np.ndarray) -> None:
+        self.term_ids = term_ids
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def doc(self, doc_id: int) -> np.ndarray:
+        return self.term_ids[int(self.offsets[doc_id]) : int(self.offsets[doc_id + 1])]
+
+    def doc_lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @classmethod
+    def build(cls, token_lists: Iterable[Sequence[str]]) -> tuple[Vocabulary, TokenizedCorpus]:
+        """Encode documents one at a time, so token lists never coexist in memory."""
+        provisional: dict[str, int] = {}
+        flat = array("i")
+        offsets = array("q", [0])
+        for tokens in token_lists:
+            for term in tokens:
+                tid = provisional.get(term)
+                if tid is None:
+                    tid = provisional[term] = len(provisional)
+                flat.append(tid)
+            offsets.append(len(flat))
+
+        # Renumber provisional ids into sorted-hash order.
+        hashes = np.fromiter(
+            (term_hash(t) for t in provisional), dtype=np.uint64, count=len(provisional)
+        )
+        del provisional
+        order = np.argsort(hashes, kind="stable")
+        remap = np.empty(len(order), dtype=np.int32)
+        remap[order] = np.arange(len(order), dtype=np.int32)
+        if len(flat):
+            term_ids = remap[np.frombuffer(flat, dtype=np.int32)]
+        else:
+            term_ids = np.empty(0, dtype=np.int32)
+        offsets_arr = np.frombuffer(offsets, dtype=np.int64).copy()
+        return Vocabulary(hashes[order]), cls(term_ids, offsets_arr)
+
+
+class SparseIndex:
+    """BM25 (Okapi) over CSR postings.
+
+    Scores match ``rank_bm25.BM25Okapi`` (same k1/b/epsilon and negative-IDF
+    flooring), but all state is a handful of flat NumPy arrays: the
+    vocabulary, the tokenized corpus and the postings. No per-term or
+    per-token Python objects survive the build, and the arrays can be
+    memory-mapped from disk and shared between processes.
+
+    Each term's postings are stored twice: by document, for exact scoring,
+    and by descending BM25 contribution ("impact"), so :meth:`top_k` can
+    stop reading once no unread document can reach the current top k.
+    """
+
+    def __init__(self, arrays: Mapping[str, np.ndarray], meta: Mapping[str, Any]) -> None:
+        self.vocab = Vocabulary(arrays["term_hashes"])
+        self.corpus = TokenizedCorpus(arrays["doc_terms"], arrays["doc_offsets"])
+        self.post_offsets = arrays["post_offsets"]
+        self.post_docs = arrays["post_docs"]
+        self.post_tfs = arrays["post_tfs"]
+        self.idf = arrays["idf"]
+        self.doc_norm = arrays["doc_norm"]
+        self.imp_docs = arrays["imp_docs"]
+        self.imp_scores = arrays["imp_scores"]
+        self.k1 = float(meta["k1"])
+        self.b = float(meta.get("b", 0.75))
+        self.epsilon = float(meta.get("epsilon", 0.25))
+        self.n_docs = int(meta["n_docs"])
+
+    @classmethod
+    def build(
+        cls,
+        token_lists: Iterable[Sequence[str]],
+        *,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> SparseIndex:
+        vocab, corpus = TokenizedCorpus.build(token_lists)
+        n_docs = len(corpus)
+        n_terms = len(vocab)
+        doc_len = corpus.doc_lengths().astype(np.float64)
+
+        # One (term, doc) key per token; unique keys are the postings, their
+        # multiplicities the term frequencies, already sorted by term then doc.
+        doc_of_token = np.repeat(np.arange(n_docs, dtype=np.int64), corpus.doc_lengths())
+        keys = corpus.term_ids.astype(np.int64) * max(n_docs, 1) + doc_of_token
+        unique_keys, tfs = np.unique(keys, return_counts=True)
+        post_terms = unique_keys // max(n_docs, 1)
+        post_docs = (unique_keys % max(n_docs, 1)).astype(np.int32)
+        post_tfs = tfs.astype(np.float32)
+        post_offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(post_terms, minlength=n_terms), out=post_offsets[1:])
+
+        # Same IDF as BM25Okapi: negative values are floored to epsilon * mean IDF.
+        df = np.diff(post_offsets).astype(np.float64)
+        idf = np.log(n_docs - df + 0.5) - np.log(df + 0.5)
+        if n_terms:
+            floor = epsilon * (float(idf.sum()) / n_terms)
+            idf[idf < 0] = floor
+
+        avgdl = float(doc_len.sum()) / n_docs if n_docs else 0.0
+        if avgdl > 0:
+            doc_norm = k1 * (1 - b + b * doc_len / avgdl)
+        else:
+            doc_norm = np.full(n_docs, k1 * (1 - b), dtype=np.float64)
+
+        # Impact-ordered copy of the postings: within each term, documents by
+        # descending contribution, so a prefix holds the term's best documents.
+        tf64 = post_tfs.astype(np.float64)
+        impact = idf[post_terms] * (tf64 * (k1 + 1) / (tf64 + doc_norm[post_docs]))
+        order = np.lexsort((-impact, post_terms))
+
+        arrays = {
+            "term_hashes": vocab.term_hashes,
+            "doc_terms": corpus.term_ids,
+            "doc_offsets": corpus.offsets,
+            "post_offsets": post_offsets,
+            "post_docs": post_docs,
+            "post_tfs": post_tfs,
+            "idf": idf,
+            "doc_norm": doc_norm,
+            "imp_docs": post_docs[order],
+            "imp_scores": impact[order].astype(np.float32),
+        }
+        return cls(arrays, {"k1": k1, "b": b, "epsilon": epsilon, "n_docs": n_docs})
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {
+            "term_hashes": self.vocab.term_hashes,
+            "doc_terms": self.corpus.term_ids,
+            "doc_offsets": self.corpus.offsets,
+            "post_offsets": self.post_offsets,
+            "post_docs": self.post_docs,
+            "post_tfs": self.post_tfs,
+            "idf": self.idf,
+            "doc_norm": self.doc_norm,
+            "imp_docs": self.imp_docs,
+            "imp_scores": self.imp_scores,
+        }
+
+    def meta(self) -> dict[str, Any]:
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "epsilon": self.epsilon,
+            "n_docs": self.n_docs,
+            "version": SPARSE_INDEX_VERSION,
+        }
+
+    def term_id(self, term: str) -> int:
+        return self.vocab.term_id(term)
+
+    def encode_query(self, query_tokens: Iterable[str]) -> np.ndarray:
+        return self.vocab.encode(query_tokens)
+
+    def get_scores(self, query_tokens: Iterable[str]) -> np.ndarray:
+        return self.get_scores_for_ids(self.vocab.encode(query_tokens))
+
+    def get_scores_for_ids(self, term_ids: np.ndarray) -> np.ndarray:
+        scores = np.zeros(self.n_docs, dtype=np.float64)
+        k1 = self.k1
+        for tid in term_ids:
+            start, end = int(self.post_offsets[tid]), int(self.post_offsets[tid + 1])
+            docs = self.post_docs[start:end]
+            tf = self.post_tfs[start:end].astype(np.float64)
+            scores[docs] += self.idf[tid] * (tf * (k1 + 1) / (tf + self.doc_norm[docs]))
+        return scores
+
+    def get_candidate_scores(self, query_tokens: Iterable[str]) -> tuple[np.ndarray, np.ndarray]:
+        return self.get_candidate_scores_for_ids(self.vocab.encode(query_tokens))
+
+    def get_candidate_scores_for_ids(
+        self, term_ids: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(docs, scores)`` for the documents containing any of ``term_ids``.
+
+        ``docs`` is sorted; every other document scores 0. Work is
+        proportional to the postings read, not to the corpus size.
+        """
+        if not len(term_ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        starts = self.post_offsets[term_ids]
+        ends = self.post_offsets[np.asarray(term_ids) + 1]
+        docs = np.concatenate([self.post_docs[s:e] for s, e in zip(starts, ends)])
+        tf = np.concatenate([self.post_tfs[s:e] for s, e in zip(starts, ends)]).astype(np.float64)
+        idf = np.repeat(self.idf[term_ids], ends - starts)
+        k1 = self.k1
+        contrib = idf * (tf * (k1 + 1) / (tf + self.doc_norm[docs]))
+        uniq, inverse = np.unique(docs, return_inverse=True)
+        return uniq.astype(np.int64), np.bincount(inverse, weights=contrib, minlength=len(uniq))
+
+    def top_k(self, term_ids: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the ``k`` best ``(docs, scores)``, by descending score, without full scoring.
+
+        Dynamic pruning over the impact-ordered postings, in the spirit of
+        MaxScore. A first pass scores the head of every term's postings; the
+        k-th best score so far is the threshold. Terms are then read whole,
+        cheapest first, until the upper bounds of the unread ones sum below
+        the threshold: those can only add to documents found elsewhere, never
+        lift one into the top k. Scores are exact BM25, equal to
+        :meth:`get_scores_for_ids`. Documents scoring 0 are never returned,
+        so fewer than ``k`` may come back.
+        """
+        if not len(term_ids) or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        # A repeated query term counts once per occurrence, as in get_scores.
+        terms, weights = np.unique(np.asarray(term_ids, dtype=np.int64), return_counts=True)
+        starts = self.post_offsets[terms].astype(np.int64)
+        lengths = self.post_offsets[terms + 1].astype(np.int64) - starts
+        if int(lengths.sum()) < _PRUNE_MIN_POSTINGS:
+            return self._full_top_k(term_ids, k)
+        # Impacts are stored as float32; inflating the bounds keeps them safe.
+        bounds = self.imp_scores[starts].astype(np.float64) * weights * (1 + _IMPACT_SLACK)
+        # Terms whose best impact is 0 (e.g. in every document) cannot change the top k.
+        useful = (bounds > 0) & (lengths > 0)
+        if not useful.all():
+            terms, weights, starts, lengths, bounds = (
+                column[useful] for column in (terms, weights, starts, lengths, bounds)
+            )
+            if not len(terms):
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        head = np.minimum(lengths, max(_TOP_K_SEED, k))
+        docs = self._union(starts, head)
+        scores = self._exact_scores(terms, weights, docs)
+        threshold = 0.0
+        if len(docs) >= k:
+            threshold = float(np.partition(scores, len(docs) - k)[len(docs) - k])
+
+        # Read whole postings lists, cheapest per unit of bound first, until the
+        # unread terms' bounds alone fall below the threshold; the last list is
+        # read only down to the impact a document needs there. Any document
+        # outside what was read scores below the threshold.
+        depth = np.zeros_like(lengths)
+        remaining = float(bounds.sum())
+        for t in np.argsort(lengths / bounds, kind="stable").tolist():
+            if remaining < threshold:
+                break
+            remaining -= bounds[t]
+            need = (threshold - remaining) / (weights[t] * (1 + _IMPACT_SLACK))
+            if need <= 0:
+                depth[t] = lengths[t]
+                continue
+            # Impacts descend, so their negations ascend; keep those reaching ``need``.
+            impacts = self.imp_scores[starts[t] : starts[t] + lengths[t]]
+            depth[t] = bisect_right(impacts, -need, key=lambda x: -x)
+            break
+        if int(depth.sum()) * len(terms) * _PRUNED_POSTING_COST > int(lengths.sum()):
+            # Too little pruned: scoring every posting is cheaper, and as exact.
+            return self._full_top_k(term_ids, k)
+        if (depth > head).any():
+            more = self._union(starts, depth)
+            more = more[~np.isin(more, docs, assume_unique=True)]
+            docs = np.concatenate([docs, more])
+            scores = np.concatenate([scores, self._exact_scores(terms, weights, more)])
+        timing.count("sparse_candidates", len(docs))
+        return self._best(docs, scores, k)
+
+    def top_k_in_range(
+        self, term_ids: np.ndarray, k: int, lo: int, hi: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Like :meth:`top_k`, over the documents ``lo <= doc < hi`` only (one shard).
+
+        Scores keep the index-wide IDF and length normalization, so the
+        top k of every shard together contain the index-wide top k.
+        """
+        scores = np.zeros(max(0, hi - lo), dtype=np.float64)
+        k1 = self.k1
+        for tid in term_ids:
+            start, end = int(self.post_offsets[tid]), int(self.post_offsets[tid + 1])
+            postings = self.post_docs[start:end]
+            first, last = np.searchsorted(postings, [lo, hi]).tolist()
+            docs = postings[first:last]
+            tf = self.post_tfs[start + first : start + last].astype(np.float64)
+            scores[docs - lo] += self.idf[tid] * (tf * (k1 + 1) / (tf + self.doc_norm[docs]))
+        docs = np.flatnonzero(scores)
+        scores = scores[docs]
+        if len(docs) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[keep], scores[keep]
+        return self._best(docs + lo, scores, k)
+
+    def _full_top_k(self, term_ids: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        full = self.get_scores_for_ids(term_ids)
+        docs = np.flatnonzero(full)
+        timing.count("sparse_candidates", len(docs))
+        scores = full[docs]
+        if len(docs) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[keep], scores[keep]
+        return self._best(docs, scores, k)
+
+    @staticmethod
+    def _best(docs: np.ndarray, scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        order = np.lexsort((docs, -scores))[:k]
+        order = order[scores[order] > 0]
+        return docs[order], scores[order]
+
+    def _union(self, starts: np.ndarray, depths: np.ndarray) -> np.ndarray:
+        """Sorted distinct docs in the first ``depths`` impact-ordered postings of each term."""
+        parts = [self.imp_docs[s : s + n] for s, n in zip(starts.tolist(), depths.tolist()) if n]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts)).astype(np.int64)
+
+    def _exact_scores(
+        self, terms: np.ndarray, weights: np.ndarray, docs: np.ndarray
+    ) -> np.ndarray:
+        """BM25 of ``docs`` (sorted) for the query ``terms``, via the doc-ordered postings."""
+        scores = np.zeros(len(docs), dtype=np.float64)
+        k1 = self.k1
+        for tid, weight in zip(terms.tolist(), weights.tolist()):
+            start, end = int(self.post_offsets[tid]), int(self.post_offsets[tid + 1])
+            postings = self.post_docs[start:end]
+            pos = np.searchsorted(postings, docs)
+            found = pos < len(postings)
+            found[found] = postings[pos[found]] == docs[found]
+            tf = self.post_tfs[start + pos[found]].astype(np.float64)
+            scores[found] += weight * self.idf[tid] * (
+                tf * (k1 + 1) / (tf + self.doc_norm[docs[found]])
+            )
+        return scores
+
+
+class IncrementalSparseIndex:
+    """BM25 over a read-only :class:`SparseIndex` plus documents added or removed since.
+
+    Documents are addressed by slot: base documents keep their positions,
+    added ones get new slots at the end, and removed slots score 0.
+    Document frequencies, the live document count and the total length are
+    maintained on every change, so scores equal those of a
+    :class:`SparseIndex` rebuilt over the live documents. Postings of added
+    documents are kept in dicts; once :attr:`changes` grows large, callers
+    should compact by rebuilding a :class:`SparseIndex`.
+
+    :meth:`apply` returns a new index and leaves this one untouched, so
+    readers holding a reference keep a consistent view during updates.
+    """
+
+    def __init__(self, base: SparseIndex) -> None:
+        self.base = base
+        self.k1, self.b, self.epsilon = base.k1, base.b, base.epsilon
+        self.alive = np.ones(base.n_docs, dtype=bool)
+        self.doc_len = base.corpus.doc_lengths().astype(np.float64)
+        self.base_df = np.diff(base.post_offsets).astype(np.int64)
+        self.n_live = base.n_docs
+        self.total_len = float(self.doc_len.sum())
+        self.changes = 0
+        # term hash -> {slot: tf}, for documents added after the base build
+        self._added: dict[int, dict[int, int]] = {}
+        self._added_terms: dict[int, list[int]] = {}
+        self._idf_floor: float | None = None
+
+    def __len__(self) -> int:
+        return len(self.alive)
+
+    def apply(
+        self, *, add: Iterable[Sequence[str]] = (), remove: Iterable[int] = ()
+    ) -> tuple[IncrementalSparseIndex, list[int]]:
+        """Return a copy with ``remove`` slots dropped and ``add`` documents appended.
+
+        Also returns the slots of the added documents. Copying costs the
+        per-slot and per-term arrays plus the postings added since the base
+        build, never the base postings.
+        """
+        new = copy.copy(self)
+        new.alive = self.alive.copy()
+        new.base_df = self.base_df.copy()
+        new._added = {h: dict(p) for h, p in self._added.items()}
+        new._added_terms = dict(self._added_terms)
+        new._remove(remove)
+        return new, new._add(add)
+
+    def _add(self, token_lists: Iterable[Sequence[str]]) -> list[int]:
+        start = len(self.alive)
+        lengths: list[float] = []
+        for offset, tokens in enumerate(token_lists):
+            slot = start + offset
+            counts = Counter(term_hash(t) for t in tokens)
+            for h, tf in counts.items():
+                self._added.setdefault(h, {})[slot] = tf
+            self._added_terms[slot] = list(counts)
+            lengths.append(float(len(tokens)))
+        self.alive = np.concatenate([self.alive, np.ones(len(lengths), dtype=bool)])
+        self.doc_len = np.concatenate([self.doc_len, np.asarray(lengths, dtype=np.float64)])
+        self.n_live += len(lengths)
+        self.total_len += sum(lengths)
+        self.changes += len(lengths)
+        self._idf_floor = None
+        return list(range(start, start + len(lengths)))
+
+    def _remove(self, slots: Iterable[int]) -> None:
+        for slot in slots:
+            slot = int(slot)
+            if not self.alive[slot]:
+                continue
+            self.alive[slot] = False
+            if slot < self.base.n_docs:
+                self.base_df[np.unique(self.base.corpus.doc(slot))] -= 1
+            else:
+                for h in self._added_terms.pop(slot):
+                    postings = self._added[h]
+                    del postings[slot]
+                    if not postings:
+                        del self._added[h]
+            self.n_live -= 1
+            self.total_len -= float(self.doc_len[slot])
+            self.changes += 1
+        self._idf_floor = None
+
+    def _idf(self, df: np.ndarray) -> np.ndarray:
+        n = self.n_live
+        return np.log(n - df + 0.5) - np.log(df + 0.5)
+
+    def idf_floor(self) -> float:
+        """``epsilon`` times the mean IDF over live terms, as in :meth:`SparseIndex.build`."""
+        if self._idf_floor is None:
+            df = self.base_df.astype(np.float64)
+            hashes = np.fromiter(self._added, dtype=np.uint64, count=len(self._added))
+            added_df = np.fromiter(
+                (len(p) for p in self._added.values()), dtype=np.float64, count=len(self._added)
+            )
+            ids = self.base.vocab.lookup(hashes)
+            in_base = ids >= 0
+            df[ids[in_base]] += added_df[in_base]
+            all_df = np.concatenate([df[df > 0], added_df[~in_base]])
+            self._idf_floor = (
+                self.epsilon * float(self._idf(all_df).mean()) if len(all_df) else 0.0
+            )
+        return self._idf_floor
+
+    def get_candidate_scores(self, query_tokens: Iterable[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(slots, scores)`` for the live documents matching any query token."""
+        hashes = np.fromiter((term_hash(t) for t in query_tokens), dtype=np.uint64)
+        ids = self.base.vocab.lookup(hashes)
+        avgdl = self.total_len / self.n_live if self.n_live else 0.0
+        k1, b = self.k1, self.b
+        docs_parts: list[np.ndarray] = []
+        contrib_parts: list[np.ndarray] = []
+        for h, tid in zip(hashes.tolist(), ids.tolist()):
+            added = self._added.get(h)
+            df = (int(self.base_df[tid]) if tid >= 0 else 0) + (len(added) if added else 0)
+            if df == 0:
+                continue
+            idf = float(self._idf(np.float64(df)))
+            if idf < 0:
+                idf = self.idf_floor()
+            if tid >= 0:
+                start, end = int(self.base.post_offsets[tid]), int(self.base.post_offsets[tid + 1])
+                docs = np.asarray(self.base.post_docs[start:end], dtype=np.int64)
+                tf = self.base.post_tfs[start:end].astype(np.float64)
+                live = self.alive[docs]
+                docs_parts.append(docs[live])
+                contrib_parts.append(self._contrib(idf, tf[live], docs[live], avgdl, k1, b))
+            if added:
+                docs = np.fromiter(added.keys(), dtype=np.int64, count=len(added))
+                tf = np.fromiter(added.values(), dtype=np.float64, count=len(added))
+                docs_parts.append(docs)
+                contrib_parts.append(self._contrib(idf, tf, docs, avgdl, k1, b))
+        if not docs_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        uniq, inverse = np.unique(np.concatenate(docs_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contrib_parts), minlength=len(uniq))
+        return uniq, scores
+
+    def _contrib(
+        self, idf: float, tf: np.ndarray, docs: np.ndarray, avgdl: float, k1: float, b: float
+    ) -> np.ndarray:
+        if avgdl > 0:
+            norm = k1 * (1 - b + b * self.doc_len[docs] / avgdl)
+        else:
+            norm = np.full(len(docs), k1 * (1 - b))
+        return idf * (tf * (k1 + 1) / (tf + norm))
+
+    def get_scores(self, query_tokens: Iterable[str]) -> np.ndarray:
+        """Scores for every slot; removed slots score 0."""
+        scores = np.zeros(len(self.alive), dtype=np.float64)
+        docs, values = self.get_candidate_scores(query_tokens)
+        scores[docs] = values
+        return scores
@@ -0,0 +1,532 @@
+"""SQLite FTS5 retrieval backend: persistent BM25 with only the standard library."""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .. import deadline, timing
+from ..cache import QueryCache
+from ..corpus import Corpus, compose_doc, derive_fingerprint, tokenize
+from ..models import ExpertCard, RetrievalHit
+from ._pool import submit
+from .embedders import Embedder, get_embedder
+from .memory import _rrf
+
+logger = logging.getLogger(__name__)
+
+# Bump when the table layout or tokenizer changes so stale files are rebuilt.
+SQLITE_SCHEMA_VERSION = 1
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS registries (
+    fingerprint TEXT PRIMARY KEY,
+    n_cards INTEGER NOT NULL,
+    built_at REAL NOT NULL  -- last built or attached to, for pruning
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('schema', '{SQLITE_SCHEMA_VERSION}');
+"""
+DEFAULT_SQLITE_MAX_REGISTRIES = 8
+# Keep ``_`` and ``.`` inside tokens, like :func:`~skill_registry_rag.corpus.tokenize`.
+_FTS_TOKENIZER = "unicode61 tokenchars '_.'"
+
+
+def default_sqlite_path() -> Path:
+    raw = os.environ.get("SKILLMESH_SQLITE_PATH", "").strip()
+    return Path(raw).expanduser() if raw else Path.home() / ".skillmesh" / "skillmesh.db"
+
+
+def _default_max_registries() -> int:
+    raw = os.environ.get("SKILLMESH_SQLITE_MAX_REGISTRIES", "").strip()
+    if not raw:
+        return DEFAULT_SQLITE_MAX_REGISTRIES
+    try:
+        return max(1, int(raw))
+    except ValueError as exc:
+        raise ValueError(
+            f"SKILLMESH_SQLITE_MAX_REGISTRIES must be an integer, got: {raw!r}"
+        ) from exc
+
+
+def _fts_table(fingerprint: str) -> str:
+    if not fingerprint.isalnum():
+        raise ValueError(f"Registry fingerprint must be alphanumeric, got: {fingerprint!r}")
+    return f"cards_fts_{fingerprint}"
+
+
+def _match_expression(query: str) -> str:
+    # Tokens are [a-z0-9_.]+, so double-quoting them is always safe.
+    terms = dict.fromkeys(tokenize(query))
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+class _StaleView(Exception):
+    """The table a query read was renamed by a change made in this process."""
+
+
+@dataclass(frozen=True, slots=True)
+class _IndexView:
+    """Cards by position and the table holding them, swapped as one object on every change.
+
+    Removed positions stay in ``cards``, marked dead in ``alive``, until the
+    next :meth:`SQLiteBackend.index`.
+    """
+
+    cards: list[ExpertCard] = field(default_factory=list)
+    slots: dict[str, int] = field(default_factory=dict)  # live card id -> position
+    alive: Optional[np.ndarray] = None  # None while every position is live
+    version: str = ""
+    table: str = ""
+    corpus: Optional[Corpus] = None
+    embeddings: Optional[np.ndarray] = None
+
+
+class SQLiteBackend:
+    """BM25 retrieval from an FTS5 index in a local SQLite file.
+
+    Each registry version gets its own FTS5 table, keyed by fingerprint, so
+    a process indexing cards that are already in the file only runs one
+    lookup: no tokenizing, no postings in Python memory. Several
+    registries can share a file without mixing their BM25 statistics. ``path`` defaults to
+    ``SKILLMESH_SQLITE_PATH`` (``~/.skillmesh/skillmesh.db``); pass
+    ``":memory:"`` for a throwaway index.
+
+    With ``use_dense`` the cards are also embedded through the shared
+    :class:`~.embedders.Embedder` and fused with the FTS5 ranking by
+    reciprocal rank fusion, as in :class:`~.memory.InMemoryBackend`.
+
+    :meth:`upsert` and :meth:`remove` edit the registry's FTS5 table in
+    place and re-key it under the derived registry version, so FTS5 keeps
+    the BM25 statistics current. A process still serving the old version
+    rebuilds its table on the next query.
+
+    Building a new version drops the tables of the least recently used
+    ones beyond ``max_registries`` (default
+    ``SKILLMESH_SQLITE_MAX_REGISTRIES``, 8), so the file does not grow with
+    every registry edit; see :meth:`prune`.
+
+    Queries are safe to run from many threads: each reads one immutable
+    snapshot of the cards and table name, and changes replace it whole.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: str | Path | None = None,
+        use_dense: bool = False,
+        dense_model: str | None = None,
+        embedder: Embedder | None = None,
+        sparse_candidates: int = 100,
+        max_registries: int | None = None,
+    ) -> None:
+        self.path = str(path) if path is not None else str(default_sqlite_path())
+        self.max_registries = (
+            _default_max_registries() if max_registries is None else max(1, int(max_registries))
+        )
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.use_dense = bool(use_dense)
+        self.embedder = (embedder or get_embedder(dense_model)) if self.use_dense else None
+        self._sparse_candidates = max(1, int(sparse_candidates))
+        # Writes go through one shared connection under ``_lock``; queries use
+        # a connection per thread, so under WAL they run concurrently (the
+        # sqlite3 module releases the GIL while a statement runs).
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers: list[sqlite3.Connection] = []
+        with self._lock:
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+        if row is None or int(row[0]) != SQLITE_SCHEMA_VERSION:
+            raise ValueError(
+                f"SQLite index {self.path} has schema {row[0] if row else None}, "
+                f"expected {SQLITE_SCHEMA_VERSION}; delete it to rebuild"
+            )
+
+        self._view = _IndexView()
+        self._dense_status = "off"
+
+    @property
+    def embedding_cache(self) -> QueryCache | None:
+        return self.embedder.cache if self.embedder is not None else None
+
+    @property
+    def dense_status(self) -> str:
+        return self._dense_status
+
+    def index(self, cards: list[ExpertCard], *, corpus: Corpus | None = None) -> None:
+        with self._write_lock:
+            self._index(cards, corpus)
+
+    def _index(self, cards: list[ExpertCard], corpus: Corpus | None) -> None:
+        self._dense_status = "off"
+        if not cards:
+            self._view = _IndexView()
+            return
+        if corpus is None:
+            corpus = Corpus(cards)
+        view = _IndexView(
+            cards=list(cards),
+            slots={card.id: i for i, card in enumerate(cards)},
+            version=corpus.fingerprint,
+            table=_fts_table(corpus.fingerprint),
+            corpus=corpus,
+        )
+        if self._is_indexed(corpus.fingerprint, len(cards)):
+            self._touch(corpus.fingerprint)
+        else:
+            self._build(corpus)
+        self._view = view
+        self.prune()
+
+        if self.embedder is not None:
+            try:
+                embeddings = self.embedder.embed_corpus(corpus)
+            except Exception:
+                logger.warning(
+                    "Dense model %s unavailable; serving sparse-only", self.embedder.name,
+                    exc_info=True,
+                )
+                self._dense_status = "failed"
+                return
+            self._view = replace(view, embeddings=embeddings)
+            self._dense_status = "ready"
+
+    def upsert(self, cards: list[ExpertCard]) -> None:
+        """Add ``cards``, replacing any indexed card with the same id."""
+        cards = list({card.id: card for card in cards}.values())
+        if not cards:
+            return
+        with self._write_lock:
+            view = self._view
+            if not view.table:
+                self._index(cards, None)
+                return
+            start = len(view.cards)
+            replaced = [view.slots[card.id] for card in cards if card.id in view.slots]
+            docs = [compose_doc(card) for card in cards]
+            rows = [(start + i, card.id, doc) for i, (card, doc) in enumerate(zip(cards, docs))]
+            slots = dict(view.slots)
+            slots.update((card.id, start + i) for i, card in enumerate(cards))
+            version = derive_fingerprint(view.version, upserted=cards)
+
+            embeddings = None
+            if view.embeddings is not None and self.embedder is not None:
+                try:
+                    vectors = self.embedder.embed_documents(docs, view.corpus)
+                    embeddings = np.vstack([view.embeddings, np.asarray(vectors, np.float32)])
+                except Exception:
+                    logger.warning(
+                        "Dense model %s failed on upserted cards; serving sparse-only",
+                        self.embedder.name, exc_info=True,
+                    )
+                    self._dense_status = "failed"
+            self._apply(
+                view.cards + cards, slots, version, embeddings, insert=rows, delete=replaced
+            )
+
+    def remove(self, card_ids: list[str]) -> None:
+        """Drop the cards with these ids; unknown ids are ignored."""
+        with self._write_lock:
+            view = self._view
+            slots = dict(view.slots)
+            dropped = [slots.pop(card_id) for card_id in card_ids if card_id in slots]
+            if not dropped:
+                return
+            version = derive_fingerprint(view.version, removed=card_ids)
+            self._apply(view.cards, slots, version, view.embeddings, delete=dropped)
+
+    def _apply(
+        self,
+        cards: list[ExpertCard],
+        slots: dict[str, int],
+        version: str,
+        embeddings: Optional[np.ndarray],
+        *,
+        insert: Sequence[tuple[int, str, str]] = (),
+        delete: Sequence[int] = (),
+    ) -> None:
+        """Move the index from the current version to ``version``.
+
+        Edits the current table and renames it, unless ``version`` is
+        already in the file (another process applied the same change) or
+        the current table is gone (rebuilt from ``cards``). Caller holds
+        ``self._write_lock``.
+        """
+        view = self._view
+        old_table, table = view.table, _fts_table(version)
+        rebuild = False
+        with timing.stage("sqlite_update"), self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not self._registered(version, len(slots)):
+                    if self._registered(view.version, len(view.slots)):
+                        if delete:
+                            marks = ",".join("?" * len(delete))
+                            self._conn.execute(
+                                f"DELETE FROM {old_table} WHERE position IN ({marks})",
+                                list(delete),
+                            )
+                        self._conn.executemany(
+                            f"INSERT INTO {old_table} (position, card_id, body) VALUES (?, ?, ?)",
+                            insert,
+                        )
+                        self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+                        self._conn.execute(f"ALTER TABLE {old_table} RENAME TO {table}")
+                        self._conn.execute(
+                            "DELETE FROM registries WHERE fingerprint = ?", (view.version,)
+                        )
+                        self._register(version, len(slots))
+                    else:
+                        rebuild = True
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        alive = np.zeros(len(cards), dtype=bool)
+        alive[list(slots.values())] = True
+        self._view = _IndexView(
+            cards=cards,
+            slots=slots,
+            alive=None if alive.all() else alive,
+            version=version,
+            table=table,
+            corpus=view.corpus,
+            embeddings=embeddings,
+        )
+        if rebuild:
+            self._rebuild(self._view)
+            self.prune()
+
+    def _rebuild(self, view: _IndexView) -> None:
+        """Rebuild the table of ``view``'s version from its cards in memory."""
+        live = sorted(view.slots.values())
+        with timing.stage("sqlite_build"), self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not self._registered(view.version, len(live)):
+                    self._create_table(
+                        view.table,
+                        ((i, view.cards[i].id, compose_doc(view.cards[i])) for i in live),
+                    )
+                    self._register(view.version, len(live))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _registered(self, fingerprint: str, n_cards: int) -> bool:
+        # Caller holds self._lock.
+        row = self._conn.execute(
+            "SELECT n_cards FROM registries WHERE fingerprint = ?", (fingerprint,)
+        ).fetchone()
+        return row is not None and int(row[0]) == n_cards
+
+    def _register(self, fingerprint: str, n_cards: int) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO registries (fingerprint, n_cards, built_at) VALUES (?, ?, ?)",
+            (fingerprint, n_cards, time.time()),
+        )
+
+    def _create_table(self, table: str, rows: Iterable[tuple[int, str, str]]) -> None:
+        self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+        self._conn.execute(
+            f"CREATE VIRTUAL TABLE {table} USING fts5("
+            f"position UNINDEXED, card_id UNINDEXED, body, tokenize = \"{_FTS_TOKENIZER}\")"
+        )
+        self._conn.executemany(
+            f"INSERT INTO {table} (position, card_id, body) VALUES (?, ?, ?)", rows
+        )
+
+    def _touch(self, fingerprint: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE registries SET built_at = ? WHERE fingerprint = ?",
+                (time.time(), fingerprint),
+            )
+
+    def prune(self, *, keep: str | None = None) -> list[str]:
+        """Drop the tables of the least recently used versions beyond ``max_registries``.
+
+        Returns the dropped fingerprints. ``keep`` (default: the version
+        being served) is never dropped. A process still serving a dropped
+        version rebuilds its table on its next query.
+        """
+        keep = self._view.version if keep is None else keep
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT fingerprint FROM registries ORDER BY built_at DESC"
+                ).fetchall()
+                stale = [fp for (fp,) in rows[self.max_registries :] if fp != keep]
+                for fingerprint in stale:
+                    self._conn.execute(f"DROP TABLE IF EXISTS {_fts_table(fingerprint)}")
+                    self._conn.execute(
+                        "DELETE FROM registries WHERE fingerprint = ?", (fingerprint,)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return stale
+
+    def _is_indexed(self, fingerprint: str, n_cards: int) -> bool:
+        with self._lock:
+            return self._registered(fingerprint, n_cards)
+
+    def _build(self, corpus: Corpus) -> None:
+        fingerprint = corpus.fingerprint
+        table = _fts_table(fingerprint)
+        rows = (
+            (i, card.id, doc) for i, (card, doc) in enumerate(zip(corpus.cards, corpus.iter_docs()))
+        )
+        with timing.stage("sqlite_build"), self._lock:
+            # BEGIN IMMEDIATE takes the write lock, so concurrent processes
+            # indexing the same registry build it once.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._registered(fingerprint, len(corpus)):
+                    self._conn.execute("COMMIT")
+                    return
+                self._create_table(table, rows)
+                self._register(fingerprint, len(corpus))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _read(self, sql: str, params: tuple) -> list[tuple]:
+        """Run a read-only statement on this thread's connection."""
+        if self.path == ":memory:":
+            # Every connection to ":memory:" is a separate database.
+            with self._lock:
+                return self._conn.execute(sql, params).fetchall()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        return conn.execute(sql, params).fetchall()
+
+    def _sparse_hits(
+        self, view: _IndexView, query: str, limit: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Best ``limit`` FTS5 matches as (card positions, max-normalized scores)."""
+        with timing.stage("tokenize"):
+            expression = _match_expression(query)
+        if not expression:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        sql = (
+            f"SELECT position, bm25({view.table}) AS rank FROM {view.table} "
+            f"WHERE {view.table} MATCH ? ORDER BY rank LIMIT ?"
+        )
+        try:
+            with timing.stage("bm25"):
+                rows = self._read(sql, (expression, limit))
+        except sqlite3.OperationalError:
+            if self._view is not view:
+                raise _StaleView from None  # renamed by a concurrent upsert here
+            with self._write_lock:
+                if not self._is_indexed(view.version, len(view.slots)):
+                    # Another process moved the table to a newer version.
+                    self._rebuild(view)
+            with timing.stage("bm25"):
+                rows = self._read(sql, (expression, limit))
+        positions = np.fromiter((int(r[0]) for r in rows), dtype=np.int64, count=len(rows))
+        # bm25() is lower-is-better; flip it so higher is better, like the other backends.
+        scores = np.fromiter((-float(r[1]) for r in rows), dtype=np.float32, count=len(rows))
+        mx = float(scores.max()) if len(scores) else 0.0
+        return positions, (scores / mx if mx > 0 else scores)
+
+    def _dense_scores(self, view: _IndexView, query: str) -> Optional[np.ndarray]:
+        if view.embeddings is None or self.embedder is None:
+            return None
+        try:
+            q_vec = self.embedder.cached_query(query)
+            if q_vec is None and deadline.current() is None:
+                q_vec = self.embedder.embed_query(query, view.corpus)
+            elif q_vec is None:
+                # Past the request's deadline, answer sparse-only.
+                q_vec = deadline.optional_result(
+                    submit(self.embedder.embed_query, query, view.corpus), "dense"
+                )
+        except Exception:
+            return None
+        if q_vec is None:
+            return None
+        with timing.stage("dense_score"):
+            scores = np.asarray(view.embeddings @ q_vec, dtype=np.float32)
+        live = scores if view.alive is None else scores[view.alive]
+        mn, mx = float(live.min()), float(live.max())
+        if mx - mn < 1e-9:
+            return np.zeros_like(scores)
+        return (scores - mn) / (mx - mn)
+
+    def query(self, text: str, top_k: int = 3) -> list[RetrievalHit]:
+        try:
+            return self._query(self._view, text, top_k)
+        except _StaleView:
+            return self._query(self._view, text, top_k)
+
+    def _query(self, view: _IndexView, text: str, top_k: int) -> list[RetrievalHit]:
+        if not view.slots:
+            return []
+        n = len(view.cards)
+        top_k = max(1, min(int(top_k), min(20, len(view.slots))))
+        alive = view.alive
+
+        dense = self._dense_scores(view, text)
+        limit = top_k if dense is None else max(top_k, self._sparse_candidates)
+        positions, sparse_vals = self._sparse_hits(view, text, limit)
+        sparse = np.zeros(n, dtype=np.float32)
+        sparse[positions] = sparse_vals
+
+        with timing.stage("fusion"):
+            if dense is None:
+                # FTS5 already ranked the matches; pad with unmatched cards.
+                order = list(positions.tolist())
+                if len(order) < top_k:
+                    seen = set(order)
+                    order += [i for i in sorted(view.slots.values()) if i not in seen][
+                        : top_k - len(order)
+                    ]
+                hybrid = sparse
+            else:
+                dense_rank = np.argsort(-dense)
+                if alive is not None:
+                    dense_rank = dense_rank[alive[dense_rank]]
+                hybrid = _rrf([positions, dense_rank], n_docs=n)
+                order = np.argsort(-hybrid, kind="stable")[:top_k].tolist()
+            return [
+                RetrievalHit(
+                    card=view.cards[i],
+                    score=float(hybrid[i]),
+                    sparse_score=float(sparse[i]),
+                    dense_score=None if dense is None else float(dense[i]),
+                    mode="sparse" if dense is None else "hybrid",
+                )
+                for i in order[:top_k]
+            ]
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+            self._conn.close()
@@ -0,0 +1,490 @@
+"""Retrieval latency benchmarks over synthetic catalogs of increasing size.
+
+Synthetic cards are sampled from a real registry so field shapes, vocabulary
+and instruction sizes match production catalogs; only their number grows.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any
+
+from . import timing
+from .corpus import Corpus
+from .models import ToolCard
+from .registry import load_registry
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"[a-z][a-z0-9_-]{2,}")
+
+
+@dataclass(slots=True)
+class BenchResult:
+    cards: int
+    backend: str
+    dense: bool
+    status: str = "ok"
+    load_s: float | None = None
+    index_s: float | None = None
+    # Memory backend: a second index() that attaches to the segments the
+    # first one published instead of building them.
+    attach_s: float | None = None
+    p50_ms: float | None = None
+    p95_ms: float | None = None
+    p99_ms: float | None = None
+    qps: float | None = None
+    rss_mb: float | None = None
+    queries: int = 0
+    extra: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class RecallResult:
+    mode: str
+    model: str | None = None
+    status: str = "ok"
+    recall: float | None = None
+    mrr: float | None = None
+    encode_p50_ms: float | None = None
+    queries: int = 0
+
+
+def _rss_mb() -> float | None:
+    statm = Path("/proc/self/statm")
+    if statm.exists():
+        pages = int(statm.read_text().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and KiB elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(rank)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (rank - lo)
+
+
+def synthesize_catalog(
+    templates: list[ToolCard], n_cards: int, *, seed: int = 0
+) -> list[dict[str, Any]]:
+    """Return ``n_cards`` registry entries modelled on ``templates``.
+
+    Each entry copies the list/map shapes of a random template, mixes in
+    tags and sentences from other templates, and adds synthetic terms so the
+    vocabulary keeps growing with catalog size. Instruction text is inlined
+    (as in compiled registries) with lengths drawn from the templates.
+    """
+    if not templates:
+        raise ValueError("At least one template card is required.")
+    rng = random.Random(seed)
+    sentences = [
+        s.strip()
+        for card in templates
+        for s in _SENTENCE_SPLIT_RE.split(card.instruction_text)
+        if len(s.strip()) > 20
+    ] or ["Synthetic instruction sentence."]
+    words = sorted({w for card in templates for w in _WORD_RE.findall(card.description.lower())})
+    words = words or ["synthetic"]
+    lengths = [max(200, len(card.instruction_text)) for card in templates]
+    synthetic_terms = max(100, n_cards // 4)
+
+    entries: list[dict[str, Any]] = []
+    for i in range(n_cards):
+        base = templates[rng.randrange(len(templates))]
+        other = templates[rng.randrange(len(templates))]
+        term = f"term{rng.randrange(synthetic_terms)}"
+        extra_words = rng.sample(words, k=min(4, len(words)))
+
+        target_len = rng.choice(lengths)
+        parts: list[str] = [f"# {base.title} variant {i}"]
+        size = len(parts[0])
+        while size < target_len:
+            sentence = rng.choice(sentences)
+            parts.append(sentence)
+            size += len(sentence) + 1
+
+        entries.append(
+            {
+                "id": f"synthetic.{base.domain}-{i}",
+                "title": f"{base.title} {term}",
+                "domain": base.domain,
+                "instruction_file": f"instructions/synthetic-{i}.md",
+                "description": f"{base.description} {' '.join(extra_words)} {term}".strip(),
+                "tags": list(dict.fromkeys([*base.tags, *other.tags[:2], term])),
+                "tool_hints": list(base.tool_hints),
+                "examples": [*base.examples[:2], f"{other.title} with {term}"],
+                "aliases": [f"{base.id}-{i}"],
+                "dependencies": list(base.dependencies),
+                "input_contract": dict(base.input_contract),
+                "output_artifacts": list(base.output_artifacts),
+                "quality_checks": list(base.quality_checks),
+                "constraints": list(base.constraints),
+                "risk_level": base.risk_level,
+                "maturity": base.maturity,
+                "metadata": dict(base.metadata),
+                "instruction_text": "\n".join(parts),
+            }
+        )
+    return entries
+
+
+def _sample_queries(templates: list[ToolCard], n: int, *, seed: int) -> list[str]:
+    rng = random.Random(seed + 1)
+    pool = [ex for card in templates for ex in card.examples] or [
+        card.title for card in templates
+    ]
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def _backend_factory(backend: str, dense: bool, registry_path: Path) -> Callable[[], Any]:
+    if backend == "memory":
+        from .backends.memory import InMemoryBackend
+
+        # A fresh segment store per run: index_s always measures a build, and
+        # synthetic segments stay out of the user's persistent cache.
+        segment_dir = registry_path.with_name(
+            f"{registry_path.stem}-{'dense' if dense else 'sparse'}-segments"
+        )
+        return lambda: InMemoryBackend(use_dense=dense, segment_dir=segment_dir)
+    if backend == "chroma":
+        from .backends.chroma import ChromaBackend
+
+        return lambda: ChromaBackend(ephemeral=True, use_dense=dense)
+    if backend == "sqlite":
+        from .backends.sqlite import SQLiteBackend
+
+        # A file, not ":memory:", so concurrent queries get a connection each.
+        path = registry_path.with_name(f"{registry_path.stem}-{'dense' if dense else 'sparse'}.db")
+        return lambda: SQLiteBackend(path=path, use_dense=dense)
+    raise ValueError(f"Unknown benchmark backend: {backend}")
+
+
+def run_one(
+    registry_path: Path,
+    n_cards: int,
+    backend: str,
+    dense: bool,
+    queries: list[str],
+    *,
+    top_k: int = 5,
+    warmup: int = 5,
+    threads: Sequence[int] = (),
+) -> BenchResult:
+    result = BenchResult(cards=n_cards, backend=backend, dense=dense)
+    try:
+        factory = _backend_factory(backend, dense, registry_path)
+    except ImportError as exc:
+        result.status = f"skipped: {exc.name or exc} not installed"
+        return result
+
+    try:
+        started = time.perf_counter()
+        cards = load_registry(registry_path, validate_schema=False)
+        result.load_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        instance = factory()
+        instance.index(cards)
+        result.index_s = time.perf_counter() - started
+        if backend == "memory":
+            started = time.perf_counter()
+            factory().index(cards)
+            result.attach_s = time.perf_counter() - started
+        if getattr(instance, "dense_model_name", None):
+            result.extra["dense_model"] = instance.dense_model_name
+
+        for query in queries[:warmup]:
+            instance.query(query, top_k=top_k)
+
+        latencies: list[float] = []
+        expected: list[list[str]] = []
+        started = time.perf_counter()
+        for query in queries:
+            t0 = time.perf_counter()
+            hits = instance.query(query, top_k=top_k)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            expected.append([hit.card.id for hit in hits])
+        total = time.perf_counter() - started
+
+        if any(n > 1 for n in threads):
+            result.extra["threads"] = [
+                _threaded_run(instance, queries, expected, n, top_k=top_k)
+                for n in sorted(set(threads))
+                if n > 1  # one thread is the timed loop above
+            ]
+    except Exception as exc:
+        result.status = f"error: {type(exc).__name__}: {exc}"
+        return result
+
+    latencies.sort()
+    result.queries = len(latencies)
+    result.p50_ms = _percentile(latencies, 50)
+    result.p95_ms = _percentile(latencies, 95)
+    result.p99_ms = _percentile(latencies, 99)
+    result.qps = len(latencies) / total if total > 0 else None
+    result.rss_mb = _rss_mb()
+    return result
+
+
+def _threaded_run(
+    instance: Any, queries: list[str], expected: list[list[str]], n_threads: int, *, top_k: int
+) -> dict[str, Any]:
+    """Query one shared backend from ``n_threads`` threads at once.
+
+    Every thread answers the whole query list, so the run also checks that
+    concurrent answers match the single-threaded ones.
+    """
+    barrier = threading.Barrier(n_threads + 1)
+    mismatches = [0] * n_threads
+
+    def worker(slot: int) -> None:
+        barrier.wait()
+        for query, ids in zip(queries, expected):
+            if [hit.card.id for hit in instance.query(query, top_k=top_k)] != ids:
+                mismatches[slot] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    total = time.perf_counter() - started
+    return {
+        "threads": n_threads,
+        "qps": n_threads * len(queries) / total if total > 0 else None,
+        "mismatches": sum(mismatches),
+    }
+
+
+def run_benchmarks(
+    *,
+    template_registry: str | Path,
+    sizes: list[int],
+    backends: list[str],
+    dense_modes: list[bool],
+    n_queries: int = 200,
+    top_k: int = 5,
+    seed: int = 0,
+    workdir: str | Path | None = None,
+    progress: Callable[[BenchResult], None] | None = None,
+    threads: Sequence[int] = (),
+) -> dict[str, Any]:
+    templates = load_registry(template_registry)
+    queries = _sample_queries(templates, n_queries, seed=seed)
+    results: list[BenchResult] = []
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for size in sizes:
+            registry_path = Path(tmp) / f"synthetic-{size}.json"
+            entries = synthesize_catalog(templates, size, seed=seed)
+            registry_path.write_text(json.dumps({"tools": entries}), encoding="utf-8")
+            del entries
+            for backend in backends:
+                for dense in dense_modes:
+                    result = run_one(
+                        registry_path, size, backend, dense, queries, top_k=top_k,
+                        threads=threads,
+                    )
+                    results.append(result)
+                    if progress is not None:
+                        progress(result)
+
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "template_registry": str(template_registry),
+        "template_cards": len(templates),
+        "queries": n_queries,
+        "top_k": top_k,
+        "seed": seed,
+        "free_threaded": not getattr(sys, "_is_gil_enabled", lambda: True)(),
+        "results": [asdict(r) for r in results],
+    }
+
+
+def _rank_stats(ranked: list[list[str]], gold: list[str], top_k: int) -> tuple[float, float]:
+    found = 0
+    reciprocal = 0.0
+    for ids, target in zip(ranked, gold):
+        if target in ids[:top_k]:
+            found += 1
+            reciprocal += 1.0 / (ids.index(target) + 1)
+    return found / len(gold), reciprocal / len(gold)
+
+
+def recall_comparison(
+    registry_path: str | Path,
+    *,
+    top_k: int = 5,
+    models: Sequence[str] = ("lsa", "bge-small"),
+) -> dict[str, Any]:
+    """Compare sparse, dense and hybrid recall@k on held-out example queries.
+
+    Every card's ``examples`` are removed from the indexed cards and used as
+    queries whose relevant answer is that card, so no query text appears
+    verbatim in the index.
+    """
+    from .backends.memory import InMemoryBackend
+
+    cards = load_registry(registry_path)
+    queries = [(example, card.id) for card in cards for example in card.examples]
+    held_out = [replace(card, examples=[]) for card in cards]
+    corpus = Corpus(held_out)
+    gold = [card_id for _, card_id in queries]
+    results: list[RecallResult] = []
+
+    sparse = InMemoryBackend()
+    sparse.index(held_out, corpus=corpus)
+    ranked = [[h.card.id for h in sparse.query(q, top_k=top_k)] for q, _ in queries]
+    recall, mrr = _rank_stats(ranked, gold, top_k)
+    results.append(RecallResult("sparse", recall=recall, mrr=mrr, queries=len(queries)))
+
+    for model in models:
+        backend = InMemoryBackend(use_dense=True, dense_model=model)
+        backend.index(held_out, corpus=corpus)
+        name = backend.dense_model_name
+        if backend.dense_status != "ready":
+            for mode in ("dense", "hybrid"):
+                results.append(RecallResult(mode, name, status="skipped: model unavailable"))
+            continue
+
+        encode_ms: list[float] = []
+        dense_ranked: list[list[str]] = []
+        for q, _ in queries:
+            with timing.collect("recall") as recorder:
+                ranked_cards = backend.dense_rank(q, top_k, use_cache=False) or []
+            encode_ms.append(recorder.stages.get("dense_encode", 0.0))
+            dense_ranked.append([card.id for card, _ in ranked_cards])
+        encode_ms.sort()
+        recall, mrr = _rank_stats(dense_ranked, gold, top_k)
+        results.append(
+            RecallResult(
+                "dense", name, recall=recall, mrr=mrr,
+                encode_p50_ms=_percentile(encode_ms, 50), queries=len(queries),
+            )
+        )
+        ranked = [[h.card.id for h in backend.query(q, top_k=top_k)] for q, _ in queries]
+        recall, mrr = _rank_stats(ranked, gold, top_k)
+        results.append(RecallResult("hybrid", name, recall=recall, mrr=mrr, queries=len(queries)))
+
+    return {
+        "registry": str(registry_path),
+        "cards": len(cards),
+        "top_k": top_k,
+        "results": [asdict(r) for r in results],
+    }
+
+
+def _fmt(value: float | None, digits: int = 2) -> str:
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def render_markdown(report: dict[str, Any]) -> str:
+    lines = [
+        "# SkillMesh Retrieval Latency Benchmark",
+        "",
+        f"- Generated: {report['generated_at']}",
+        f"- Python: {report['python']} ({report['platform']})",
+        (
+            f"- Template registry: `{report['template_registry']}` "
+            f"({report['template_cards']} cards)"
+        ),
+        (
+            f"- Queries per config: {report['queries']} "
+            f"(top_k={report['top_k']}, seed={report['seed']})"
+        ),
+        "",
+        (
+            "| Cards | Backend | Dense | Load s | Index s | Attach s | p50 ms | p95 ms | p99 ms "
+            "| QPS | RSS MB | Status |"
+        ),
+        "|---:|---|---|---:|---:|---:|---:|---:|---:|---:|---:|---|",
+    ]
+    for r in report["results"]:
+        lines.append(
+            f"| {r['cards']} | {r['backend']} | {'on' if r['dense'] else 'off'} "
+            f"| {_fmt(r['load_s'], 3)} | {_fmt(r['index_s'], 3)} | {_fmt(r['attach_s'], 3)} "
+            f"| {_fmt(r['p50_ms'])} | {_fmt(r['p95_ms'])} | {_fmt(r['p99_ms'])} "
+            f"| {_fmt(r['qps'], 1)} | {_fmt(r['rss_mb'], 1)} | {r['status']} |"
+        )
+    lines.append("")
+    lines.append(
+        "RSS is the process resident set after each config, so it includes every "
+        "earlier config in the run; compare sizes within one backend, or run one "
+        "backend per invocation for absolute numbers."
+    )
+    threaded = [r for r in report["results"] if r["extra"].get("threads")]
+    if threaded:
+        lines += [
+            "",
+            "## Concurrent queries",
+            "",
+            (
+                "Each thread runs the full query list against one shared backend "
+                f"(free-threaded build: {'yes' if report.get('free_threaded') else 'no'}); "
+                "mismatches count answers that differ from the single-threaded run."
+            ),
+            "",
+            "| Cards | Backend | Dense | Threads | QPS | Speedup | Mismatches |",
+            "|---:|---|---|---:|---:|---:|---:|",
+        ]
+        for r in threaded:
+            for run in r["extra"]["threads"]:
+                speedup = run["qps"] / r["qps"] if run["qps"] and r["qps"] else None
+                lines.append(
+                    f"| {r['cards']} | {r['backend']} | {'on' if r['dense'] else 'off'} "
+                    f"| {run['threads']} | {_fmt(run['qps'], 1)} | {_fmt(speedup)} "
+                    f"| {run['mismatches']} |"
+                )
+    recall = report.get("recall")
+    if recall:
+        lines += [
+            "",
+            f"## Recall@{recall['top_k']} on held-out example queries",
+            "",
+            (
+                f"Registry `{recall['registry']}` ({recall['cards']} cards); each card's "
+                "examples are removed from the index and used as its queries."
+            ),
+            "",
+            "| Mode | Model | Recall | MRR | Encode p50 ms | Status |",
+            "|---|---|---:|---:|---:|---|",
+        ]
+        for r in recall["results"]:
+            lines.append(
+                f"| {r['mode']} | {r['model'] or '-'} | {_fmt(r['recall'], 3)} "
+                f"| {_fmt(r['mrr'], 3)} | {_fmt(r['encode_p50_ms'], 3)} | {r['status']} |"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def write_report(report: dict[str, Any], output_dir: str | Path) -> tuple[Path, Path]:
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    json_path = out / "bench.json"
+    md_path = out / "bench.md"
+    json_path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    md_path.write_text(render_markdown(report), encoding="utf-8")
+    return json_path, md_path
+
@@ -0,0 +1,86 @@
+"""Small in-process caches shared by the retriever and the MCP server."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from .corpus import tokenize
+
+
+def normalize_query_key(query: str) -> tuple[str, ...]:
+    """Return the cache key form of a query: its lowercased retrieval tokens.
+
+    Queries that differ only in case, punctuation or whitespace tokenize the
+    same way and therefore score identically, so they share a cache entry.
+    """
+    return tuple(tokenize(query))
+
+
+class QueryCache:
+    """Thread-safe LRU cache with a per-entry TTL and hit/miss counters."""
+
+    def __init__(
+        self,
+        *,
+        maxsize: int = 256,
+        ttl: float | None = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = None if ttl is None or float(ttl) <= 0 else float(ttl)
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            stored_at, value = entry
+            if self.ttl is not None and self._clock() - stored_at > self.ttl:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+            }
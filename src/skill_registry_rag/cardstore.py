@@ -0,0 +1,273 @@
+"""Card fields stored as columns, for projecting retrieval hits into payloads.
+
+A retrieve payload copies card fields into a dict per hit. Callers that only
+route on ids and scores do not need the rest (``invocation`` and
+``metadata`` alone can be several KB per card), so payloads are built from a
+field projection: only the requested columns are read and serialized.
+
+Only the scores change from one request to the next, so the card fields of
+a projection are also kept as pre-serialized JSON per card, and JSON
+responses are assembled by splicing those fragments with the scores.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+from .models import RetrievalHit, ToolCard
+
+try:
+    import orjson
+except ImportError:  # optional: pip install skillmesh[json]
+    orjson = None
+
+CARD_FIELDS: tuple[str, ...] = (
+    "id",
+    "title",
+    "domain",
+    "description",
+    "tags",
+    "tool_hints",
+    "aliases",
+    "dependencies",
+    "input_contract",
+    "invocation",
+    "output_artifacts",
+    "quality_checks",
+    "constraints",
+    "risk_level",
+    "maturity",
+    "metadata",
+)
+SCORE_FIELDS: tuple[str, ...] = ("score", "sparse_score", "dense_score")
+# Every field a hit payload can carry, in payload order.
+HIT_FIELDS: tuple[str, ...] = CARD_FIELDS + SCORE_FIELDS
+
+
+def parse_fields(fields: str | Sequence[str] | None) -> tuple[str, ...]:
+    """Validate a field projection given as a comma-separated string or a list.
+
+    ``None`` or an empty projection selects every field. ``id`` is always
+    included, and the result follows :data:`HIT_FIELDS` order.
+    """
+    if fields is None:
+        return HIT_FIELDS
+    names = fields.split(",") if isinstance(fields, str) else list(fields)
+    wanted = {str(name).strip() for name in names} - {""}
+    if not wanted:
+        return HIT_FIELDS
+    unknown = sorted(wanted - set(HIT_FIELDS))
+    if unknown:
+        raise ValueError(
+            f"Unknown field(s): {', '.join(unknown)}. Valid fields: {', '.join(HIT_FIELDS)}."
+        )
+    wanted.add("id")
+    return tuple(name for name in HIT_FIELDS if name in wanted)
+
+
+class RawJSON(str):
+    """Serialized JSON that :func:`dumps` splices into a top-level object verbatim."""
+
+
+def dumps(obj: Any, *, pretty: bool = False) -> str:
+    """Serialize ``obj`` as compact JSON, or with two-space indentation when ``pretty``.
+
+    Uses orjson when it is installed. :class:`RawJSON` values of a top-level
+    dict must have been serialized for that position (see
+    :meth:`CardStore.dumps_hits`) and are copied as is.
+    """
+    if not isinstance(obj, dict) or not any(isinstance(v, RawJSON) for v in obj.values()):
+        return _encode(obj, pretty)
+    if pretty:
+        items = [
+            f"{_encode(str(key))}: {value if isinstance(value, RawJSON) else _nest(value)}"
+            for key, value in obj.items()
+        ]
+        return "{\n  " + ",\n  ".join(items) + "\n}"
+    items = [
+        f"{_encode(str(key))}:{value if isinstance(value, RawJSON) else _encode(value)}"
+        for key, value in obj.items()
+    ]
+    return "{" + ",".join(items) + "}"
+
+
+def _encode(obj: Any, pretty: bool = False) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0).decode()
+        except TypeError:
+            pass  # e.g. non-str keys; json.dumps handles more
+    if pretty:
+        return json.dumps(obj, indent=2)
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def _nest(value: Any) -> str:
+    """Pretty JSON for a value one level below the top-level object."""
+    return _encode(value, True).replace("\n", "\n  ")
+
+
+def _number(value: float | None) -> str:
+    if value is None:
+        return "null"
+    value = float(value)
+    return repr(value) if math.isfinite(value) else _encode(value)
+
+
+class CardStore:
+    """Card fields as columns indexed by card number.
+
+    Columns are built on first use, so a store that only ever serves
+    ``id`` projections never touches the other fields. A store is not
+    changed after it is built; :meth:`with_cards` returns a new one, so
+    readers can keep projecting from the store they started with.
+    """
+
+    def __init__(self, cards: Iterable[ToolCard]):
+        self._cards = list(cards)
+        self._rows = {card.id: i for i, card in enumerate(self._cards)}
+        self._columns: dict[str, list[Any]] = {}
+        # (card fields, pretty) -> serialized card fields by card number.
+        self._fragments: dict[tuple[tuple[str, ...], bool], list[str | None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, card_id: str) -> ToolCard | None:
+        """The stored card with this id, if any."""
+        row = self._rows.get(card_id)
+        return None if row is None else self._cards[row]
+
+    def cards(self) -> list[ToolCard]:
+        """The stored cards, removed ones excluded."""
+        return [self._cards[row] for row in self._rows.values()]
+
+    def column(self, name: str) -> list[Any]:
+        """Values of card field ``name`` by card number."""
+        column = self._columns.get(name)
+        if column is None:
+            if name not in CARD_FIELDS:
+                raise ValueError(f"Unknown card field: {name}")
+            column = self._columns[name] = [getattr(card, name) for card in self._cards]
+        return column
+
+    def with_cards(self, cards: Iterable[ToolCard]) -> CardStore:
+        """A store with ``cards`` added, replacing stored cards with the same id."""
+        store = CardStore.__new__(CardStore)
+        store._cards = list(self._cards)
+        store._rows = dict(self._rows)
+        store._columns = {name: list(column) for name, column in self._columns.items()}
+        store._fragments = {key: list(rows) for key, rows in self._fragments.items()}
+        for card in cards:
+            row = store._rows.get(card.id)
+            if row is None:
+                row = store._rows[card.id] = len(store._cards)
+                store._cards.append(card)
+                for name, column in store._columns.items():
+                    column.append(getattr(card, name))
+                for rows in store._fragments.values():
+                    rows.append(None)
+            else:
+                store._cards[row] = card
+                for name, column in store._columns.items():
+                    column[row] = getattr(card, name)
+                for rows in store._fragments.values():
+                    rows[row] = None
+        return store
+
+    def without(self, card_ids: Iterable[str]) -> CardStore:
+        """A store without the cards with these ids.
+
+        Their rows stay in the columns until the store is rebuilt, but can no
+        longer be looked up.
+        """
+        store = CardStore.__new__(CardStore)
+        store._cards = self._cards
+        store._rows = dict(self._rows)
+        for card_id in card_ids:
+            store._rows.pop(card_id, None)
+        # Shared with this store: with_cards() copies before it writes.
+        store._columns = self._columns
+        store._fragments = self._fragments
+        return store
+
+    def project(
+        self, hits: Iterable[RetrievalHit], fields: Sequence[str] = HIT_FIELDS
+    ) -> list[dict[str, Any]]:
+        """One payload dict per hit holding only ``fields`` (see :func:`parse_fields`)."""
+        columns = [(name, self.column(name)) for name in fields if name in CARD_FIELDS]
+        scores = [name for name in fields if name in SCORE_FIELDS]
+        payload: list[dict[str, Any]] = []
+        for hit in hits:
+            row = self._rows.get(hit.card.id)
+            if row is not None and self._cards[row] is hit.card:
+                item = {name: column[row] for name, column in columns}
+            else:
+                # A card this store has not seen (e.g. from another retriever).
+                item = {name: getattr(hit.card, name) for name, _ in columns}
+            for name in scores:
+                item[name] = getattr(hit, name)
+            payload.append(item)
+        return payload
+
+    def dumps_hits(
+        self,
+        hits: Iterable[RetrievalHit],
+        fields: Sequence[str] = HIT_FIELDS,
+        *,
+        pretty: bool = False,
+    ) -> RawJSON:
+        """The JSON array :meth:`project` would give, spliced from cached card fragments.
+
+        The result is laid out to be a value of a top-level object passed to
+        :func:`dumps` with the same ``pretty``.
+        """
+        card_fields = tuple(name for name in fields if name in CARD_FIELDS)
+        scores = [name for name in fields if name in SCORE_FIELDS]
+        if pretty:
+            open_, key_sep, item_sep, close = "    {\n", '": ', ',\n      "', "\n    }"
+        else:
+            open_, key_sep, item_sep, close = "{", '":', ',"', "}"
+        items: list[str] = []
+        for hit in hits:
+            row = self._rows.get(hit.card.id)
+            if row is not None and self._cards[row] is hit.card:
+                fragment = self._fragment(row, card_fields, pretty)
+            else:
+                fragment = _fragment(
+                    {name: getattr(hit.card, name) for name in card_fields}, pretty
+                )
+            parts = [open_, fragment]
+            for name in scores:
+                parts += [item_sep, name, key_sep, _number(getattr(hit, name))]
+            parts.append(close)
+            items.append("".join(parts))
+        if not items:
+            return RawJSON("[]")
+        if pretty:
+            return RawJSON("[\n" + ",\n".join(items) + "\n  ]")
+        return RawJSON("[" + ",".join(items) + "]")
+
+    def _fragment(self, row: int, card_fields: tuple[str, ...], pretty: bool) -> str:
+        rows = self._fragments.get((card_fields, pretty))
+        if rows is None:
+            rows = self._fragments.setdefault((card_fields, pretty), [None] * len(self._cards))
+        fragment = rows[row]
+        if fragment is None:
+            card = self._cards[row]
+            fragment = rows[row] = _fragment(
+                {name: getattr(card, name) for name in card_fields}, pretty
+            )
+        return fragment
+
+
+def _fragment(fields: dict[str, Any], pretty: bool) -> str:
+    """The members of a hit object without braces, laid out for :meth:`CardStore.dumps_hits`."""
+    text = _encode(fields, pretty)
+    if not pretty:
+        return text[1:-1]
+    # Members of a hit sit three levels deep: top-level object, "hits" array, hit.
+    return "\n".join("    " + line for line in text.split("\n")[1:-1])
@@ -6,8 +6,9 @@ import os
 import sys
 from pathlib import Path
 
+from . import timing
 from ._resolve import resolve_registry_path
-from .adapters import render_claude_context, render_codex_context
+from .cardstore import HIT_FIELDS, dumps, parse_fields
 from .roles import (
     RoleCatalogError,
     friendly_role_name,
@@ -18,7 +19,7 @@ from .roles import (
 from .registry import RegistryError, load_registry
 from .retriever import SkillRetriever
 
-_TOP_LEVEL_COMMANDS = {"index", "retrieve", "emit", "roles"}
+_TOP_LEVEL_COMMANDS = {"index", "retrieve", "emit", "roles", "bench"}
 
 
 def _default_catalog_path() -> str:
@@ -258,13 +259,47 @@ def _build_parser() -> argparse.ArgumentParser:
     index_cmd.add_argument("--collection", default="skillmesh_experts", help="ChromaDB collection name")
     index_cmd.add_argument("--data-dir", default=None, help="ChromaDB persistence directory")
     index_cmd.add_argument("--ephemeral", action="store_true", help="Use ephemeral (in-memory) ChromaDB for testing")
+    index_cmd.add_argument(
+        "--backend",
+        choices=["chroma", "memory", "sqlite"],
+        default="chroma",
+        help=(
+            "chroma: persist a collection; memory: publish shared BM25/embedding segments; "
+            "sqlite: build an FTS5 index file"
+        ),
+    )
+    index_cmd.add_argument(
+        "--dense", action="store_true", help="Also publish dense embeddings (memory backend)"
+    )
+    index_cmd.add_argument(
+        "--segment-dir",
+        default=None,
+        help=(
+            "Segment directory for --backend memory "
+            "(default: SKILLMESH_SEGMENT_DIR, else $SKILLMESH_DATA_DIR/segments, "
+            "else ~/.skillmesh/segments)"
+        ),
+    )
+    index_cmd.add_argument(
+        "--sqlite-path",
+        default=None,
+        help="Index file for --backend sqlite (default: SKILLMESH_SQLITE_PATH)",
+    )
 
     retrieve = sub.add_parser("retrieve", help="Retrieve top-k cards for query")
     retrieve.add_argument("--registry", default=None, help="Path to tools/roles YAML/JSON")
     retrieve.add_argument("--query", required=True, help="User query")
     retrieve.add_argument("--top-k", type=int, default=3, help="Top-k hits")
     retrieve.add_argument("--dense", action="store_true", help="Enable optional dense scoring")
-    retrieve.add_argument("--backend", choices=["auto", "memory", "chroma"], default="chroma", help="Retrieval backend")
+    retrieve.add_argument("--backend", choices=["auto", "memory", "chroma", "sqlite"], default="chroma", help="Retrieval backend")
+    retrieve.add_argument(
+        "--timings", action="store_true", help="Include per-stage timings_ms in the JSON output"
+    )
+    retrieve.add_argument(
+        "--fields",
+        default=None,
+        help="Comma-separated hit fields to include (example: id,score); default: all",
+    )
 
     emit = sub.add_parser("emit", help="Emit provider-specific context block")
     emit.add_argument("--provider", required=True, choices=["codex", "claude"], help="Target provider")
@@ -272,13 +307,56 @@ def _build_parser() -> argparse.ArgumentParser:
     emit.add_argument("--query", required=True, help="User query")
     emit.add_argument("--top-k", type=int, default=3, help="Top-k hits")
     emit.add_argument("--dense", action="store_true", help="Enable optional dense scoring")
-    emit.add_argument("--backend", choices=["auto", "memory", "chroma"], default="chroma", help="Retrieval backend")
+    emit.add_argument("--backend", choices=["auto", "memory", "chroma", "sqlite"], default="chroma", help="Retrieval backend")
     emit.add_argument(
         "--instruction-chars",
         type=int,
         default=700,
         help="Max instruction text per retrieved expert",
     )
+    emit.add_argument(
+        "--max-tokens",
+        type=int,
+        default=None,
+        help="Prompt-token budget; packs top cards and shortens instructions to fit",
+    )
+
+    bench = sub.add_parser(
+        "bench", help="Benchmark load/index/query latency on synthetic catalogs"
+    )
+    bench.add_argument(
+        "--registry", default=None, help="Template registry the synthetic cards are sampled from"
+    )
+    bench.add_argument(
+        "--sizes",
+        default="100,1000,10000",
+        help="Comma-separated synthetic catalog sizes (example: 100,1000,10000,100000)",
+    )
+    bench.add_argument(
+        "--backends", default="memory,chroma", help="Comma-separated backends to measure"
+    )
+    bench.add_argument(
+        "--dense",
+        choices=["off", "on", "both"],
+        default="off",
+        help="Measure sparse-only, dense, or both",
+    )
+    bench.add_argument("--queries", type=int, default=200, help="Timed queries per config")
+    bench.add_argument("--top-k", type=int, default=5, help="Top-k hits per query")
+    bench.add_argument("--seed", type=int, default=0, help="Seed for catalog/query sampling")
+    bench.add_argument(
+        "--output-dir", default="bench-results", help="Where bench.json and bench.md are written"
+    )
+    bench.add_argument(
+        "--threads",
+        default="1",
+        help="Comma-separated thread counts for concurrent-query throughput (example: 1,2,4,8)",
+    )
+    bench.add_argument(
+        "--recall",
+        action="store_true",
+        help="Also compare sparse/dense/hybrid recall (LSA vs bge-small) on the template registry",
+    )
 
     roles = sub.add_parser("roles", help="Role commands")
     roles_sub = roles.add_subparsers(dest="roles_command", required=False)
@@ -353,33 +431,156 @@ def _build_parser() -> argparse.ArgumentParser:
     return parser
 
 
-def _hits_payload(hits):
-    payload = []
-    for hit in hits:
-        payload.append(
-            {
-                "id": hit.card.id,
-                "title": hit.card.title,
-                "domain": hit.card.domain,
-                "description": hit.card.description,
-                "tags": hit.card.tags,
-                "tool_hints": hit.card.tool_hints,
-                "aliases": hit.card.aliases,
-                "dependencies": hit.card.dependencies,
-                "input_contract": hit.card.input_contract,
-                "invocation": hit.card.invocation,
-                "output_artifacts": hit.card.output_artifacts,
-                "quality_checks": hit.card.quality_checks,
-                "constraints": hit.card.constraints,
-                "risk_level": hit.card.risk_level,
-                "maturity": hit.card.maturity,
-                "metadata": hit.card.metadata,
-                "score": hit.score,
-                "sparse_score": hit.sparse_score,
-                "dense_score": hit.dense_score,
-            }
+def _run_bench(args: argparse.Namespace) -> int:
+    from .bench import recall_comparison, run_benchmarks, write_report
+
+    try:
+        sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+        threads = [int(x) for x in args.threads.split(",") if x.strip()]
+    except ValueError:
+        print(
+            f"Error: --sizes and --threads must be comma-separated integers, "
+            f"got: {args.sizes} / {args.threads}",
+            file=sys.stderr,
+        )
+        return 2
+    backends = [x.strip() for x in args.backends.split(",") if x.strip()]
+    unknown = sorted(set(backends) - {"memory", "chroma", "sqlite"})
+    problem = None
+    if not sizes or any(n < 1 for n in sizes):
+        problem = f"--sizes must be positive integers, got: {args.sizes}"
+    elif any(n < 1 for n in threads):
+        problem = f"--threads must be positive integers, got: {args.threads}"
+    elif unknown or not backends:
+        problem = f"--backends must be one of: memory, chroma, sqlite, got: {args.backends}"
+    if problem:
+        print(f"Error: {problem}", file=sys.stderr)
+        return 2
+    dense_modes = {"off": [False], "on": [True], "both": [False, True]}[args.dense]
+
+    try:
+        registry_path = resolve_registry_path(args.registry)
+        report = run_benchmarks(
+            template_registry=registry_path,
+            sizes=sizes,
+            backends=backends,
+            dense_modes=dense_modes,
+            n_queries=max(1, args.queries),
+            top_k=max(1, args.top_k),
+            seed=args.seed,
+            threads=threads,
+            progress=lambda r: print(
+                f"{r.cards} cards | {r.backend} | dense={'on' if r.dense else 'off'} | "
+                f"p50={r.p50_ms if r.p50_ms is None else round(r.p50_ms, 3)} ms | {r.status}",
+                file=sys.stderr,
+            ),
+        )
+        if args.recall:
+            report["recall"] = recall_comparison(registry_path, top_k=max(1, args.top_k))
+    except RegistryError as exc:
+        print(f"RegistryError: {exc}", file=sys.stderr)
+        return 2
+    except ValueError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 2
+
+    json_path, md_path = write_report(report, args.output_dir)
+    print(f"Wrote {json_path} and {md_path}")
+    return 0
+
+
+def _run_registry_command(args: argparse.Namespace, recorder: timing.Timings | None) -> int:
+    try:
+        with timing.stage("resolve_registry"):
+            registry_path = resolve_registry_path(args.registry)
+        with timing.stage("load_registry"):
+            cards = load_registry(registry_path)
+    except RegistryError as exc:
+        print(f"RegistryError: {exc}", file=sys.stderr)
+        return 2
+    except ValueError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 2
+
+    if args.command == "index" and args.backend == "memory":
+        from .backends.memory import InMemoryBackend
+        from .backends.segments import default_segment_dir
+
+        segment_dir = args.segment_dir or default_segment_dir()
+        if segment_dir is None:
+            print(
+                "Error: segments are disabled (SKILLMESH_SEGMENT_DIR=off); pass --segment-dir.",
+                file=sys.stderr,
+            )
+            return 2
+        backend = InMemoryBackend(use_dense=args.dense, segment_dir=segment_dir)
+        backend.index(cards)
+        print(f"Published index segments for {len(cards)} cards under '{segment_dir}'")
+        return 0
+
+    if args.command == "index" and args.backend == "sqlite":
+        from .backends.sqlite import SQLiteBackend
+
+        backend = SQLiteBackend(path=args.sqlite_path)
+        backend.index(cards)
+        backend.close()
+        print(f"Indexed {len(cards)} cards into SQLite index '{backend.path}'")
+        return 0
+
+    if args.command == "index":
+        from .backends.chroma import ChromaBackend
+
+        backend = ChromaBackend(
+            collection_name=args.collection,
+            data_dir=args.data_dir,
+            ephemeral=args.ephemeral,
+            lock_timeout=float("inf"),
         )
-    return payload
+        backend.index(cards)
+        print(f"Indexed {len(cards)} cards into collection '{backend.collection_name}'")
+        return 0
+
+    if getattr(args, "max_tokens", None) is not None and args.max_tokens < 1:
+        print("Error: --max-tokens must be >= 1.", file=sys.stderr)
+        return 2
+
+    fields = HIT_FIELDS
+    if args.command == "retrieve":
+        try:
+            fields = parse_fields(args.fields)
+        except ValueError as exc:
+            print(f"Error: --fields: {exc}", file=sys.stderr)
+            return 2
+
+    backend_choice = getattr(args, "backend", "auto")
+    retriever = SkillRetriever(
+        cards,
+        use_dense=bool(getattr(args, "dense", False)),
+        backend=backend_choice,
+    )
+    hits = retriever.retrieve(args.query, top_k=args.top_k)
+
+    if args.command == "retrieve":
+        with timing.stage("payload"):
+            payload = {
+                "query": args.query,
+                "hits": retriever.store.dumps_hits(hits, fields, pretty=True),
+            }
+        if recorder is not None and args.timings:
+            payload["timings_ms"] = recorder.as_dict()
+        print(dumps(payload, pretty=True))
+        return 0
+
+    with timing.stage("render"):
+        for chunk in retriever.renderer.iter_render(
+            args.provider,
+            args.query,
+            hits,
+            instruction_chars=args.instruction_chars,
+            max_tokens=args.max_tokens,
+        ):
+            sys.stdout.write(chunk)
+    return 0
 
 
 def main(argv: list[str] | None = None) -> int:
@@ -447,44 +648,11 @@ def main(argv: list[str] | None = None) -> int:
             print(f"RoleCatalogError: {exc}", file=sys.stderr)
             return 2
 
-    try:
-        registry_path = resolve_registry_path(args.registry)
-        cards = load_registry(registry_path)
-    except (RegistryError, ValueError) as exc:
-        print(f"RegistryError: {exc}", file=sys.stderr)
-        return 2
-
-    if args.command == "index":
-        from .backends.chroma import ChromaBackend
-
-        backend = ChromaBackend(
-            collection_name=args.collection,
-            data_dir=args.data_dir,
-            ephemeral=args.ephemeral,
-        )
-        backend.index(cards)
-        print(f"Indexed {len(cards)} cards into collection '{args.collection}'")
-        return 0
-
-    backend_choice = getattr(args, "backend", "auto")
-    retriever = SkillRetriever(
-        cards,
-        use_dense=bool(getattr(args, "dense", False)),
-        backend=backend_choice,
-    )
-    hits = retriever.retrieve(args.query, top_k=args.top_k)
+    if args.command == "bench":
+        return _run_bench(args)
 
-    if args.command == "retrieve":
-        print(json.dumps({"query": args.query, "hits": _hits_payload(hits)}, indent=2))
-        return 0
-
-    if args.provider == "codex":
-        out = render_codex_context(args.query, hits, instruction_chars=args.instruction_chars)
-    else:
-        out = render_claude_context(args.query, hits, instruction_chars=args.instruction_chars)
-
-    print(out, end="")
-    return 0
+    with timing.maybe_collect(bool(getattr(args, "timings", False)), "cli") as recorder:
+        return _run_registry_command(args, recorder)
 
 
 if __name__ == "__main__":
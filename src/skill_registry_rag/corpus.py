@@ -0,0 +1,272 @@
+"""Backend-independent corpus preprocessing, built once per registry version.
+
+A :class:`Corpus` turns ``list[ToolCard]`` into everything the retrieval
+backends index: composed documents, the int32-encoded token corpus with its
+BM25 postings, per-field token lengths, per-card content hashes and cached
+dense embeddings. Backends consume a shared corpus instead of each
+re-composing and re-tokenizing the cards, so switching or comparing
+backends over the same registry reuses one preprocessing pass.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections.abc import Callable, Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from . import timing
+from .backends.lsa import DEFAULT_LSA_DIMS, LSA_VERSION, LSAEncoder, build_lsa
+from .backends.segments import SegmentStore, default_segment_dir
+from .backends.sparse import SPARSE_INDEX_VERSION, SparseIndex
+from .models import ExpertCard
+
+FIELD_NAMES = (
+    "id",
+    "title",
+    "domain",
+    "description",
+    "tags",
+    "tool_hints",
+    "examples",
+    "aliases",
+    "dependencies",
+    "output_artifacts",
+    "quality_checks",
+    "constraints",
+    "input_contract",
+    "risk_level",
+    "maturity",
+    "metadata",
+    "instruction",
+)
+
+_TOKEN_RE = re.compile(r"[a-zA-Z0-9_\.]+")
+# Part of every persisted index key; bump when tokenize() or the composed
+# card text changes so stale segments are not reused.
+TOKENIZER_VERSION = 1
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(str(text or "").lower())
+
+
+def compose_fields(card: ExpertCard) -> list[str]:
+    """Return the searchable text of ``card``, one entry per :data:`FIELD_NAMES`."""
+    input_contract_text = ", ".join(f"{k}:{v}" for k, v in card.input_contract.items())
+    metadata_text = ", ".join(f"{k}:{v}" for k, v in card.metadata.items())
+    return [
+        card.id,
+        card.title,
+        card.domain,
+        card.description,
+        "tags: " + ", ".join(card.tags),
+        "tool_hints: " + ", ".join(card.tool_hints),
+        "examples: " + " | ".join(card.examples),
+        "aliases: " + ", ".join(card.aliases),
+        "dependencies: " + ", ".join(card.dependencies),
+        "output_artifacts: " + ", ".join(card.output_artifacts),
+        "quality_checks: " + ", ".join(card.quality_checks),
+        "constraints: " + ", ".join(card.constraints),
+        "input_contract: " + input_contract_text,
+        "risk_level: " + card.risk_level,
+        "maturity: " + card.maturity,
+        "metadata: " + metadata_text,
+        card.instruction_text[:2000],
+    ]
+
+
+def compose_doc(card: ExpertCard) -> str:
+    return "\n".join(compose_fields(card))
+
+
+def card_content_hash(card: ExpertCard) -> str:
+    content = (
+        f"{card.id}|{card.title}|{card.description}|{','.join(card.tags)}"
+        f"|{card.instruction_text[:500]}"
+    )
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def derive_fingerprint(
+    fingerprint: str,
+    *,
+    upserted: Sequence[ExpertCard] = (),
+    removed: Sequence[str] = (),
+) -> str:
+    """Version string for an index after upserting and removing cards.
+
+    Derived from the previous version and the change alone, so it costs
+    nothing proportional to the catalog size, and every process applying
+    the same changes to the same version agrees on the result.
+    """
+    from .registry import registry_fingerprint
+
+    digest = hashlib.sha256(fingerprint.encode())
+    digest.update(b"|" + registry_fingerprint(list(upserted)).encode())
+    digest.update(b"|" + "\0".join(removed).encode())
+    return digest.hexdigest()[:16]
+
+
+class Corpus:
+    """Preprocessed cards shared by every backend indexing the same registry.
+
+    Expensive parts (tokenized corpus, postings, field lengths, embeddings)
+    are built lazily on first use and then reused. They are also persisted
+    as memory-mapped segments keyed by ``fingerprint`` and the tokenizer
+    version, under ``segment_dir`` or
+    :func:`~.backends.segments.default_segment_dir`, and attached instead of
+    rebuilt by later constructions in this or any other process.
+    """
+
+    def __init__(
+        self,
+        cards: Sequence[ExpertCard],
+        *,
+        fingerprint: str | None = None,
+        segment_dir: str | Path | None = None,
+    ) -> None:
+        self.cards = list(cards)
+        if fingerprint is None:
+            from .registry import registry_fingerprint
+
+            fingerprint = registry_fingerprint(self.cards)
+        self.fingerprint = fingerprint
+        root = Path(segment_dir) if segment_dir is not None else default_segment_dir()
+        self.segments = SegmentStore(root) if root is not None else None
+        self._lock = threading.Lock()
+        self._sparse: SparseIndex | None = None
+        self._sparse_segment: Path | None = None
+        self._field_lengths: np.ndarray | None = None
+        self._content_hashes: list[str] | None = None
+        self._embeddings: dict[str, np.ndarray] = {}
+        self._lsa: dict[int, LSAEncoder] = {}
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def doc(self, i: int) -> str:
+        return compose_doc(self.cards[i])
+
+    def iter_docs(self, start: int = 0, stop: int | None = None) -> Iterator[str]:
+        for card in self.cards[start:stop]:
+            yield compose_doc(card)
+
+    @property
+    def content_hashes(self) -> list[str]:
+        if self._content_hashes is None:
+            self._content_hashes = [card_content_hash(c) for c in self.cards]
+        return self._content_hashes
+
+    @property
+    def sparse(self) -> SparseIndex:
+        """BM25 index over the int32 token corpus."""
+        self._ensure_sparse()
+        assert self._sparse is not None
+        return self._sparse
+
+    @property
+    def sparse_segment(self) -> Path | None:
+        """Directory of the memory-mapped segment holding :attr:`sparse`, if it was published."""
+        self._ensure_sparse()
+        return self._sparse_segment
+
+    @property
+    def field_lengths(self) -> np.ndarray:
+        """Token count per card and field, shape ``(len(cards), len(FIELD_NAMES))``."""
+        self._ensure_sparse()
+        assert self._field_lengths is not None
+        return self._field_lengths
+
+    def embeddings(
+        self, model_name: str, encode: Callable[[list[str]], Any]
+    ) -> np.ndarray:
+        """Return card embeddings for ``model_name``, computing them once with ``encode``."""
+        cached = self._embeddings.get(model_name)
+        if cached is not None:
+            return cached
+        with self._lock:
+            cached = self._embeddings.get(model_name)
+            if cached is not None:
+                return cached
+            key = f"dense-{model_name.replace('/', '--')}-t{TOKENIZER_VERSION}-{self.fingerprint}"
+            segment = self.segments.open(key) if self.segments is not None else None
+            if segment is not None:
+                matrix = segment.arrays["embeddings"]
+            else:
+                matrix = np.asarray(encode(list(self.iter_docs())), dtype=np.float32)
+                if self.segments is not None:
+                    published = self.segments.publish(
+                        key, {"embeddings": matrix}, {"model": model_name}
+                    )
+                    matrix = published.arrays["embeddings"]
+            self._embeddings[model_name] = matrix
+            return matrix
+
+    def lsa(self, dims: int = DEFAULT_LSA_DIMS) -> LSAEncoder:
+        """Return the NumPy-only LSA encoder fitted to this corpus (built once)."""
+        encoder = self._lsa.get(dims)
+        if encoder is not None:
+            return encoder
+        sparse = self.sparse
+        with self._lock:
+            encoder = self._lsa.get(dims)
+            if encoder is not None:
+                return encoder
+            key = f"lsa-v{LSA_VERSION}-t{TOKENIZER_VERSION}-{dims}-{self.fingerprint}"
+            segment = self.segments.open(key) if self.segments is not None else None
+            if segment is not None:
+                arrays = segment.arrays
+            else:
+                with timing.stage("lsa_fit"):
+                    arrays = build_lsa(sparse, dims=dims)
+                if self.segments is not None:
+                    arrays = self.segments.publish(key, arrays, {"dims": dims}).arrays
+            encoder = LSAEncoder(sparse.vocab, arrays, tokenize)
+            self._lsa[dims] = encoder
+            return encoder
+
+    def _ensure_sparse(self) -> None:
+        if self._sparse is None:
+            with self._lock:
+                if self._sparse is None:
+                    self._build_sparse()
+
+    def _build_sparse(self) -> None:
+        key = f"corpus-v{SPARSE_INDEX_VERSION}-t{TOKENIZER_VERSION}-{self.fingerprint}"
+        segment = self.segments.open(key) if self.segments is not None else None
+        if segment is not None:
+            self._sparse = SparseIndex(segment.arrays, segment.meta)
+            self._field_lengths = segment.arrays["field_lengths"]
+            self._sparse_segment = segment.path
+            return
+
+        field_lengths = np.zeros((len(self.cards), len(FIELD_NAMES)), dtype=np.int32)
+
+        def token_lists() -> Iterator[list[str]]:
+            # Composed docs join fields with newlines, which never occur inside
+            # a token, so per-field tokens concatenate to the document's tokens.
+            for i, card in enumerate(self.cards):
+                tokens: list[str] = []
+                for j, text in enumerate(compose_fields(card)):
+                    field_tokens = tokenize(text)
+                    field_lengths[i, j] = len(field_tokens)
+                    tokens.extend(field_tokens)
+                yield tokens
+
+        with timing.stage("corpus"):
+            sparse = SparseIndex.build(token_lists())
+        if self.segments is not None:
+            published = self.segments.publish(
+                key, {**sparse.arrays(), "field_lengths": field_lengths}, sparse.meta()
+            )
+            sparse = SparseIndex(published.arrays, published.meta)
+            field_lengths = published.arrays["field_lengths"]
+            if isinstance(published.arrays["post_docs"], np.memmap):
+                self._sparse_segment = published.path
+        self._sparse = sparse
+        self._field_lengths = field_lengths
@@ -0,0 +1,144 @@
+"""Per-request latency budgets with graceful degradation.
+
+A budget is set for the current context with :func:`budget` (for example by
+``SkillRetriever.retrieve(..., deadline_ms=...)``). Stages that would overrun
+it are skipped and recorded on the budget, and retrieval degrades along a
+fixed path: hybrid, then sparse-only, then the last answer cached for the
+query. Without a budget every helper here waits as long as it takes.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional, TypeVar
+
+from . import timing
+
+T = TypeVar("T")
+
+# Optional stages (dense encoding and nearest-neighbour search) give up
+# while this share of the budget is still left, so the sparse-only answer
+# can finish in time.
+_OPTIONAL_RESERVE = 0.2
+# Threads that run whole searches under a budget. Separate from the query
+# worker pool, whose tasks a search waits on. Calls made while all of them
+# are busy queue for as long as their budget allows.
+_SEARCH_WORKERS = 8
+
+_current: ContextVar[Optional[Budget]] = ContextVar("skillmesh_budget", default=None)
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+@dataclass(slots=True)
+class Budget:
+    """Deadline for one request and the stages skipped to meet it."""
+
+    expires_at: float  # time.monotonic()
+    total: float  # seconds
+    skipped: list[str] = field(default_factory=list)
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def skip(self, stage: str) -> None:
+        """Record that ``stage`` was skipped to meet the deadline."""
+        if stage not in self.skipped:
+            self.skipped.append(stage)
+        timing.count(f"skipped_{stage}")
+
+
+def current() -> Optional[Budget]:
+    """The budget of the current request, if one is set."""
+    return _current.get()
+
+
+@contextmanager
+def budget(deadline_ms: float | None) -> Iterator[Optional[Budget]]:
+    """Limit the enclosed work to ``deadline_ms`` milliseconds.
+
+    ``None`` keeps the enclosing budget, if any. A nested budget never
+    extends the enclosing one and records skipped stages on the same list.
+    """
+    outer = _current.get()
+    if deadline_ms is None:
+        yield outer
+        return
+    if float(deadline_ms) <= 0:
+        raise ValueError("`deadline_ms` must be > 0.")
+    total = float(deadline_ms) / 1000.0
+    expires_at = time.monotonic() + total
+    if outer is not None and outer.expires_at <= expires_at:
+        yield outer
+        return
+    inner = Budget(expires_at, total, outer.skipped if outer is not None else [])
+    token = _current.set(inner)
+    try:
+        yield inner
+    finally:
+        _current.reset(token)
+
+
+def optional_result(future: Future[T], stage: str) -> Optional[T]:
+    """``future``'s result, or ``None`` once the budget's reserve is reached.
+
+    For stages the answer can do without (e.g. dense scoring): on timeout
+    ``stage`` is recorded as skipped and the work finishes unobserved.
+    """
+    active = _current.get()
+    if active is None:
+        return future.result()
+    timeout = max(0.0, active.remaining() - _OPTIONAL_RESERVE * active.total)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        active.skip(stage)
+        return None
+
+
+def run(fn: Callable[..., T], *args: Any, stage: str) -> tuple[bool, Optional[T]]:
+    """Run ``fn(*args)`` within the current budget.
+
+    Returns ``(True, result)``, or ``(False, None)`` with ``stage`` recorded
+    as skipped when the budget runs out first; a call that has not started
+    is cancelled, one that has finishes on its own thread and its result is
+    dropped. While every worker is busy the call waits in the queue, so only
+    a call whose budget runs out there is skipped. Without a budget ``fn``
+    runs on the calling thread.
+    """
+    active = _current.get()
+    if active is None:
+        return True, fn(*args)
+    if active.expired():
+        active.skip(stage)
+        return False, None
+    future = _pool().submit(contextvars.copy_context().run, fn, *args)
+    try:
+        return True, future.result(timeout=active.remaining())
+    except FutureTimeout:
+        future.cancel()
+        active.skip(stage)
+        return False, None
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_SEARCH_WORKERS, thread_name_prefix="skillmesh-deadline"
+                )
+    return _executor
@@ -2,12 +2,20 @@ from __future__ import annotations
 
 import os
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 from functools import lru_cache
 
+from . import deadline, timing
 from ._resolve import resolve_registry_path
-from .adapters import render_claude_context, render_codex_context
+from .adapters.renderer import ContextRenderer
+from .cardstore import parse_fields
+from .corpus import Corpus
 from .roles import (
     RoleCatalogError,
     friendly_role_name,
@@ -15,11 +23,12 @@ from .roles import (
     list_role_offers,
     resolve_role_selector,
 )
-from .registry import RegistryError, load_registry
+from .models import ExpertCard
+from .registry import RegistryError, RegistryLoader, diff_registries
 from .retriever import SkillRetriever
 
 _VALID_PROVIDERS = {"claude", "codex"}
-_VALID_BACKENDS = {"auto", "memory", "chroma"}
+_VALID_BACKENDS = {"auto", "memory", "chroma", "sqlite"}
 
 
 def _default_role_catalog_path() -> Path:
@@ -84,48 +93,211 @@ def _normalize_provider(provider: str) -> str:
     return normalized
 
 
+def _normalize_max_tokens(max_tokens: int | None) -> int | None:
+    if max_tokens is None:
+        return None
+    if int(max_tokens) < 1:
+        raise ValueError("`max_tokens` must be >= 1.")
+    return int(max_tokens)
+
+
 def _normalize_backend(backend: str) -> str:
     normalized = str(backend or "chroma").strip().lower()
     if normalized not in _VALID_BACKENDS:
-        raise ValueError("`backend` must be one of: auto, memory, chroma.")
+        raise ValueError("`backend` must be one of: auto, memory, chroma, sqlite.")
     return normalized
 
 
-@lru_cache(maxsize=1)
-def __cached_retriever(registry_path: Path, mtime: float, backend: str, dense: bool):
+def _env_number(name: str, default: float) -> float:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
     try:
-        cards = load_registry(registry_path)
-    except RegistryError as exc:
-        raise ValueError(f"Invalid registry: {exc}") from exc
+        return float(raw)
+    except ValueError as exc:
+        raise ValueError(f"{name} must be a number, got: {raw!r}") from exc
+
+
+# One loader per registry path, so a reload only rebuilds the entries that changed.
+_loaders: dict[Path, RegistryLoader] = {}
+_loaders_lock = threading.Lock()
+
 
+@lru_cache(maxsize=1)
+def __cached_corpus(registry_path: Path, mtime: float) -> Corpus:
+    with _loaders_lock:
+        loader = _loaders.setdefault(registry_path, RegistryLoader(registry_path))
+        try:
+            with timing.stage("load_registry"):
+                loader.load()
+        except RegistryError as exc:
+            raise ValueError(f"Invalid registry: {exc}") from exc
+        return Corpus(loader.cards, fingerprint=loader.fingerprint)
+
+
+@dataclass(slots=True)
+class _CachedRetriever:
+    mtime: float
+    retriever: SkillRetriever
+    cards: list[ExpertCard]  # registry contents the retriever currently indexes
+
+
+# (registry path, backend, dense) -> cached retriever, least recently used first.
+# Unlike an lru_cache keyed by mtime, a retriever whose registry changed is
+# brought up to date in place when the change is small.
+_RETRIEVER_CACHE_SIZE = 4
+# Registry changes up to this many cards, or this share of the registry, are
+# applied by upsert/remove instead of building a new retriever.
+_MAX_INCREMENTAL_CARDS = 64
+_MAX_INCREMENTAL_RATIO = 0.25
+_retrievers: OrderedDict[tuple[Path, str, bool], _CachedRetriever] = OrderedDict()
+_retrievers_lock = threading.Lock()
+# Retrievers being built or updated for requests with a deadline, by
+# (registry path, mtime, backend, dense). Each runs on its own thread without
+# the budget, so a request that stops waiting leaves it to the next one.
+_builds: dict[tuple[Path, float, str, bool], Future[SkillRetriever]] = {}
+_builds_lock = threading.Lock()
+
+
+def __cached_retriever(registry_path: Path, mtime: float, backend: str, dense: bool):
+    key = (registry_path, backend, dense)
+    with _retrievers_lock:
+        entry = _retrievers.get(key)
+        if entry is not None and entry.mtime == mtime:
+            _retrievers.move_to_end(key)
+            return entry.retriever
+    corpus = __cached_corpus(registry_path, mtime)
+    if entry is not None:
+        diff = diff_registries(entry.cards, corpus.cards)
+        limit = max(_MAX_INCREMENTAL_CARDS, _MAX_INCREMENTAL_RATIO * len(corpus.cards))
+        if len(diff) <= limit:
+            by_id = {card.id: card for card in corpus.cards}
+            with _retrievers_lock:
+                if _retrievers.get(key) is entry:
+                    entry.retriever.remove(diff.removed)
+                    entry.retriever.upsert([by_id[i] for i in diff.added + diff.changed])
+                    entry.mtime, entry.cards = mtime, corpus.cards
+                    _retrievers.move_to_end(key)
+                    return entry.retriever
+    retriever = __build_retriever(registry_path, mtime, backend, dense)
+    with _retrievers_lock:
+        _retrievers[key] = _CachedRetriever(mtime, retriever, corpus.cards)
+        _retrievers.move_to_end(key)
+        while len(_retrievers) > _RETRIEVER_CACHE_SIZE:
+            _retrievers.popitem(last=False)
+    return retriever
+
+
+def __build_retriever(registry_path: Path, mtime: float, backend: str, dense: bool):
+    # Retrievers for different backends share one corpus per registry version,
+    # so switching backend or dense mode skips loading and tokenizing again.
+    corpus = __cached_corpus(registry_path, mtime)
+
+    # A registry reload builds a fresh retriever, which drops every cached
+    # result for the previous index version.
     return SkillRetriever(
-        cards,
+        corpus.cards,
         use_dense=bool(dense),
         backend=backend,
+        cache_size=int(_env_number("SKILLMESH_CACHE_SIZE", 256)),
+        cache_ttl=_env_number("SKILLMESH_CACHE_TTL", 60.0),
+        prerender=True,
+        corpus=corpus,
+        # A long-lived server answers sparse-only until embeddings are ready
+        # instead of blocking the first call on the model load.
+        background_dense=True,
     )
 
 
-def _retrieve_hits(
+def _resolve_retriever(
     *,
-    query: str,
     registry: str | None,
-    top_k: int,
     backend: str,
     dense: bool,
-):
-    resolved_query = _normalize_query(query)
-    resolved_top_k = _normalize_top_k(top_k)
+) -> tuple[Path, SkillRetriever | None]:
     resolved_backend = _normalize_backend(backend)
-    registry_path = resolve_registry_path(registry)
+    with timing.stage("resolve_registry"):
+        registry_path = resolve_registry_path(registry)
 
     try:
         mtime = registry_path.stat().st_mtime
     except FileNotFoundError:
         mtime = 0.0
 
-    retriever = __cached_retriever(registry_path, mtime, resolved_backend, bool(dense))
+    args = (registry_path, mtime, resolved_backend, bool(dense))
+    budget = deadline.current()
+    if budget is None:
+        return registry_path, __cached_retriever(*args)
+    return registry_path, _retriever_within(budget, args)
+
+
+def _retriever_within(
+    budget: deadline.Budget, args: tuple[Path, float, str, bool]
+) -> SkillRetriever | None:
+    """The retriever for ``args``, waiting for a load or index build only until the deadline.
+
+    Past it, ``index`` is recorded as skipped and the build carries on in the
+    background; the retriever for the previous registry version answers
+    meanwhile, or ``None`` when there is none.
+    """
+    registry_path, mtime, backend, dense = args
+    key = (registry_path, backend, dense)
+    entry = None
+    # Held while a small registry change is applied in place.
+    if _retrievers_lock.acquire(timeout=budget.remaining()):
+        try:
+            entry = _retrievers.get(key)
+            if entry is not None and entry.mtime == mtime:
+                _retrievers.move_to_end(key)
+                return entry.retriever
+        finally:
+            _retrievers_lock.release()
+    with _builds_lock:
+        future = _builds.get(args)
+        if future is None:
+            future = _builds[args] = Future()
+            threading.Thread(
+                target=_build_in_background,
+                args=(future, args),
+                name="skillmesh-index",
+                daemon=True,
+            ).start()
+    try:
+        return future.result(timeout=budget.remaining())
+    except FutureTimeout:
+        budget.skip("index")
+        return entry.retriever if entry is not None else None
+
+
+def _build_in_background(
+    future: Future[SkillRetriever], args: tuple[Path, float, str, bool]
+) -> None:
+    try:
+        future.set_result(__cached_retriever(*args))
+    except BaseException as exc:
+        future.set_exception(exc)
+    finally:
+        with _builds_lock:
+            _builds.pop(args, None)
+
+
+def _retrieve_hits(
+    *,
+    query: str,
+    registry: str | None,
+    top_k: int,
+    backend: str,
+    dense: bool,
+):
+    resolved_query = _normalize_query(query)
+    resolved_top_k = _normalize_top_k(top_k)
+    registry_path, retriever = _resolve_retriever(
+        registry=registry, backend=backend, dense=dense
+    )
+    if retriever is None:  # still indexing at the deadline
+        return resolved_query, registry_path, [], None
     hits = retriever.retrieve(resolved_query, top_k=resolved_top_k)
-    return resolved_query, registry_path, hits
+    return resolved_query, registry_path, hits, retriever
 
 
 def retrieve_cards_payload(
@@ -135,43 +307,60 @@ def retrieve_cards_payload(
     top_k: int = 5,
     backend: str = "chroma",
     dense: bool = False,
+    timings: bool = False,
+    fields: str | list[str] | None = None,
+    deadline_ms: float | None = None,
 ) -> dict[str, Any]:
-    resolved_query, registry_path, hits = _retrieve_hits(
+    with timing.maybe_collect(timings, "retrieve") as recorder, deadline.budget(
+        deadline_ms
+    ) as budget:
+        payload = _retrieve_cards_payload(
+            query=query,
+            registry=registry,
+            top_k=top_k,
+            backend=backend,
+            dense=dense,
+            fields=fields,
+        )
+        if deadline_ms is not None:
+            payload["skipped_stages"] = list(budget.skipped)
+        if timings and recorder is not None:
+            payload["timings_ms"] = recorder.as_dict()
+        return payload
+
+
+def _retrieve_cards_payload(
+    *,
+    query: str,
+    registry: str | None,
+    top_k: int,
+    backend: str,
+    dense: bool,
+    fields: str | list[str] | None,
+) -> dict[str, Any]:
+    projection = parse_fields(fields)
+    resolved_query, registry_path, hits, retriever = _retrieve_hits(
         query=query,
         registry=registry,
         top_k=top_k,
         backend=backend,
         dense=dense,
     )
-    payload_hits: list[dict[str, Any]] = []
-    for hit in hits:
-        payload_hits.append(
-            {
-                "id": hit.card.id,
-                "title": hit.card.title,
-                "domain": hit.card.domain,
-                "description": hit.card.description,
-                "tags": hit.card.tags,
-                "tool_hints": hit.card.tool_hints,
-                "aliases": hit.card.aliases,
-                "dependencies": hit.card.dependencies,
-                "input_contract": hit.card.input_contract,
-                "invocation": hit.card.invocation,
-                "output_artifacts": hit.card.output_artifacts,
-                "quality_checks": hit.card.quality_checks,
-                "constraints": hit.card.constraints,
-                "risk_level": hit.card.risk_level,
-                "maturity": hit.card.maturity,
-                "metadata": hit.card.metadata,
-                "score": hit.score,
-                "sparse_score": hit.sparse_score,
-                "dense_score": hit.dense_score,
-            }
-        )
+    if retriever is None:
+        payload_hits: list[dict[str, Any]] = []
+        dense_status = "loading" if dense else "off"
+    else:
+        with timing.stage("payload"):
+            payload_hits = retriever.store.project(hits, projection)
+        dense_status = retriever.dense_status()
+    # A card pinned by an exact name match says nothing about how the rest were scored.
+    mode = next((hit.mode for hit in hits if hit.mode != "exact"), "sparse")
 
     return {
         "query": resolved_query,
         "registry": str(registry_path),
+        "retrieval_mode": mode,
+        "dense_status": dense_status,
         "hits": payload_hits,
     }
 
@@ -185,31 +374,107 @@ def build_routed_context(
     dense: bool = False,
     provider: str = "claude",
     instruction_chars: int = 700,
+    max_tokens: int | None = None,
+    deadline_ms: float | None = None,
+) -> str:
+    with deadline.budget(deadline_ms):
+        return _build_routed_context(
+            query=query,
+            registry=registry,
+            top_k=top_k,
+            backend=backend,
+            dense=dense,
+            provider=provider,
+            instruction_chars=instruction_chars,
+            max_tokens=max_tokens,
+        )
+
+
+def _build_routed_context(
+    *,
+    query: str,
+    registry: str | None,
+    top_k: int,
+    backend: str,
+    dense: bool,
+    provider: str,
+    instruction_chars: int,
+    max_tokens: int | None,
 ) -> str:
     resolved_provider = _normalize_provider(provider)
     resolved_instruction_chars = int(instruction_chars)
     if resolved_instruction_chars < 100:
         raise ValueError("`instruction_chars` must be >= 100.")
+    resolved_max_tokens = _normalize_max_tokens(max_tokens)
 
-    resolved_query, _, hits = _retrieve_hits(
-        query=query,
-        registry=registry,
-        top_k=top_k,
-        backend=backend,
-        dense=dense,
+    resolved_query = _normalize_query(query)
+    resolved_top_k = _normalize_top_k(top_k)
+    _, retriever = _resolve_retriever(registry=registry, backend=backend, dense=dense)
+    budget = deadline.current()
+    if retriever is None:  # still indexing at the deadline
+        assert budget is not None
+        context = ContextRenderer().render(
+            resolved_provider,
+            resolved_query,
+            [],
+            instruction_chars=resolved_instruction_chars,
+            max_tokens=resolved_max_tokens,
+        )
+        return context + f"\n<!-- skillmesh skipped stages: {', '.join(budget.skipped)} -->\n"
+
+    # The rendered block echoes the query verbatim, so it is keyed on the exact
+    # query rather than its normalized tokens.
+    key = retriever.cache_key(
+        "context",
+        resolved_provider,
+        resolved_instruction_chars,
+        resolved_max_tokens,
+        resolved_query,
+        resolved_top_k,
     )
+    if retriever.cache is not None:
+        cached = retriever.cache.get(key)
+        if cached is not None:
+            return cached
 
-    if resolved_provider == "codex":
-        return render_codex_context(
+    hits = retriever.retrieve(resolved_query, top_k=resolved_top_k)
+    with timing.stage("render"):
+        context = retriever.renderer.render(
+            resolved_provider,
             resolved_query,
             hits,
             instruction_chars=resolved_instruction_chars,
+            max_tokens=resolved_max_tokens,
         )
-    return render_claude_context(
-        resolved_query,
-        hits,
-        instruction_chars=resolved_instruction_chars,
+    if budget is not None and budget.skipped:
+        # Degraded: say so, and leave the cache to a full answer.
+        return context + f"\n<!-- skillmesh skipped stages: {', '.join(budget.skipped)} -->\n"
+    if retriever.cache is not None:
+        retriever.cache.put(key, context)
+    return context
+
+
+def metrics_text() -> str:
+    """Prometheus-style dump of cumulative stage timings (needs SKILLMESH_METRICS=1)."""
+    if not timing.metrics_enabled():
+        return "# skillmesh metrics are disabled; set SKILLMESH_METRICS=1\n"
+    return timing.METRICS.prometheus_text()
+
+
+def cache_stats_payload(
+    *,
+    registry: str | None = None,
+    backend: str = "chroma",
+    dense: bool = False,
+) -> dict[str, Any]:
+    registry_path, retriever = _resolve_retriever(
+        registry=registry, backend=backend, dense=dense
     )
+    return {
+        "registry": str(registry_path),
+        "backend": retriever.backend_name,
+        "cache": retriever.cache_stats(),
+    }
 
 
 def list_roles_payload(
@@ -276,8 +541,15 @@ def create_mcp_server():
         dense: bool = False,
         provider: str = "claude",
         instruction_chars: int = 700,
+        max_tokens: int | None = None,
+        deadline_ms: float | None = None,
     ) -> str:
-        """Return a routed context block for Claude/Codex from top-K SkillMesh cards."""
+        """Return a routed context block for Claude/Codex from top-K SkillMesh cards.
+
+        Set `max_tokens` to pack the best cards into a prompt-token budget.
+        Set `deadline_ms` to degrade (hybrid, then sparse-only, then a cached
+        answer) rather than run past that latency budget.
+        """
         return build_routed_context(
             query=query,
             registry=registry,
@@ -286,6 +558,8 @@ def create_mcp_server():
             dense=dense,
             provider=provider,
             instruction_chars=instruction_chars,
+            max_tokens=max_tokens,
+            deadline_ms=deadline_ms,
         )
 
     @mcp.tool()
@@ -295,16 +569,42 @@ def create_mcp_server():
         registry: str | None = None,
         backend: str = "chroma",
         dense: bool = False,
+        timings: bool = False,
+        fields: list[str] | None = None,
+        deadline_ms: float | None = None,
     ) -> dict[str, Any]:
-        """Return top-K SkillMesh cards as structured JSON payload."""
+        """Return top-K SkillMesh cards as structured JSON payload.
+
+        Set `timings` to include per-stage `timings_ms` in the payload.
+        Set `fields` (e.g. `["id", "score"]`) to return only those hit fields.
+        Set `deadline_ms` to degrade rather than run past that latency budget;
+        the payload then lists `skipped_stages`.
+        """
         return retrieve_cards_payload(
             query=query,
             registry=registry,
             top_k=top_k,
             backend=backend,
             dense=dense,
+            timings=timings,
+            fields=fields,
+            deadline_ms=deadline_ms,
         )
 
+    @mcp.tool()
+    def skillmesh_cache_stats(
+        registry: str | None = None,
+        backend: str = "chroma",
+        dense: bool = False,
+    ) -> dict[str, Any]:
+        """Return query/context cache hit-rate metrics for the active retriever."""
+        return cache_stats_payload(registry=registry, backend=backend, dense=dense)
+
+    @mcp.tool()
+    def skillmesh_metrics() -> str:
+        """Return cumulative retrieval stage timings in Prometheus text format."""
+        return metrics_text()
+
     @mcp.tool()
     def list_skillmesh_roles(
         catalog: str | None = None,
@@ -31,8 +31,13 @@ class ToolCard:
 class RetrievalHit:
     card: ToolCard
     score: float
-    sparse_score: float
+    # None for hits that were not scored (mode "exact").
+    sparse_score: Optional[float]
     dense_score: Optional[float] = None
+    # "hybrid" when dense scores contributed, "sparse" otherwise (for
+    # example while dense embeddings are still loading), "exact" for a card
+    # pinned by an exact id/alias/name match.
+    mode: str = "sparse"
 
 
 # Backward-compatible alias for older imports.
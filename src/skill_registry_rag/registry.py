@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import re
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass, field, fields
 from pathlib import Path
 from typing import Any
 
 import yaml
 
+from . import timing
 from .models import ToolCard
 
 
@@ -209,6 +214,31 @@ def _normalize_invocation(
     }
 
 
+def _card_digest(card: ToolCard) -> bytes:
+    # Field values are plain JSON types, so a shallow field map serializes the
+    # same as asdict() without its recursive copy.
+    payload = {f.name: getattr(card, f.name) for f in fields(card)}
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).digest()
+
+
+def _fingerprint_digests(digests: Iterable[bytes]) -> str:
+    digest = hashlib.sha256()
+    for card_digest in digests:
+        digest.update(card_digest)
+    return digest.hexdigest()[:16]
+
+
+def registry_fingerprint(cards: list[ToolCard]) -> str:
+    """Return a stable content hash for a loaded card list.
+
+    Any change to any card field (including instruction text) or to card order
+    yields a different fingerprint, so it can version caches and indexes.
+    """
+    return _fingerprint_digests(_card_digest(card) for card in cards)
+
+
 def _validate_required(row: dict[str, Any], required: list[str], idx: int) -> None:
     for key in required:
         val = str(row.get(key, "")).strip()
@@ -216,6 +246,75 @@ def _validate_required(row: dict[str, Any], required: list[str], idx: int) -> No
             raise RegistryError(f"Missing required field '{key}' at entry index {idx}.")
 
 
+def _instruction_path(root: Path, instruction_file: str, card_id: str) -> Path:
+    instruction_path = (root / instruction_file).resolve()
+    if not instruction_path.is_relative_to(root.resolve()):
+        raise RegistryError(f"Path traversal detected: {instruction_path} is outside of {root.resolve()}")
+    if not instruction_path.exists():
+        raise RegistryError(
+            f"Instruction file missing for '{card_id}': {instruction_path}"
+        )
+    return instruction_path
+
+
+def _build_card(row: dict[str, Any], root: Path, instruction_text: str | None = None) -> ToolCard:
+    """Normalize one registry entry; ``instruction_text`` skips reading the file."""
+    card_id = str(row["id"]).strip()
+    title = str(row["title"]).strip()
+    description = str(row.get("description", "")).strip()
+    instruction_file = str(row["instruction_file"]).strip()
+    input_contract = _to_map(row.get("input_contract"), "input_contract", card_id)
+    invocation_raw = _to_any_map(row.get("invocation"), "invocation", card_id)
+
+    # Use inlined instruction_text if present (compiled registry), else read from file
+    if instruction_text is None:
+        instruction_text = str(row.get("instruction_text", "")).strip()
+    if not instruction_text:
+        instruction_path = _instruction_path(root, instruction_file, card_id)
+        instruction_text = instruction_path.read_text(encoding="utf-8").strip()
+
+    return ToolCard(
+        id=card_id,
+        title=title,
+        domain=str(row["domain"]).strip(),
+        instruction_file=instruction_file,
+        description=description,
+        tags=_to_list(row.get("tags"), "tags", card_id),
+        tool_hints=_to_list(row.get("tool_hints"), "tool_hints", card_id),
+        examples=_to_list(row.get("examples"), "examples", card_id),
+        aliases=_to_list(row.get("aliases"), "aliases", card_id),
+        dependencies=_to_list(row.get("dependencies"), "dependencies", card_id),
+        output_artifacts=_to_list(
+            row.get("output_artifacts"), "output_artifacts", card_id
+        ),
+        quality_checks=_to_list(
+            row.get("quality_checks"), "quality_checks", card_id
+        ),
+        constraints=_to_list(row.get("constraints"), "constraints", card_id),
+        input_contract=input_contract,
+        invocation=_normalize_invocation(
+            invocation_raw,
+            card_id=card_id,
+            card_title=title,
+            card_description=description,
+            input_contract=input_contract,
+        ),
+        risk_level=str(row.get("risk_level", "")).strip(),
+        maturity=str(row.get("maturity", "")).strip(),
+        metadata=_to_any_map(row.get("metadata"), "metadata", card_id),
+        instruction_text=instruction_text,
+    )
+
+
+def _card_id(row: dict[str, Any], idx: int, seen_ids: set[str]) -> str:
+    _validate_required(row, ["id", "title", "domain", "instruction_file"], idx)
+    card_id = str(row["id"]).strip()
+    if card_id in seen_ids:
+        raise RegistryError(f"Duplicate card id: '{card_id}'")
+    seen_ids.add(card_id)
+    return card_id
+
+
 def load_registry(
     registry_path: str | Path,
     *,
@@ -228,11 +327,12 @@ def load_registry(
 
     raw = _read_structured(path)
     if validate_schema:
-        _validate_schema(
-            raw,
-            path,
-            Path(schema_path).expanduser().resolve() if schema_path is not None else None,
-        )
+        with timing.stage("schema_validation"):
+            _validate_schema(
+                raw,
+                path,
+                Path(schema_path).expanduser().resolve() if schema_path is not None else None,
+            )
     entries = _normalize_entries(raw)
 
     cards: list[ToolCard] = []
@@ -240,62 +340,170 @@ def load_registry(
     root = path.parent
 
     for idx, row in enumerate(entries):
-        _validate_required(row, ["id", "title", "domain", "instruction_file"], idx)
+        _card_id(row, idx, seen_ids)
+        cards.append(_build_card(row, root))
 
-        card_id = str(row["id"]).strip()
-        if card_id in seen_ids:
-            raise RegistryError(f"Duplicate card id: '{card_id}'")
-        seen_ids.add(card_id)
+    return cards
 
-        title = str(row["title"]).strip()
-        description = str(row.get("description", "")).strip()
-        instruction_file = str(row["instruction_file"]).strip()
-        input_contract = _to_map(row.get("input_contract"), "input_contract", card_id)
-        invocation_raw = _to_any_map(row.get("invocation"), "invocation", card_id)
 
-        # Use inlined instruction_text if present (compiled registry), else read from file
-        instruction_text = str(row.get("instruction_text", "")).strip()
-        if not instruction_text:
-            instruction_path = (root / instruction_file).resolve()
-            if not instruction_path.is_relative_to(root.resolve()):
-                raise RegistryError(f"Path traversal detected: {instruction_path} is outside of {root.resolve()}")
-            if not instruction_path.exists():
-                raise RegistryError(
-                    f"Instruction file missing for '{card_id}': {instruction_path}"
-                )
-            instruction_text = instruction_path.read_text(encoding="utf-8").strip()
-
-        card = ToolCard(
-            id=card_id,
-            title=title,
-            domain=str(row["domain"]).strip(),
-            instruction_file=instruction_file,
-            description=description,
-            tags=_to_list(row.get("tags"), "tags", card_id),
-            tool_hints=_to_list(row.get("tool_hints"), "tool_hints", card_id),
-            examples=_to_list(row.get("examples"), "examples", card_id),
-            aliases=_to_list(row.get("aliases"), "aliases", card_id),
-            dependencies=_to_list(row.get("dependencies"), "dependencies", card_id),
-            output_artifacts=_to_list(
-                row.get("output_artifacts"), "output_artifacts", card_id
-            ),
-            quality_checks=_to_list(
-                row.get("quality_checks"), "quality_checks", card_id
-            ),
-            constraints=_to_list(row.get("constraints"), "constraints", card_id),
-            input_contract=input_contract,
-            invocation=_normalize_invocation(
-                invocation_raw,
-                card_id=card_id,
-                card_title=title,
-                card_description=description,
-                input_contract=input_contract,
-            ),
-            risk_level=str(row.get("risk_level", "")).strip(),
-            maturity=str(row.get("maturity", "")).strip(),
-            metadata=_to_any_map(row.get("metadata"), "metadata", card_id),
-            instruction_text=instruction_text,
+@dataclass(frozen=True, slots=True)
+class RegistryDiff:
+    """Card ids added, changed and removed between two loads of a registry."""
+
+    added: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+
+def diff_registries(old: list[ToolCard], new: list[ToolCard]) -> RegistryDiff:
+    """Compare two card lists by id; cards reused by :class:`RegistryLoader` compare by identity."""
+    before = {card.id: card for card in old}
+    added: list[str] = []
+    changed: list[str] = []
+    for card in new:
+        previous = before.pop(card.id, None)
+        if previous is None:
+            added.append(card.id)
+        elif previous is not card and previous != card:
+            changed.append(card.id)
+    return RegistryDiff(added=added, changed=changed, removed=list(before))
+
+
+@dataclass(slots=True)
+class _CachedEntry:
+    row: dict[str, Any]
+    # (mtime_ns, size) and content hash of the instruction file, when not inlined
+    stat: tuple[int, int] | None
+    text_hash: str | None
+    card: ToolCard
+    digest: bytes
+
+
+class RegistryLoader:
+    """Reloads one registry, rebuilding only the entries that changed.
+
+    Each entry is kept with the raw row it was built from and the stat and
+    content hash of its instruction file. On :meth:`load`, entries whose row
+    is unchanged and whose instruction file has the same mtime and size (or,
+    failing that, the same content hash) reuse their previous
+    :class:`ToolCard` object, and only new or changed entries are
+    normalized and schema-validated. When neither the registry file nor any
+    instruction file changed mtime or size, nothing is parsed at all;
+    otherwise parsing is a full pass and everything after it scales with the
+    size of the change.
+    """
+
+    def __init__(
+        self,
+        registry_path: str | Path,
+        *,
+        validate_schema: bool = True,
+        schema_path: str | Path | None = None,
+    ) -> None:
+        self.path = Path(registry_path).expanduser().resolve()
+        self.validate_schema = validate_schema
+        self.schema_path = (
+            Path(schema_path).expanduser().resolve() if schema_path is not None else None
         )
-        cards.append(card)
+        self.cards: list[ToolCard] = []
+        self.fingerprint = registry_fingerprint([])
+        self._entries: dict[str, _CachedEntry] = {}
+        self._file_stat: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+
+    def load(self) -> RegistryDiff:
+        """Reload the registry and return what changed since the previous load."""
+        with self._lock:
+            return self._load()
+
+    def _load(self) -> RegistryDiff:
+        if not self.path.exists():
+            raise RegistryError(f"Registry not found: {self.path}")
+        st = self.path.stat()
+        file_stat = (st.st_mtime_ns, st.st_size)
+        if file_stat == self._file_stat and self._instructions_unchanged():
+            return RegistryDiff()
+        raw = _read_structured(self.path)
+        entries = _normalize_entries(raw)
+        root = self.path.parent
+
+        previous = self._entries
+        seen_ids: set[str] = set()
+        ids = [_card_id(row, idx, seen_ids) for idx, row in enumerate(entries)]
+        changed_rows = [
+            row for card_id, row in zip(ids, entries)
+            if card_id not in previous or previous[card_id].row != row
+        ]
+        if self.validate_schema and (changed_rows or not previous):
+            # Validate the document with only the new or changed entries; the
+            # others passed validation when they were first loaded.
+            with timing.stage("schema_validation"):
+                _validate_schema(
+                    _with_entries(raw, changed_rows or entries[:1]), self.path, self.schema_path
+                )
 
-    return cards
+        fresh: dict[str, _CachedEntry] = {}
+        for card_id, row in zip(ids, entries):
+            fresh[card_id] = self._load_entry(row, root, previous.get(card_id))
+        cards = [entry.card for entry in fresh.values()]
+
+        diff = diff_registries(self.cards, cards)
+        self._file_stat = file_stat
+        self._entries = fresh
+        self.cards = cards
+        self.fingerprint = _fingerprint_digests(entry.digest for entry in fresh.values())
+        return diff
+
+    def _instructions_unchanged(self) -> bool:
+        root = self.path.parent
+        for entry in self._entries.values():
+            if entry.stat is None:
+                continue
+            try:
+                st = (root / str(entry.row["instruction_file"]).strip()).stat()
+            except OSError:
+                return False
+            if (st.st_mtime_ns, st.st_size) != entry.stat:
+                return False
+        return True
+
+    def _load_entry(
+        self, row: dict[str, Any], root: Path, cached: _CachedEntry | None
+    ) -> _CachedEntry:
+        same_row = cached is not None and cached.row == row
+        inline = str(row.get("instruction_text", "")).strip()
+        instruction_path: Path | None = None
+        stat: tuple[int, int] | None = None
+        if not inline:
+            card_id = str(row["id"]).strip()
+            instruction_file = str(row["instruction_file"]).strip()
+            instruction_path = _instruction_path(root, instruction_file, card_id)
+            st = instruction_path.stat()
+            stat = (st.st_mtime_ns, st.st_size)
+        if same_row and cached.stat == stat:
+            return _CachedEntry(row, stat, cached.text_hash, cached.card, cached.digest)
+
+        text, text_hash = inline, None
+        if instruction_path is not None:
+            text = instruction_path.read_text(encoding="utf-8").strip()
+            text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            if same_row and cached.text_hash == text_hash:
+                # Touched but not edited.
+                return _CachedEntry(row, stat, text_hash, cached.card, cached.digest)
+        card = _build_card(row, root, instruction_text=text)
+        digest = _card_digest(card)
+        if cached is not None and cached.digest == digest:
+            # Edited in a way that normalizes to the same card.
+            card = cached.card
+        return _CachedEntry(row, stat, text_hash, card, digest)
+
+
+def _with_entries(raw: Any, entries: list[dict[str, Any]]) -> Any:
+    """``raw`` with its card list replaced by ``entries``."""
+    if isinstance(raw, list):
+        return entries
+    key = "tools" if isinstance(raw.get("tools"), list) else "roles"
+    return {**raw, key: entries}
@@ -2,14 +2,43 @@
 
 from __future__ import annotations
 
+import threading
+from typing import Any
+
+from . import deadline, timing
+from .adapters.renderer import ContextRenderer
 from .backends.memory import InMemoryBackend
+from .cache import QueryCache, normalize_query_key
+from .cardstore import CardStore
+from .corpus import Corpus, derive_fingerprint
 from .models import ExpertCard, RetrievalHit
+from .roles import NameIndex, name_variants
 
 
 class SkillRetriever:
-    def __init__(self, cards: list[ExpertCard], *, use_dense: bool = False, backend: str = "chroma"):
+    def __init__(
+        self,
+        cards: list[ExpertCard],
+        *,
+        use_dense: bool = False,
+        backend: str = "chroma",
+        cache_size: int = 256,
+        cache_ttl: float | None = 60.0,
+        prerender: bool = False,
+        corpus: Corpus | None = None,
+        background_dense: bool = False,
+        exact_match: bool = True,
+    ):
+        self.use_dense = bool(use_dense)
+        # Pass a shared corpus to reuse tokenization, postings and embeddings
+        # across retrievers built over the same cards (e.g. other backends).
+        self.corpus = corpus if corpus is not None else Corpus(cards)
         if backend == "memory" or (backend == "auto" and len(cards) < (100 if use_dense else 1000)):
-            self._backend = InMemoryBackend(use_dense=use_dense)
+            self._backend = InMemoryBackend(use_dense=use_dense, background_dense=background_dense)
+        elif backend == "sqlite":
+            from .backends.sqlite import SQLiteBackend
+
+            self._backend = SQLiteBackend(use_dense=use_dense)
         else:
             try:
                 from .backends.chroma import ChromaBackend
@@ -21,8 +50,176 @@ class SkillRetriever:
                     dense_candidates_multiplier=10,
                 )
             except Exception:
-                self._backend = InMemoryBackend(use_dense=use_dense)
-        self._backend.index(cards)
+                self._backend = InMemoryBackend(
+                    use_dense=use_dense, background_dense=background_dense
+                )
+        self.backend_name = type(self._backend).__name__
+        with timing.stage("index"):
+            self._backend.index(cards, corpus=self.corpus)
+        self.index_version = self.corpus.fingerprint
+        # Serializes upsert/remove; retrieve() takes no lock.
+        self._write_lock = threading.Lock()
+        self.cache = (
+            QueryCache(maxsize=cache_size, ttl=cache_ttl) if int(cache_size) > 0 else None
+        )
+        # Last full answer per query, kept past the TTL as the answer of last
+        # resort when a search misses its deadline.
+        self._last_answers = QueryCache(maxsize=max(1, int(cache_size)), ttl=None)
+        # Card fields as columns for projecting hits into payloads.
+        self.store = CardStore(cards)
+        # Built on the first query; see _pinned().
+        self._exact_match = bool(exact_match)
+        self._names: NameIndex | None = None
+        self.renderer = ContextRenderer()
+        self._prerender = bool(prerender)
+        if prerender:
+            self.renderer.warm(cards)
+
+    def upsert(self, cards: list[ExpertCard]) -> None:
+        """Add ``cards`` to the index, replacing cards with the same id, without a rebuild.
+
+        ``corpus`` keeps describing the cards the retriever was built with.
+        """
+        cards = list(cards)
+        if not cards:
+            return
+        with self._write_lock:
+            with timing.stage("index"):
+                self._backend.upsert(cards)
+            if self._names is not None:
+                for card in cards:
+                    previous = self.store.get(card.id)
+                    if previous is not None:
+                        self._names.discard(card.id, _card_names(previous))
+                    self._names.add(card.id, _card_names(card))
+            self.store = self.store.with_cards(cards)
+            self._changed(
+                derive_fingerprint(self.index_version, upserted=cards), [c.id for c in cards]
+            )
+        if self._prerender:
+            self.renderer.warm(cards)
+
+    def remove(self, card_ids: list[str]) -> None:
+        """Drop cards from the index by id."""
+        card_ids = list(card_ids)
+        if not card_ids:
+            return
+        with self._write_lock:
+            with timing.stage("index"):
+                self._backend.remove(card_ids)
+            if self._names is not None:
+                for card_id in card_ids:
+                    previous = self.store.get(card_id)
+                    if previous is not None:
+                        self._names.discard(card_id, _card_names(previous))
+            self.store = self.store.without(card_ids)
+            self._changed(derive_fingerprint(self.index_version, removed=card_ids), card_ids)
+
+    def _changed(self, index_version: str, card_ids: list[str]) -> None:
+        # A new index version makes every cached result unreachable; clear
+        # them now rather than waiting for eviction.
+        self.index_version = index_version
+        if self.cache is not None:
+            self.cache.clear()
+        self._last_answers.clear()
+        self.renderer.invalidate(card_ids)
+
+    def retrieve(
+        self, query: str, top_k: int = 3, *, deadline_ms: float | None = None
+    ) -> list[RetrievalHit]:
+        """Top ``top_k`` cards for ``query``.
+
+        A query that is exactly one card's id, alias, title or friendly name
+        pins that card first (``mode="exact"``) ahead of the scored hits;
+        with ``top_k=1`` nothing is scored at all.
+
+        With ``deadline_ms`` (or inside :func:`deadline.budget`), stages that
+        would overrun the budget are skipped: dense scoring first, giving
+        sparse-only hits, then the search itself, answered with the last
+        full result for this query (empty if there is none). Skipped stages
+        are recorded on the budget.
+        """
+        with deadline.budget(deadline_ms):
+            pinned = self._pinned(query)
+            if pinned is None:
+                return self._retrieve(query, top_k)
+            timing.count("exact_match")
+            if top_k <= 1:
+                return [pinned]
+            hits = self._retrieve(query, top_k)
+            return [pinned, *(hit for hit in hits if hit.card.id != pinned.card.id)][:top_k]
+
+    def _pinned(self, query: str) -> RetrievalHit | None:
+        if not self._exact_match:
+            return None
+        names = self._names
+        if names is None:
+            with self._write_lock:
+                if self._names is None:
+                    index = NameIndex()
+                    for card in self.store.cards():
+                        index.add(card.id, _card_names(card))
+                    self._names = index
+                names = self._names
+        ids = names.get(query)
+        if len(ids) != 1:  # no match, or ambiguous: score normally
+            return None
+        card = self.store.get(ids[0])
+        if card is None:
+            return None
+        # Not scored: 1.0 is a placeholder at the top of the sparse score range,
+        # so the pinned card never looks weaker than the hits ranked below it.
+        return RetrievalHit(card=card, score=1.0, sparse_score=None, mode="exact")
+
+    def _retrieve(self, query: str, top_k: int) -> list[RetrievalHit]:
+        if self.cache is None:
+            done, hits = deadline.run(self._backend.query, query, top_k, stage="search")
+            return hits if done else []
+
+        normalized = normalize_query_key(query)
+        key = self.cache_key("hits", normalized, int(top_k))
+        hits = self.cache.get(key)
+        if hits is not None:
+            timing.count("cache_hit")
+            return list(hits)
+        timing.count("cache_miss")
+        budget = deadline.current()
+        n_skipped = len(budget.skipped) if budget is not None else 0
+        last_key = (self.index_version, normalized, int(top_k))
+        done, hits = deadline.run(self._backend.query, query, top_k, stage="search")
+        if not done:
+            return list(self._last_answers.get(last_key) or [])
+        if budget is None or len(budget.skipped) == n_skipped:
+            # Degraded answers are not cached, so the next call can do better.
+            self.cache.put(key, hits)
+            self._last_answers.put(last_key, hits)
+        return list(hits)
+
+    def dense_status(self) -> str:
+        """``off``, ``loading``, ``ready`` or ``failed`` for the dense half of retrieval."""
+        status = getattr(self._backend, "dense_status", None)
+        if status is not None:
+            return status
+        return "ready" if self.use_dense else "off"
+
+    def cache_key(self, *parts: Any) -> tuple[Any, ...]:
+        """Build a cache key scoped to this retriever's backend and index version.
+
+        The dense status is part of the key, so sparse-only results served
+        while embeddings load are not returned once dense is ready.
+        """
+        return (self.index_version, self.backend_name, self.dense_status(), *parts)
+
+    def cache_stats(self) -> dict[str, Any]:
+        if self.cache is None:
+            stats: dict[str, Any] = {"enabled": False}
+        else:
+            stats = {"enabled": True, "index_version": self.index_version, **self.cache.stats()}
+        embedding_cache = getattr(self._backend, "embedding_cache", None)
+        if self.use_dense and embedding_cache is not None:
+            stats["query_embeddings"] = embedding_cache.stats()
+        return stats
+
 
-    def retrieve(self, query: str, top_k: int = 3) -> list[RetrievalHit]:
-        return self._backend.query(query, top_k=top_k)
+def _card_names(card: ExpertCard) -> set[str]:
+    return name_variants(card.id, card.title, card.aliases)
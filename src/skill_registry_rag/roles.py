@@ -4,6 +4,7 @@ import copy
 import json
 import re
 import shutil
+from collections.abc import Iterable
 from pathlib import Path
 from typing import Any
 
@@ -12,6 +13,7 @@ import yaml
 
 _SUPPORTED_SUFFIXES = {".json", ".yaml", ".yml"}
 _ROLE_DEPENDENCY_ID_RE = re.compile(r"`([A-Za-z0-9._-]+)`")
+_NON_ALNUM_RE = re.compile(r"[\W_]+")
 
 
 class RoleCatalogError(ValueError):
@@ -42,7 +44,76 @@ def friendly_role_name(role_id: str) -> str:
 
 
 def _role_selector_key(value: str) -> str:
-    return "".join(ch for ch in str(value).lower() if ch.isalnum())
+    # Drop the usual separators with str methods and fall back to the regex
+    # ([\W_] is every character that is not str.isalnum()) for the rest.
+    key = "".join(str(value).lower().replace("-", " ").replace(".", " ").split())
+    return key if key.isalnum() else _NON_ALNUM_RE.sub("", key)
+
+
+def name_variants(item_id: str, title: str = "", aliases: Iterable[str] = ()) -> set[str]:
+    """Names that select a card or role exactly: id, id suffix, friendly name, titles, aliases."""
+    friendly = friendly_role_name(item_id)
+    return {
+        item_id,
+        item_id.split(".", 1)[-1],
+        friendly,
+        title,
+        title.replace(" Role Orchestrator", "").strip(),
+        *aliases,
+    }
+
+
+class NameIndex:
+    """Hash index from exact names to the ids they select.
+
+    Names are compared case-, space- and punctuation-insensitively, so
+    ``bi.kpi-governance``, ``BI KPI Governance`` and ``bikpigovernance``
+    are the same key. Lookups are one dict probe.
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[str, tuple[str, ...]] = {}
+
+    def add(self, item_id: str, names: Iterable[str]) -> None:
+        for key in {_role_selector_key(name) for name in names} - {""}:
+            ids = self._ids.get(key)
+            if ids is None:
+                self._ids[key] = (item_id,)
+            elif item_id not in ids:
+                self._ids[key] = tuple(sorted((*ids, item_id)))
+
+    def discard(self, item_id: str, names: Iterable[str]) -> None:
+        for key in {_role_selector_key(name) for name in names} - {""}:
+            ids = tuple(i for i in self._ids.get(key, ()) if i != item_id)
+            if ids:
+                self._ids[key] = ids
+            else:
+                self._ids.pop(key, None)
+
+    def get(self, name: str) -> tuple[str, ...]:
+        """Sorted ids whose names match ``name`` exactly."""
+        return self._ids.get(_role_selector_key(name), ())
+
+
+class RoleOffers(list):
+    """Role offers of one catalog load, with the :class:`NameIndex` of their names.
+
+    Returned by :func:`list_role_offers` so :func:`resolve_role_selector`
+    looks selectors up without re-indexing the catalog. ``names`` reflects
+    the offers as listed; filtered copies are plain lists.
+    """
+
+    def __init__(self, offers: Iterable[dict[str, Any]] = ()) -> None:
+        super().__init__(offers)
+        self.names = _offer_index(self)
+
+
+def _offer_index(offers: Iterable[dict[str, Any]]) -> NameIndex:
+    index = NameIndex()
+    for offer in offers:
+        role_id = str(offer["id"])
+        index.add(role_id, name_variants(role_id, str(offer.get("title", ""))))
+    return index
 
 
 def resolve_role_selector(selector: str, offers: list[dict[str, Any]]) -> str:
@@ -50,25 +121,11 @@ def resolve_role_selector(selector: str, offers: list[dict[str, Any]]) -> str:
     if not selected:
         raise RoleCatalogError("Missing role selector.")
 
-    key = _role_selector_key(selected)
-    matches: list[str] = []
-    for offer in offers:
-        role_id = str(offer["id"])
-        suffix = role_id.split(".", 1)[-1]
-        title = str(offer.get("title", ""))
-        title_short = title.replace(" Role Orchestrator", "").strip()
-        variants = {
-            role_id,
-            suffix,
-            friendly_role_name(role_id),
-            friendly_role_name(role_id).replace("-", " "),
-            title,
-            title_short,
-        }
-        if key in {_role_selector_key(v) for v in variants}:
-            matches.append(role_id)
-
-    unique_matches = sorted(set(matches))
+    if isinstance(offers, RoleOffers):
+        index = offers.names
+    else:
+        index = _offer_index(offers)
+    unique_matches = list(index.get(selected))
     if len(unique_matches) == 1:
         return unique_matches[0]
     if not unique_matches:
@@ -241,7 +298,7 @@ def list_role_offers(
     *,
     catalog_registry: str | Path,
     installed_registry: str | Path | None = None,
-) -> list[dict[str, Any]]:
+) -> RoleOffers:
     catalog_path, _, _, catalog_entries = _load_catalog(catalog_registry)
     catalog_root = catalog_path.parent
     by_id = {
@@ -286,7 +343,7 @@ def list_role_offers(
         )
 
     offers.sort(key=lambda x: x["id"])
-    return offers
+    return RoleOffers(offers)
 
 
 def install_role_bundle(
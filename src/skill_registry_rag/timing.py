@@ -0,0 +1,186 @@
+"""Lightweight per-stage timing for the retrieval pipeline.
+
+Stages are recorded only while a request collector is active (see
+:func:`collect`) or process-wide metrics are enabled (``SKILLMESH_METRICS=1``
+or :func:`enable_metrics`). Otherwise :func:`stage` returns a shared no-op
+context manager, so instrumented code pays one context-variable lookup.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_NOOP = nullcontext()
+_current: ContextVar[Timings | None] = ContextVar("skillmesh_timings", default=None)
+
+
+class Timings:
+    """Stage durations (ms) and counters collected for one request."""
+
+    __slots__ = ("counters", "stages", "started")
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self.started = time.perf_counter()
+
+    def add(self, name: str, elapsed_ms: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self) -> dict[str, Any]:
+        # Stages may nest (schema_validation runs inside load_registry), so
+        # the total is wall time since collection started, not a sum.
+        out: dict[str, Any] = {name: round(ms, 3) for name, ms in self.stages.items()}
+        out["total"] = round((time.perf_counter() - self.started) * 1000.0, 3)
+        if self.counters:
+            out["counters"] = dict(self.counters)
+        return out
+
+
+class StageMetrics:
+    """Process-wide cumulative stage timings and counters."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stages: dict[str, list[float]] = {}
+        self._counters: dict[str, int] = {}
+
+    def observe(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            entry = self._stages.get(name)
+            if entry is None:
+                self._stages[name] = [1, elapsed_ms, elapsed_ms]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed_ms
+                entry[2] = max(entry[2], elapsed_ms)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {
+                    name: {"count": int(c), "sum_ms": s, "max_ms": m}
+                    for name, (c, s, m) in sorted(self._stages.items())
+                },
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def prometheus_text(self) -> str:
+        """Render metrics in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = [
+            "# HELP skillmesh_stage_seconds Time spent per retrieval pipeline stage.",
+            "# TYPE skillmesh_stage_seconds summary",
+        ]
+        for name, stat in snap["stages"].items():
+            lines.append(f'skillmesh_stage_seconds_sum{{stage="{name}"}} {stat["sum_ms"] / 1000.0:.6f}')
+            lines.append(f'skillmesh_stage_seconds_count{{stage="{name}"}} {stat["count"]}')
+        lines.append("# HELP skillmesh_stage_seconds_max Slowest observation per stage.")
+        lines.append("# TYPE skillmesh_stage_seconds_max gauge")
+        for name, stat in snap["stages"].items():
+            lines.append(f'skillmesh_stage_seconds_max{{stage="{name}"}} {stat["max_ms"] / 1000.0:.6f}')
+        lines.append("# HELP skillmesh_events_total Pipeline event counters.")
+        lines.append("# TYPE skillmesh_events_total counter")
+        for name, value in snap["counters"].items():
+            lines.append(f'skillmesh_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = StageMetrics()
+_metrics_enabled = os.getenv("SKILLMESH_METRICS", "").strip().lower() in {"1", "true", "yes"}
+
+
+def enable_metrics(enabled: bool = True) -> None:
+    global _metrics_enabled
+    _metrics_enabled = bool(enabled)
+
+
+def metrics_enabled() -> bool:
+    return _metrics_enabled
+
+
+class _Stage:
+    __slots__ = ("_name", "_recorder", "_started")
+
+    def __init__(self, name: str, recorder: Timings | None) -> None:
+        self._name = name
+        self._recorder = recorder
+        self._started = 0.0
+
+    def __enter__(self) -> _Stage:
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        elapsed_ms = (time.perf_counter() - self._started) * 1000.0
+        if self._recorder is not None:
+            self._recorder.add(self._name, elapsed_ms)
+        if _metrics_enabled:
+            METRICS.observe(self._name, elapsed_ms)
+
+
+def stage(name: str):
+    """Time the enclosed block as pipeline stage ``name``."""
+    recorder = _current.get()
+    if recorder is None and not _metrics_enabled:
+        return _NOOP
+    return _Stage(name, recorder)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Increment event counter ``name`` for the current request and metrics."""
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.count(name, n)
+    if _metrics_enabled:
+        METRICS.count(name, n)
+
+
+def current() -> Timings | None:
+    return _current.get()
+
+
+@contextmanager
+def collect(label: str = "request") -> Iterator[Timings]:
+    """Collect stage timings for the enclosed request.
+
+    On exit the timings are logged as one JSON object at DEBUG level on the
+    ``skill_registry_rag.timing`` logger.
+    """
+    recorder = Timings()
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({"event": label, "timings_ms": recorder.as_dict()}))
+
+
+def maybe_collect(enabled: bool, label: str = "request"):
+    """Like :func:`collect` when ``enabled`` or DEBUG logging is on, else a no-op yielding None."""
+    if enabled or logger.isEnabledFor(logging.DEBUG):
+        return collect(label)
+    return nullcontext(None)
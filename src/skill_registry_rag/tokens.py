@@ -0,0 +1,59 @@
+"""Prompt token counting for budgeted context emission."""
+
+from __future__ import annotations
+
+import os
+import re
+from collections.abc import Callable
+from functools import lru_cache
+
+TokenCounter = Callable[[str], int]
+
+_WORD_OR_SYMBOL_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def approx_token_count(text: str) -> int:
+    """Estimate BPE token count without a vocabulary.
+
+    Roughly tracks ``cl100k_base`` on English prose, markdown and code: each
+    punctuation mark is one token, digit runs split into groups of three and
+    words into pieces of up to six letters.
+    """
+    total = 0
+    for piece in _WORD_OR_SYMBOL_RE.findall(str(text or "")):
+        if piece[0].isdigit():
+            total += (len(piece) + 2) // 3
+        elif piece[0].isalpha():
+            total += 1 + (len(piece) - 1) // 6
+        else:
+            total += 1
+    return total
+
+
+@lru_cache(maxsize=4)
+def get_token_counter(name: str | None = None) -> TokenCounter:
+    """Return a token counter by name.
+
+    ``name`` defaults to ``SKILLMESH_TOKENIZER`` or ``"auto"``. ``"approx"``
+    always uses :func:`approx_token_count`. ``"auto"`` uses tiktoken's
+    ``cl100k_base`` and falls back to the approximation when tiktoken or its
+    encoding files are unavailable. Any other value names a tiktoken encoding
+    and raises ``ValueError`` when it cannot be loaded.
+    """
+    resolved = (name or os.getenv("SKILLMESH_TOKENIZER", "").strip() or "auto").lower()
+    if resolved == "approx":
+        return approx_token_count
+    encoding_name = "cl100k_base" if resolved == "auto" else resolved
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(encoding_name)
+    except Exception:
+        if resolved != "auto":
+            raise ValueError(f"Tokenizer '{encoding_name}' is not available.") from None
+        return approx_token_count
+
+    def count(text: str) -> int:
+        return len(encoding.encode(str(text or ""), disallowed_special=()))
+
+    return count
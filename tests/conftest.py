@@ -3,7 +3,18 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 SRC = ROOT / "src"
 if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _isolated_segment_dir(tmp_path_factory):
+    # Keep the persistent index cache out of the user's home directory.
+    mp = pytest.MonkeyPatch()
+    mp.setenv("SKILLMESH_SEGMENT_DIR", str(tmp_path_factory.mktemp("segments")))
+    yield
+    mp.undo()
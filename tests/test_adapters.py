@@ -2,9 +2,14 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from skill_registry_rag.adapters import render_claude_context, render_codex_context
+from skill_registry_rag.adapters import (
+    ContextRenderer,
+    render_claude_context,
+    render_codex_context,
+)
 from skill_registry_rag.registry import load_registry
 from skill_registry_rag.retriever import SkillRetriever
+from skill_registry_rag.tokens import approx_token_count
 
 
 def _get_hits():
@@ -44,3 +49,49 @@ def test_adapters_render_enriched_metadata():
     assert "Risk level:" in codex_out
     assert "<dependencies>" in claude_out
     assert "<risk_level>" in claude_out
+
+
+def test_context_renderer_matches_direct_render():
+    hits = _get_hits()
+    renderer = ContextRenderer()
+    renderer.warm([h.card for h in hits], instruction_chars=200)
+
+    query = "create matplotlib seaborn charts"
+    assert renderer.render("claude", query, hits, instruction_chars=200) == render_claude_context(
+        query, hits, instruction_chars=200
+    )
+    assert renderer.render("codex", query, hits, instruction_chars=200) == render_codex_context(
+        query, hits, instruction_chars=200
+    )
+    assert renderer.render("codex", query, [], instruction_chars=200) == render_codex_context(
+        query, [], instruction_chars=200
+    )
+
+
+def test_context_renderer_reuses_and_invalidates_fragments():
+    hit = _get_json_hits()[0]
+    renderer = ContextRenderer()
+    first = renderer.fragment("claude", hit.card, instruction_chars=150)
+    assert renderer.fragment("claude", hit.card, instruction_chars=150) is first
+
+    renderer.invalidate([hit.card.id])
+    assert renderer.fragment("claude", hit.card, instruction_chars=150) is not first
+
+
+def test_context_renderer_packs_cards_into_token_budget():
+    hits = _get_hits()
+    renderer = ContextRenderer(token_counter=approx_token_count)
+    query = "create matplotlib seaborn charts"
+    full = renderer.render("claude", query, hits, instruction_chars=700)
+    assert approx_token_count(full) > 300
+
+    packed = renderer.render("claude", query, hits, instruction_chars=700, max_tokens=300)
+    assert approx_token_count(packed) <= 300
+    assert "viz.matplotlib-seaborn" in packed
+    assert packed.count("<card>") >= 1
+
+
+def test_approx_token_count_is_close_to_word_count_for_prose():
+    assert approx_token_count("") == 0
+    assert approx_token_count("build a chart") == 3
+    assert approx_token_count("x, y") == 3
@@ -3,6 +3,7 @@ from __future__ import annotations
 from pathlib import Path
 
 import numpy as np
+import pytest
 
 from skill_registry_rag.backends import RetrievalBackend
 from skill_registry_rag.backends.chroma import ChromaBackend
@@ -111,19 +112,25 @@ def test_chroma_backend_weighted_hybrid_affects_rank_order(monkeypatch):
     ]
 
     class StubCollection:
-        def query(self, query_texts, n_results):  # noqa: ANN001
+        def query(self, query_embeddings, n_results):  # noqa: ANN001
             return {
                 "ids": [["card.dense", "card.sparse"]],
                 "distances": [[0.0, 0.2]],  # dense: card.dense > card.sparse
             }
 
-    sparse_scores = np.asarray([1.0, 0.0], dtype=np.float32)  # sparse: card.sparse > card.dense
+    # sparse: card.sparse > card.dense
+    sparse_scores = (np.asarray([0, 1]), np.asarray([1.0, 0.0], dtype=np.float32))
+
+    class StubEmbedder:
+        def cached_query(self, query):  # noqa: ANN001
+            return np.ones(4, dtype=np.float32)
 
     sparse_heavy = ChromaBackend(use_dense=False, sparse_weight=0.8, dense_weight=0.2)
     sparse_heavy._cards = cards
     sparse_heavy._use_dense = True
     sparse_heavy._collection = StubCollection()
-    monkeypatch.setattr(sparse_heavy, "_sparse_scores", lambda _: sparse_scores)
+    sparse_heavy.embedder = StubEmbedder()
+    monkeypatch.setattr(sparse_heavy, "_sparse_candidates", lambda *_: sparse_scores)
     sparse_hits = sparse_heavy.query("any", top_k=1)
     assert sparse_hits[0].card.id == "card.sparse"
 
@@ -131,6 +138,604 @@ def test_chroma_backend_weighted_hybrid_affects_rank_order(monkeypatch):
     dense_heavy._cards = cards
     dense_heavy._use_dense = True
     dense_heavy._collection = StubCollection()
-    monkeypatch.setattr(dense_heavy, "_sparse_scores", lambda _: sparse_scores)
+    dense_heavy.embedder = StubEmbedder()
+    monkeypatch.setattr(dense_heavy, "_sparse_candidates", lambda *_: sparse_scores)
     dense_hits = dense_heavy.query("any", top_k=1)
     assert dense_hits[0].card.id == "card.dense"
+
+
+def test_chroma_backend_uses_shared_embedder_for_cards_and_queries():
+    from skill_registry_rag.backends.embedders import get_embedder
+
+    cards = _load_cards()
+    backend = ChromaBackend(ephemeral=True, dense_model="lsa", collection_name="test_embedder")
+    backend.index(cards)
+
+    assert backend.embedder is get_embedder("lsa")
+    assert backend._collection.metadata["embedding_model"] == "lsa"
+    stored = backend._collection.get(ids=[cards[0].id], include=["embeddings", "documents"])
+    expected = backend.embedder.embed_corpus(backend._corpus)[0]
+    assert np.allclose(stored["embeddings"][0], expected, atol=1e-6)
+    assert stored["documents"] == [None]
+
+    memory = InMemoryBackend(use_dense=True, dense_model="lsa")
+    memory.index(cards, corpus=backend._corpus)
+    query = "build matplotlib seaborn heatmap"
+    hits = backend.query(query, top_k=2)
+    assert hits[0].card.id == "viz.matplotlib-seaborn"
+    assert hits[0].mode == "hybrid"
+    assert hits[0].card.id == memory.query(query, top_k=1)[0].card.id
+
+
+def test_chroma_backend_reuses_fingerprinted_collection(tmp_path, monkeypatch):
+    from dataclasses import replace
+
+    cards = _load_cards()
+    first = ChromaBackend(data_dir=tmp_path, dense_model="lsa")
+    first.index(cards)
+    assert first.dense_status == "ready"
+
+    def fail(corpus):  # noqa: ANN001
+        raise AssertionError("collection should have been reused")
+
+    second = ChromaBackend(data_dir=tmp_path, dense_model="lsa")
+    monkeypatch.setattr(second.embedder, "embed_corpus", fail)
+    second.index(cards)
+    assert second.collection_name == first.collection_name
+    assert second.query("build matplotlib seaborn heatmap", top_k=1)[0].mode == "hybrid"
+    monkeypatch.undo()
+
+    other = ChromaBackend(data_dir=tmp_path, dense_model="lsa")
+    other.index([replace(cards[0], title="Edited")] + cards[1:])
+    assert other.collection_name != first.collection_name
+    names = {c.name for c in other._client.list_collections()}
+    assert {first.collection_name, other.collection_name} <= names
+
+
+def test_chroma_backend_serves_sparse_while_another_process_builds(tmp_path):
+    from skill_registry_rag.backends._lock import FileLock
+    from skill_registry_rag.corpus import Corpus
+
+    cards = _load_cards()
+    waiting = ChromaBackend(data_dir=tmp_path, dense_model="lsa", lock_timeout=0)
+    name = waiting.collection_name_for(Corpus(cards).fingerprint)
+    lock = FileLock(tmp_path / "locks" / f"{name}.lock")
+    assert lock.acquire(0)
+
+    waiting.index(cards)
+    assert waiting.dense_status == "loading"
+    hits = waiting.query("build matplotlib seaborn heatmap", top_k=2)
+    assert all(h.mode == "sparse" and h.dense_score is None for h in hits)
+
+    lock.release()
+    builder = ChromaBackend(data_dir=tmp_path, dense_model="lsa")
+    builder.index(cards)
+    waiting._next_attach = 0.0
+    hits = waiting.query("build matplotlib seaborn heatmap", top_k=2)
+    assert waiting.dense_status == "ready"
+    assert all(h.mode == "hybrid" for h in hits)
+
+
+def test_chroma_backend_grows_dense_candidates_only_while_scores_are_close():
+    from skill_registry_rag import timing
+
+    cards = [
+        ToolCard(id=f"card.{i}", title=f"Card {i}", domain="test", instruction_file="n/a")
+        for i in range(200)
+    ]
+
+    class StubCollection:
+        def __init__(self, step):
+            self.step = step
+            self.requests = []
+
+        def query(self, query_embeddings, n_results):  # noqa: ANN001
+            self.requests.append(n_results)
+            return {
+                "ids": [[f"card.{i}" for i in range(n_results)]],
+                "distances": [[i * self.step for i in range(n_results)]],
+            }
+
+    class StubEmbedder:
+        def cached_query(self, query):  # noqa: ANN001
+            return np.ones(4, dtype=np.float32)
+
+    def run(step):
+        backend = ChromaBackend(use_dense=False)
+        backend._cards = cards
+        backend._use_dense = True
+        backend._collection = StubCollection(step)
+        backend.embedder = StubEmbedder()
+        with timing.collect() as recorder:
+            hits = backend.query("card", top_k=3)
+        return backend._collection.requests, recorder.counters, hits
+
+    requests, counters, hits = run(step=0.05)
+    assert requests == [20]
+    assert counters["dense_candidates"] == 20
+    assert [h.card.id for h in hits] == ["card.0", "card.1", "card.2"]
+
+    requests, counters, _ = run(step=0.0001)
+    assert requests == [20, 80, 100]
+    assert counters["dense_fetches"] == 3
+
+
+def test_sparse_index_candidate_scores_match_full_scores():
+    from skill_registry_rag.corpus import Corpus
+
+    index = Corpus(_load_cards()).sparse
+    q_ids = index.encode_query(["pipeline", "heatmap", "pipeline", "sklearn"])
+    docs, scores = index.get_candidate_scores_for_ids(q_ids)
+    full = index.get_scores_for_ids(q_ids)
+    assert np.array_equal(docs, np.flatnonzero(full))
+    assert np.allclose(scores, full[docs])
+
+
+@pytest.mark.parametrize("min_postings", [0, 10**9])
+def test_sparse_index_top_k_matches_full_ranking_and_prunes(monkeypatch, min_postings):
+    from skill_registry_rag import timing
+    from skill_registry_rag.backends import sparse
+    from skill_registry_rag.backends.sparse import SparseIndex
+
+    monkeypatch.setattr(sparse, "_PRUNE_MIN_POSTINGS", min_postings)
+
+    rng = np.random.default_rng(7)
+    vocab = [f"t{i}" for i in range(2000)]
+    weights = 1.0 / np.arange(1, len(vocab) + 1)
+    weights /= weights.sum()
+    docs = [list(rng.choice(vocab, size=int(rng.integers(5, 60)), p=weights)) for _ in range(3000)]
+    index = SparseIndex.build(docs)
+
+    for query in (["t1500", "t0", "t3"], ["t0", "t1", "t2"], ["t40", "t40", "t900"], ["zzz"]):
+        q_ids = index.encode_query(query)
+        full = index.get_scores_for_ids(q_ids)
+        for k in (1, 5, 20):
+            top, scores = index.top_k(q_ids, k)
+            expected = np.sort(full[full > 0])[::-1][:k]
+            np.testing.assert_allclose(scores, expected, rtol=1e-9)
+            np.testing.assert_allclose(full[top], scores, rtol=1e-9)
+
+    with timing.collect() as recorder:
+        index.top_k(index.encode_query(["t1500", "t0", "t3"]), 3)
+    if min_postings == 0:
+        assert recorder.counters["sparse_candidates"] < len(docs) // 4
+
+
+def test_sparse_index_top_k_skips_terms_with_zero_bound(monkeypatch):
+    from skill_registry_rag.backends import sparse
+    from skill_registry_rag.backends.sparse import SparseIndex
+
+    monkeypatch.setattr(sparse, "_PRUNE_MIN_POSTINGS", 0)
+    # "half" is in exactly half the documents, so its IDF and every impact are 0.
+    index = SparseIndex.build([["half", "plot"], ["half"], ["sql"], ["chart"]])
+    with np.errstate(all="raise"):
+        assert len(index.top_k(index.encode_query(["half"]), 2)[0]) == 0
+        docs, scores = index.top_k(index.encode_query(["half", "plot"]), 2)
+    assert docs.tolist() == [0] and scores[0] > 0
+
+
+def test_sqlite_backend_reuses_persisted_fts_index(tmp_path, monkeypatch):
+    from skill_registry_rag.backends.sqlite import SQLiteBackend
+
+    cards = _load_cards()
+    path = tmp_path / "skillmesh.db"
+    built = SQLiteBackend(path=path)
+    assert isinstance(built, RetrievalBackend)
+    built.index(cards)
+    hits = built.query("sklearn pipeline cross validation leakage safe", top_k=2)
+    assert hits[0].card.id == "ml.sklearn-modeling"
+    assert hits[0].score == 1.0 and hits[0].mode == "sparse"
+    built.close()
+
+    reopened = SQLiteBackend(path=path)
+    monkeypatch.setattr(reopened, "_build", lambda corpus: pytest.fail("index was rebuilt"))
+    reopened.index(cards)
+    assert reopened.query("build matplotlib seaborn heatmap", top_k=1)[0].card.id == (
+        "viz.matplotlib-seaborn"
+    )
+    assert len(reopened.query("zzz-no-such-term", top_k=3)) == 3
+
+
+def test_sqlite_backend_prunes_least_recently_used_registry_tables(tmp_path):
+    from skill_registry_rag.backends.sqlite import SQLiteBackend
+
+    cards = _load_cards()
+    path = tmp_path / "skillmesh.db"
+    first = SQLiteBackend(path=path, max_registries=2)
+    first.index(cards[:-2])
+    for n in (-1, len(cards)):
+        SQLiteBackend(path=path, max_registries=2).index(cards[:n])
+
+    tables = {
+        name
+        for (name,) in first._conn.execute(
+            "SELECT name FROM sqlite_master WHERE sql LIKE 'CREATE VIRTUAL TABLE cards_fts_%'"
+        )
+    }
+    (n_registries,) = first._conn.execute("SELECT COUNT(*) FROM registries").fetchone()
+    assert first._view.table not in tables and len(tables) == n_registries == 2
+    # The process still serving the dropped version rebuilds it on its next query.
+    assert first.query("build matplotlib seaborn heatmap", top_k=1)[0].card.id == (
+        "viz.matplotlib-seaborn"
+    )
+
+
+def test_sqlite_backend_hybrid_mode_uses_shared_embedder():
+    from skill_registry_rag.backends.sqlite import SQLiteBackend
+
+    backend = SQLiteBackend(path=":memory:", use_dense=True, dense_model="lsa")
+    backend.index(_load_cards())
+    assert backend.dense_status == "ready"
+    hits = backend.query("build matplotlib seaborn heatmap", top_k=2)
+    assert hits[0].card.id == "viz.matplotlib-seaborn"
+    assert all(h.mode == "hybrid" and h.dense_score is not None for h in hits)
+
+
+def test_sparse_index_matches_bm25okapi():
+    from rank_bm25 import BM25Okapi
+
+    from skill_registry_rag.backends.sparse import SparseIndex
+    from skill_registry_rag.corpus import compose_doc, tokenize
+
+    tokens = [tokenize(compose_doc(c)) for c in _load_cards()]
+    reference = BM25Okapi(tokens)
+    index = SparseIndex.build(tokens)
+    for query in ("build matplotlib seaborn heatmap", "sklearn pipeline leakage", "zzz unknown"):
+        q = tokenize(query)
+        np.testing.assert_allclose(index.get_scores(q), reference.get_scores(q), rtol=1e-9, atol=1e-9)
+
+
+def test_incremental_sparse_index_matches_rebuilt_index():
+    from skill_registry_rag.backends.sparse import IncrementalSparseIndex, SparseIndex
+    from skill_registry_rag.corpus import compose_doc, tokenize
+
+    tokens = [tokenize(compose_doc(c)) for c in _load_cards()]
+    base = IncrementalSparseIndex(SparseIndex.build(tokens[:100]))
+    updated, slots = base.apply(add=tokens[100:], remove=[3, 50])
+    updated, _ = updated.apply(remove=[slots[0]])
+    assert base.alive.all() and len(base) == 100
+
+    reference = SparseIndex.build([t for i, t in enumerate(tokens) if i not in (3, 50, 100)])
+    for query in ("build matplotlib seaborn heatmap", "sklearn pipeline leakage", "zzz unknown"):
+        q = tokenize(query)
+        scores = updated.get_scores(q)
+        np.testing.assert_allclose(scores[updated.alive], reference.get_scores(q), atol=1e-9)
+        assert not scores[~updated.alive].any()
+
+
+def test_in_memory_backend_upsert_and_remove_match_reindex():
+    cards = _load_cards()
+    renamed = ToolCard(
+        id=cards[0].id, title="Quantum flux capacitor", domain="test", instruction_file="n/a"
+    )
+    backend = InMemoryBackend(use_dense=True, dense_model="lsa")
+    backend.index(cards[:-5])
+    backend.upsert(cards[-5:] + [renamed])
+    backend.remove([cards[1].id])
+
+    live = [renamed] + cards[2:]
+    reference = InMemoryBackend()
+    reference.index(live)
+    for query in ("quantum flux capacitor", "build matplotlib seaborn heatmap"):
+        hits = backend.query(query, top_k=20)
+        expected = reference.query(query, top_k=20)
+        assert sorted(h.sparse_score for h in hits if h.sparse_score > 0.5) == pytest.approx(
+            sorted(h.sparse_score for h in expected if h.sparse_score > 0.5)
+        )
+    assert any(h.card is renamed for h in backend.query("quantum flux capacitor", top_k=2))
+    assert cards[1].id not in {h.card.id for h in backend.query("zzz", top_k=20)}
+
+    assert backend.compact()
+    assert len(backend._cards) == len(live)
+    assert backend._dense.embeddings.shape[0] == len(live)
+    assert any(h.card is renamed for h in backend.query("quantum flux capacitor", top_k=2))
+
+
+def test_chroma_backend_upsert_publishes_only_the_changed_rows(tmp_path):
+    cards = _load_cards()
+    backend = ChromaBackend(data_dir=tmp_path, dense_model="lsa")
+    backend.index(cards[:-1])
+    base_name = backend.collection_name
+    # Another process serving the unchanged registry, and another registry.
+    reader = ChromaBackend(data_dir=tmp_path, dense_model="lsa")
+    reader.index(cards[:-1])
+    unrelated = ChromaBackend(data_dir=tmp_path, dense_model="lsa")
+    unrelated.index(cards[1:6])
+
+    backend.upsert(cards[-1:])
+    backend.remove([cards[0].id])
+    # The base collection is shared; the delta holds the upserted card only.
+    assert backend.collection_name == base_name
+    assert backend._collection.count() == len(cards) - 1
+    assert backend._view.delta.count() == 1
+    hits = backend.query(cards[-1].title, top_k=20)
+    assert {h.mode for h in hits} == {"hybrid"}
+    assert cards[-1].id in {h.card.id for h in hits}
+    assert cards[0].id not in {h.card.id for h in hits}
+
+    # The previous version is untouched, so the reader keeps its dense results.
+    assert reader._collection.count() == len(cards) - 1
+    assert reader.query("build matplotlib seaborn heatmap", top_k=2)[0].mode == "hybrid"
+
+    # Another process applying the same changes reuses the published delta.
+    other = ChromaBackend(data_dir=tmp_path, dense_model="lsa")
+    other.index(cards[:-1])
+    other.upsert(cards[-1:])
+    other.remove([cards[0].id])
+    assert other._view.delta.name == backend._view.delta.name
+
+    # Only this registry's post-upsert delta goes; the served base and delta
+    # and the other registry's collection stay.
+    pruned = backend.prune_collections(keep=0)
+    assert len(pruned) == 1 and pruned[0].startswith(base_name)
+    assert unrelated.query("build matplotlib seaborn heatmap", top_k=2)[0].mode == "hybrid"
+
+    # A collection deleted under a running backend leaves it sparse-only.
+    backend._client.delete_collection(base_name)
+    assert backend.query(cards[-1].title, top_k=2)[0].mode == "sparse"
+    assert backend.dense_status == "failed"
+
+
+def test_chroma_backend_folds_changes_into_a_new_base(tmp_path, monkeypatch):
+    import skill_registry_rag.backends.chroma as chroma
+
+    monkeypatch.setattr(chroma, "_COMPACT_MIN_CHANGES", 2)
+    monkeypatch.setattr(chroma, "_COMPACT_RATIO", 0.0)
+    cards = _load_cards()
+    backend = ChromaBackend(data_dir=tmp_path, dense_model="lsa")
+    backend.index(cards[:-1])
+    base_name = backend.collection_name
+
+    backend.upsert(cards[-1:])
+    delta_name = backend._view.delta.name
+    backend.remove([cards[0].id])
+    assert backend.collection_name != base_name
+    assert backend._view.delta is None and not backend._view.changed
+    assert backend._collection.count() == len(cards) - 1
+    ids = {h.card.id for h in backend.query(cards[-1].title, top_k=20)}
+    assert cards[-1].id in ids and cards[0].id not in ids
+    # The old base and its delta share the new base's lineage.
+    assert sorted(backend.prune_collections(keep=0)) == sorted([base_name, delta_name])
+
+
+def test_sqlite_backend_upsert_and_remove(tmp_path):
+    from skill_registry_rag.backends.sqlite import SQLiteBackend
+
+    cards = _load_cards()
+    path = tmp_path / "skillmesh.db"
+    backend = SQLiteBackend(path=path)
+    stale = SQLiteBackend(path=path)
+    backend.index(cards[:-1])
+    stale.index(cards[:-1])
+
+    backend.upsert(cards[-1:])
+    backend.remove([cards[0].id])
+    assert backend.query(cards[-1].title, top_k=1)[0].card.id == cards[-1].id
+    ids = {h.card.id for h in backend.query("zzz-no-such-term", top_k=20)}
+    assert cards[0].id not in ids
+
+    # The other process's table was re-keyed away; it rebuilds and keeps serving.
+    assert stale.query("build matplotlib seaborn heatmap", top_k=1)[0].card.id == (
+        "viz.matplotlib-seaborn"
+    )
+
+
+@pytest.mark.parametrize("backend_name", ["memory", "sqlite", "chroma"])
+def test_backend_queries_stay_consistent_during_concurrent_upserts(tmp_path, backend_name):
+    import threading
+
+    from skill_registry_rag.backends.sqlite import SQLiteBackend
+
+    cards = _load_cards()
+    backend = {
+        "memory": lambda: InMemoryBackend(),
+        "sqlite": lambda: SQLiteBackend(path=tmp_path / "skillmesh.db"),
+        "chroma": lambda: ChromaBackend(ephemeral=True),
+    }[backend_name]()
+    backend.index(cards[:-1])
+    query = "build matplotlib seaborn heatmap"
+    expected = backend.query(query, top_k=1)[0].card.id
+    known = {card.id for card in cards}
+    errors: list[BaseException] = []
+    done = threading.Event()
+
+    def reader() -> None:
+        try:
+            while not done.is_set():
+                hits = backend.query(query, top_k=3)
+                assert hits[0].card.id == expected
+                assert {hit.card.id for hit in hits} <= known
+        except BaseException as exc:  # surfaced below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(5):
+            backend.upsert(cards[-1:])
+            backend.remove([cards[-1].id])
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+    assert not errors
+
+
+def test_in_memory_backend_attaches_to_published_segment(tmp_path):
+    cards = _load_cards()
+    builder = InMemoryBackend(segment_dir=tmp_path)
+    builder.index(cards)
+    assert len([p for p in tmp_path.iterdir() if not p.name.startswith(".tmp-")]) == 1
+
+    reader = InMemoryBackend(segment_dir=tmp_path)
+    reader.index(cards)
+    # Attached readers never tokenize the corpus; postings are memory-mapped.
+    assert isinstance(reader._bm25.post_docs, np.memmap)
+    assert isinstance(reader._bm25.corpus.term_ids, np.memmap)
+
+    query = "sklearn pipeline cross validation leakage safe"
+    plain = InMemoryBackend()
+    plain.index(cards)
+    expected = [(h.card.id, h.score) for h in plain.query(query, top_k=3)]
+    assert [(h.card.id, h.score) for h in reader.query(query, top_k=3)] == expected
+
+
+def test_in_memory_backend_sharded_scoring_matches_single_process(tmp_path):
+    from skill_registry_rag import timing
+    from skill_registry_rag.backends.shards import shard_bounds
+
+    assert shard_bounds(10, 3) == [(0, 3), (3, 6), (6, 10)]
+    assert shard_bounds(2, 8) == [(0, 1), (1, 2)]
+
+    cards = _load_cards()
+    queries = [
+        "sklearn pipeline cross validation leakage safe",
+        "build matplotlib seaborn heatmap",
+        "zzz-no-such-term",
+    ]
+    plain = InMemoryBackend(segment_dir=tmp_path)
+    plain.index(cards)
+    sharded = InMemoryBackend(segment_dir=tmp_path, shards=3)
+    sharded.index(cards)
+    expected = [[(h.card.id, h.score) for h in plain.query(q, top_k=5)] for q in queries]
+
+    with timing.collect() as recorder:
+        batch = sharded.query_batch(queries, top_k=5)
+    assert recorder.counters["shard_tasks"] == 3
+    assert [[(h.card.id, h.score) for h in hits] for hits in batch] == expected
+    assert [(h.card.id, h.score) for h in sharded.query(queries[0], top_k=5)] == expected[0]
+
+    # Pending upserts are not in the published segment: score in-process.
+    sharded.upsert([cards[0]])
+    with timing.collect() as recorder:
+        sharded.query(queries[0], top_k=5)
+    assert "shard_tasks" not in recorder.counters
+
+
+def test_sparse_index_stores_corpus_as_int32_ids():
+    from skill_registry_rag.backends.sparse import SparseIndex
+
+    index = SparseIndex.build([["plot", "chart", "plot"], [], ["sql", "chart"]])
+    assert index.corpus.term_ids.dtype == np.int32
+    assert index.corpus.doc_lengths().tolist() == [3, 0, 2]
+    plot, chart = index.term_id("plot"), index.term_id("chart")
+    assert index.corpus.doc(0).tolist() == [plot, chart, plot]
+    assert index.encode_query(["chart", "unknown", "plot"]).tolist() == [chart, plot]
+    assert index.term_id("unknown") == -1
+
+
+def test_in_memory_backend_caches_query_embeddings_and_encodes_off_thread():
+    import threading
+
+    from skill_registry_rag import timing
+
+    cards = _load_cards()
+    backend = InMemoryBackend()
+    backend.index(cards)
+
+    class FakeModel:
+        def __init__(self):
+            self.calls = []
+
+        def encode(self, texts, normalize_embeddings=True):  # noqa: ANN001
+            self.calls.append((texts[0], threading.current_thread().name))
+            return np.ones((1, 4), dtype=np.float32)
+
+    from skill_registry_rag.backends.embedders import SentenceTransformerEmbedder
+    from skill_registry_rag.backends.memory import _DenseState
+
+    class FakeEmbedder(SentenceTransformerEmbedder):
+        model = None
+
+    model = FakeModel()
+    embedder = FakeEmbedder("fake")
+    embedder.model = model
+    backend.embedder = embedder
+    backend._dense = _DenseState(embedder, np.eye(len(cards), 4, dtype=np.float32), None)
+
+    with timing.collect() as recorder:
+        first = backend.query("Build a heatmap", top_k=2)
+    second = backend.query("  build a   HEATMAP ", top_k=2)
+
+    assert len(model.calls) == 1
+    assert model.calls[0][1].startswith("skillmesh-query")
+    assert "dense_encode" in recorder.stages
+    assert [h.card.id for h in first] == [h.card.id for h in second]
+    assert backend.embedding_cache.stats()["hits"] == 1
+
+
+def test_in_memory_backend_answers_sparse_only_when_dense_misses_deadline():
+    import threading
+    import time
+
+    from skill_registry_rag import deadline
+    from skill_registry_rag.backends.embedders import SentenceTransformerEmbedder
+    from skill_registry_rag.backends.memory import _DenseState
+
+    cards = _load_cards()
+    backend = InMemoryBackend()
+    backend.index(cards)
+    release = threading.Event()
+
+    class SlowModel:
+        def encode(self, texts, normalize_embeddings=True):  # noqa: ANN001
+            release.wait(5)
+            return np.ones((1, 4), dtype=np.float32)
+
+    class FakeEmbedder(SentenceTransformerEmbedder):
+        model = None
+
+    embedder = FakeEmbedder("slow")
+    embedder.model = SlowModel()
+    backend.embedder = embedder
+    backend._dense = _DenseState(embedder, np.eye(len(cards), 4, dtype=np.float32), None)
+
+    started = time.perf_counter()
+    with deadline.budget(100) as budget:
+        hits = backend.query("build matplotlib seaborn heatmap", top_k=2)
+    release.set()
+    assert time.perf_counter() - started < 2
+    assert budget.skipped == ["dense"]
+    assert [h.mode for h in hits] == ["sparse", "sparse"]
+    assert hits[0].card.id == "viz.matplotlib-seaborn"
+
+
+def test_in_memory_backend_lsa_dense_mode_needs_only_numpy():
+    cards = _load_cards()
+    backend = InMemoryBackend(use_dense=True, dense_model="lsa")
+    backend.index(cards)
+
+    assert backend.dense_model_name == "lsa"
+    assert backend.dense_status == "ready"
+    assert backend._dense.embeddings.shape[0] == len(cards)
+    hits = backend.query("build matplotlib seaborn heatmap", top_k=2)
+    assert hits[0].card.id == "viz.matplotlib-seaborn"
+    assert all(h.dense_score is not None for h in hits)
+    q_vec = backend.embedder.embed_query("heatmap chart", backend._dense.corpus)
+    assert abs(float(np.linalg.norm(q_vec)) - 1.0) < 1e-5
+
+
+def test_in_memory_backend_serves_sparse_until_background_dense_is_ready(monkeypatch):
+    import threading
+
+    cards = _load_cards()
+    release = threading.Event()
+    backend = InMemoryBackend(use_dense=True, dense_model="lsa", background_dense=True)
+    original = backend._build_dense
+
+    def slow_build(corpus):
+        release.wait(5)
+        return original(corpus)
+
+    monkeypatch.setattr(backend, "_build_dense", slow_build)
+    backend.index(cards)
+
+    assert backend.dense_status == "loading"
+    early = backend.query("build matplotlib seaborn heatmap", top_k=2)
+    assert all(h.dense_score is None and h.mode == "sparse" for h in early)
+
+    release.set()
+    assert backend.wait_dense(5)
+    late = backend.query("build matplotlib seaborn heatmap", top_k=2)
+    assert all(h.dense_score is not None and h.mode == "hybrid" for h in late)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import json
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from skill_registry_rag.bench import run_benchmarks, synthesize_catalog
+from skill_registry_rag.cli import main
+from skill_registry_rag.registry import load_registry
+
+
+def _example_registry() -> Path:
+    return Path(__file__).resolve().parents[1] / "examples" / "registry" / "tools.json"
+
+
+def test_synthesize_catalog_produces_loadable_unique_cards(tmp_path):
+    templates = load_registry(_example_registry())
+    entries = synthesize_catalog(templates, 250, seed=7)
+    path = tmp_path / "synthetic.json"
+    path.write_text(json.dumps({"tools": entries}), encoding="utf-8")
+
+    cards = load_registry(path, validate_schema=False)
+    assert len(cards) == 250
+    assert len({c.id for c in cards}) == 250
+    assert all(c.instruction_text for c in cards)
+    assert synthesize_catalog(templates, 5, seed=7) == entries[:5]
+
+
+def test_run_benchmarks_reports_latency_percentiles(tmp_path, monkeypatch):
+    monkeypatch.setenv("SKILLMESH_SEGMENT_DIR", str(tmp_path))
+    report = run_benchmarks(
+        template_registry=_example_registry(),
+        sizes=[50],
+        backends=["memory"],
+        dense_modes=[False],
+        n_queries=20,
+    )
+
+    (result,) = report["results"]
+    assert result["status"] == "ok"
+    assert result["queries"] == 20
+    assert 0 < result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+    assert result["index_s"] > 0 and result["attach_s"] > 0
+    # Synthetic segments go to a throwaway store, not the persistent cache.
+    assert not any(tmp_path.iterdir())
+
+
+def test_run_benchmarks_measures_concurrent_queries():
+    report = run_benchmarks(
+        template_registry=_example_registry(),
+        sizes=[50],
+        backends=["memory"],
+        dense_modes=[False],
+        n_queries=10,
+        threads=[1, 4],
+    )
+
+    (result,) = report["results"]
+    (run,) = result["extra"]["threads"]
+    assert run["threads"] == 4
+    assert run["mismatches"] == 0
+    assert run["qps"] > 0
+
+
+def test_cli_bench_writes_json_and_markdown(tmp_path):
+    buf = StringIO()
+    with redirect_stdout(buf):
+        code = main(
+            [
+                "bench",
+                "--registry",
+                str(_example_registry()),
+                "--sizes",
+                "30",
+                "--backends",
+                "memory",
+                "--queries",
+                "5",
+                "--output-dir",
+                str(tmp_path),
+            ]
+        )
+
+    assert code == 0
+    payload = json.loads((tmp_path / "bench.json").read_text(encoding="utf-8"))
+    assert payload["results"][0]["cards"] == 30
+    assert "| 30 | memory | off |" in (tmp_path / "bench.md").read_text(encoding="utf-8")
+
+
+def test_cli_bench_names_the_invalid_flag(capsys):
+    code = main(["bench", "--sizes", "30", "--threads", "0", "--backends", "memory"])
+
+    assert code == 2
+    assert "--threads must be positive" in capsys.readouterr().err
+
+
+def test_recall_comparison_reports_sparse_and_lsa():
+    from skill_registry_rag.bench import recall_comparison
+
+    report = recall_comparison(_example_registry(), top_k=5, models=["lsa"])
+
+    rows = {(r["mode"], r["model"]): r for r in report["results"]}
+    assert set(rows) == {("sparse", None), ("dense", "lsa"), ("hybrid", "lsa")}
+    assert all(r["status"] == "ok" and 0 < r["recall"] <= 1 for r in rows.values())
+    assert rows[("dense", "lsa")]["encode_p50_ms"] < 50
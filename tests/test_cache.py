@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from skill_registry_rag.cache import QueryCache, normalize_query_key
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalize_query_key_ignores_case_and_punctuation():
+    assert normalize_query_key("  OpenCV, contour detection!") == normalize_query_key(
+        "opencv contour   detection"
+    )
+
+
+def test_query_cache_evicts_least_recently_used():
+    cache = QueryCache(maxsize=2, ttl=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_query_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = QueryCache(maxsize=8, ttl=10.0, clock=clock)
+    cache.put("q", "hit")
+    clock.now = 5.0
+    assert cache.get("q") == "hit"
+    clock.now = 16.0
+    assert cache.get("q") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+    assert stats["hit_rate"] == 0.5
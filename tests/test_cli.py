@@ -155,3 +155,99 @@ def test_cli_fetch_alias_accepts_flagged_query():
     assert code == 0
     payload = json.loads(buf.getvalue())
     assert payload["hits"][0]["id"] == "cv.opencv-image-processing"
+
+
+def test_cli_retrieve_timings_flag_reports_stages():
+    root = Path(__file__).resolve().parents[1]
+    registry = root / "examples" / "registry" / "tools.json"
+
+    buf = StringIO()
+    with redirect_stdout(buf):
+        code = main(
+            [
+                "retrieve",
+                "--registry",
+                str(registry),
+                "--query",
+                "opencv contour detection",
+                "--backend",
+                "memory",
+                "--timings",
+            ]
+        )
+
+    assert code == 0
+    timings = json.loads(buf.getvalue())["timings_ms"]
+    assert {"load_registry", "schema_validation", "index", "bm25", "total"} <= set(timings)
+
+
+def test_cli_index_memory_backend_publishes_segments(tmp_path):
+    root = Path(__file__).resolve().parents[1]
+    registry = root / "examples" / "registry" / "tools.json"
+
+    buf = StringIO()
+    with redirect_stdout(buf):
+        code = main(
+            [
+                "index",
+                "--registry",
+                str(registry),
+                "--backend",
+                "memory",
+                "--segment-dir",
+                str(tmp_path),
+            ]
+        )
+
+    assert code == 0
+    assert "Published index segments" in buf.getvalue()
+    assert any((p / "meta.json").exists() for p in tmp_path.iterdir())
+
+
+def test_cli_index_sqlite_backend_then_retrieve(tmp_path, monkeypatch):
+    root = Path(__file__).resolve().parents[1]
+    registry = root / "examples" / "registry" / "tools.json"
+    db = tmp_path / "skillmesh.db"
+
+    buf = StringIO()
+    with redirect_stdout(buf):
+        code = main(
+            ["index", "--registry", str(registry), "--backend", "sqlite", "--sqlite-path", str(db)]
+        )
+    assert code == 0
+    assert db.exists()
+
+    monkeypatch.setenv("SKILLMESH_SQLITE_PATH", str(db))
+    buf = StringIO()
+    with redirect_stdout(buf):
+        code = main(
+            [
+                "retrieve",
+                "--registry",
+                str(registry),
+                "--backend",
+                "sqlite",
+                "--query",
+                "build matplotlib seaborn heatmap",
+                "--top-k",
+                "2",
+            ]
+        )
+    assert code == 0
+    assert json.loads(buf.getvalue())["hits"][0]["id"] == "viz.matplotlib-seaborn"
+
+
+def test_cli_retrieve_fields_projects_hits():
+    registry = Path(__file__).resolve().parents[1] / "examples" / "registry" / "tools.json"
+    argv = ["retrieve", "--registry", str(registry), "--query", "opencv contour detection"]
+
+    buf = StringIO()
+    with redirect_stdout(buf):
+        code = main([*argv, "--backend", "memory", "--fields", "score,sparse_score"])
+
+    assert code == 0
+    hits = json.loads(buf.getvalue())["hits"]
+    assert list(hits[0]) == ["id", "score", "sparse_score"]
+    assert hits[0]["id"] == "cv.opencv-image-processing"
+
+    assert main([*argv, "--backend", "memory", "--fields", "bogus"]) == 2
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+from skill_registry_rag.corpus import FIELD_NAMES, Corpus, compose_doc, tokenize
+from skill_registry_rag.registry import load_registry, registry_fingerprint
+from skill_registry_rag.retriever import SkillRetriever
+
+
+def _load_cards():
+    root = Path(__file__).resolve().parents[1]
+    return load_registry(root / "examples" / "registry" / "tools.yaml")
+
+
+def test_corpus_field_lengths_sum_to_document_tokens():
+    cards = _load_cards()
+    corpus = Corpus(cards)
+
+    assert corpus.fingerprint == registry_fingerprint(cards)
+    assert corpus.field_lengths.shape == (len(cards), len(FIELD_NAMES))
+    doc_lengths = [len(tokenize(compose_doc(c))) for c in cards]
+    assert corpus.field_lengths.sum(axis=1).tolist() == doc_lengths
+    assert corpus.sparse.corpus.doc_lengths().tolist() == doc_lengths
+    assert len(set(corpus.content_hashes)) == len(cards)
+
+
+def test_corpus_is_shared_across_retrievers():
+    cards = _load_cards()
+    corpus = Corpus(cards)
+    first = SkillRetriever(cards, backend="memory", corpus=corpus)
+    second = SkillRetriever(cards, backend="memory", corpus=corpus)
+
+    assert first._backend._bm25 is second._backend._bm25 is corpus.sparse
+    assert first.index_version == corpus.fingerprint
+
+
+def test_corpus_embeddings_are_computed_once():
+    corpus = Corpus(_load_cards())
+    calls = []
+
+    def encode(docs):
+        calls.append(len(docs))
+        return np.ones((len(docs), 4))
+
+    first = corpus.embeddings("fake-model", encode)
+    second = corpus.embeddings("fake-model", encode)
+
+    assert first is second
+    assert calls == [len(corpus)]
+    assert first.dtype == np.float32
+
+
+def test_corpus_persists_segments_under_data_dir_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv("SKILLMESH_SEGMENT_DIR")
+    monkeypatch.setenv("SKILLMESH_DATA_DIR", str(tmp_path))
+    cards = _load_cards()
+    Corpus(cards).sparse
+
+    assert any((tmp_path / "segments").glob("corpus-*"))
+    assert isinstance(Corpus(cards).sparse.post_docs, np.memmap)
+
+
+def test_default_segment_dir_without_data_dir_is_under_home(tmp_path, monkeypatch):
+    from skill_registry_rag.backends.segments import default_segment_dir
+
+    monkeypatch.delenv("SKILLMESH_SEGMENT_DIR")
+    monkeypatch.delenv("SKILLMESH_DATA_DIR", raising=False)
+    monkeypatch.setenv("HOME", str(tmp_path))
+
+    assert default_segment_dir() == tmp_path / ".skillmesh" / "segments"
+
+
+def test_segment_store_prunes_least_recently_used(tmp_path):
+    import os
+
+    from skill_registry_rag.backends.segments import SegmentStore
+
+    array = np.zeros(1024, dtype=np.float64)  # 8 KiB per segment
+    store = SegmentStore(tmp_path, max_bytes=20_000)
+    for age, key in ((30, "old"), (20, "used"), (10, "newer")):
+        store.publish(key, {"a": array}, {})
+        stamp = 1_000_000 - age
+        os.utime(tmp_path / key / "meta.json", (stamp, stamp))
+    store.open("used")  # marks it recently used
+
+    store.publish("latest", {"a": array}, {})
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["latest", "used"]
@@ -6,6 +6,7 @@ import pytest
 
 from skill_registry_rag.mcp_server import (
     build_routed_context,
+    cache_stats_payload,
     install_role_payload,
     list_roles_payload,
     retrieve_cards_payload,
@@ -44,6 +45,103 @@ def test_retrieve_cards_payload_includes_invocation_details():
     assert hit["invocation"]["function"]["name"] == "sklearn_model_selection_cross_validate"
 
 
+def test_retrieve_cards_payload_projects_requested_fields():
+    payload = retrieve_cards_payload(
+        query="sklearn cross validation pipeline",
+        registry=str(_example_registry()),
+        top_k=2,
+        backend="memory",
+        fields=["score"],
+    )
+
+    assert [set(hit) for hit in payload["hits"]] == [{"id", "score"}] * 2
+    assert payload["hits"][0]["id"] == "ml.sklearn-modeling"
+
+    with pytest.raises(ValueError, match="Unknown field"):
+        retrieve_cards_payload(
+            query="sklearn", registry=str(_example_registry()), backend="memory", fields="nope"
+        )
+
+
+def test_retrieve_cards_payload_reports_skipped_stages_under_deadline():
+    payload = retrieve_cards_payload(
+        query="sklearn cross validation pipeline",
+        registry=str(_example_registry()),
+        top_k=1,
+        backend="memory",
+        deadline_ms=10_000,
+    )
+
+    assert payload["skipped_stages"] == []
+    assert payload["hits"][0]["id"] == "ml.sklearn-modeling"
+    context = build_routed_context(
+        query="sklearn cross validation pipeline",
+        registry=str(_example_registry()),
+        backend="memory",
+        deadline_ms=10_000,
+    )
+    assert "skipped stages" not in context
+
+
+def test_deadline_bounds_retriever_construction(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    from skill_registry_rag import mcp_server
+
+    target = tmp_path / "mcp-cold.registry.yaml"
+    install_role_payload(
+        role="DevOps-Engineer", catalog=str(_example_registry()), registry=str(target)
+    )
+    release = threading.Event()
+    build = mcp_server.__build_retriever
+
+    def slow_build(*args):
+        release.wait(5)
+        return build(*args)
+
+    monkeypatch.setattr(mcp_server, "__build_retriever", slow_build)
+    started = time.perf_counter()
+    payload = retrieve_cards_payload(
+        query="release strategy", registry=str(target), backend="memory", deadline_ms=50
+    )
+    context = build_routed_context(
+        query="release strategy", registry=str(target), backend="memory", deadline_ms=50
+    )
+    release.set()
+
+    assert time.perf_counter() - started < 2
+    assert payload["hits"] == [] and payload["skipped_stages"] == ["index"]
+    assert "skillmesh skipped stages: index" in context
+    # The build finished in the background and serves the next request.
+    payload = retrieve_cards_payload(
+        query="release strategy", registry=str(target), backend="memory", deadline_ms=5_000
+    )
+    assert payload["hits"] and payload["skipped_stages"] == []
+
+
+def test_retrieve_cards_payload_reports_stage_timings():
+    payload = retrieve_cards_payload(
+        query="terraform remote state locking plan review",
+        registry=str(_example_registry()),
+        top_k=2,
+        backend="memory",
+        timings=True,
+    )
+
+    timings = payload["timings_ms"]
+    assert {"resolve_registry", "tokenize", "bm25", "fusion", "total"} <= set(timings)
+    assert timings["counters"]["cache_miss"] == 1
+
+    plain = retrieve_cards_payload(
+        query="terraform remote state locking plan review",
+        registry=str(_example_registry()),
+        top_k=2,
+        backend="memory",
+    )
+    assert "timings_ms" not in plain
+
+
 def test_build_routed_context_claude_format():
     context = build_routed_context(
         query="opencv contour detection",
@@ -81,6 +179,40 @@ def test_build_routed_context_rejects_invalid_top_k():
         )
 
 
+def test_build_routed_context_is_served_from_cache_on_repeat():
+    kwargs = {
+        "query": "kubernetes helm chart rollout",
+        "registry": str(_example_registry()),
+        "top_k": 2,
+        "backend": "memory",
+        "provider": "codex",
+    }
+    before = cache_stats_payload(registry=str(_example_registry()), backend="memory")["cache"]
+    first = build_routed_context(**kwargs)
+    second = build_routed_context(**kwargs)
+    after = cache_stats_payload(registry=str(_example_registry()), backend="memory")["cache"]
+
+    assert first == second
+    assert after["hits"] == before["hits"] + 1
+
+
+def test_build_routed_context_respects_max_tokens():
+    kwargs = {
+        "query": "opencv contour detection",
+        "registry": str(_example_registry()),
+        "top_k": 5,
+        "backend": "memory",
+        "provider": "claude",
+    }
+    full = build_routed_context(**kwargs)
+    budgeted = build_routed_context(**kwargs, max_tokens=400)
+
+    assert len(budgeted) < len(full)
+    assert "<id>cv.opencv-image-processing</id>" in budgeted
+    with pytest.raises(ValueError):
+        build_routed_context(**kwargs, max_tokens=0)
+
+
 def test_list_roles_payload_returns_friendly_names():
     payload = list_roles_payload(catalog=str(_example_registry()))
     assert payload["roles"]
@@ -113,3 +245,54 @@ def test_list_roles_payload_installed_only(tmp_path):
     )
     ids = {role["id"] for role in payload["roles"]}
     assert ids == {"role.devops-engineer"}
+
+
+def test_retrieve_cards_payload_reports_dense_status_and_mode(monkeypatch):
+    monkeypatch.setenv("SKILLMESH_DENSE_MODEL", "lsa")
+    payload = retrieve_cards_payload(
+        query="opencv contour detection",
+        registry=str(_example_registry()),
+        top_k=2,
+        backend="memory",
+        dense=True,
+    )
+
+    assert payload["dense_status"] in {"loading", "ready"}
+    expected_mode = "hybrid" if payload["dense_status"] == "ready" else "sparse"
+    assert payload["retrieval_mode"] == expected_mode
+    assert payload["hits"][0]["id"] == "cv.opencv-image-processing"
+
+
+def test_retrieve_cards_payload_mode_ignores_pinned_exact_hit():
+    payload = retrieve_cards_payload(
+        query="viz.matplotlib-seaborn",
+        registry=str(_example_registry()),
+        top_k=2,
+        backend="memory",
+        dense=False,
+    )
+
+    assert payload["retrieval_mode"] == "sparse"
+    assert payload["hits"][0]["id"] == "viz.matplotlib-seaborn"
+    assert payload["hits"][0]["sparse_score"] is None
+
+
+def test_registry_edit_updates_cached_retriever_in_place(tmp_path):
+    from skill_registry_rag import mcp_server
+
+    target = tmp_path / "mcp-incremental.registry.yaml"
+    install_role_payload(
+        role="DevOps-Engineer", catalog=str(_example_registry()), registry=str(target)
+    )
+    retrieve_cards_payload(query="release strategy", registry=str(target), backend="memory")
+    retriever = mcp_server._retrievers[(target.resolve(), "memory", False)].retriever
+
+    install_role_payload(
+        role="Data-Analyst", catalog=str(_example_registry()), registry=str(target)
+    )
+    payload = retrieve_cards_payload(
+        query="data analyst role", registry=str(target), top_k=3, backend="memory"
+    )
+
+    assert "role.data-analyst" in {hit["id"] for hit in payload["hits"]}
+    assert mcp_server._retrievers[(target.resolve(), "memory", False)].retriever is retriever
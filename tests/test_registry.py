@@ -6,7 +6,12 @@ from pathlib import Path
 import pytest
 import yaml
 
-from skill_registry_rag.registry import RegistryError, load_registry
+from skill_registry_rag.registry import (
+    RegistryError,
+    RegistryLoader,
+    load_registry,
+    registry_fingerprint,
+)
 
 
 def test_load_registry_examples():
@@ -134,3 +139,40 @@ def test_schema_validation_rejects_invalid_registry(tmp_path):
 
     with pytest.raises(RegistryError):
         load_registry(bad, schema_path=Path(__file__).resolve().parents[1] / "examples" / "registry" / "schema.json")
+
+
+def _write_registry(path: Path, rows: list[dict]) -> None:
+    path.write_text(json.dumps({"tools": rows}), encoding="utf-8")
+
+
+def test_registry_loader_rebuilds_only_changed_entries(tmp_path):
+    (tmp_path / "a.md").write_text("alpha instructions", encoding="utf-8")
+    (tmp_path / "b.md").write_text("beta instructions", encoding="utf-8")
+    rows = [
+        {"id": "a", "title": "Alpha", "domain": "test", "instruction_file": "a.md"},
+        {"id": "b", "title": "Beta", "domain": "test", "instruction_file": "b.md"},
+        {"id": "c", "title": "Gamma", "domain": "test", "instruction_file": "a.md"},
+    ]
+    registry = tmp_path / "registry.json"
+    _write_registry(registry, rows)
+
+    loader = RegistryLoader(registry)
+    first = loader.load()
+    assert first.added == ["a", "b", "c"] and not first.changed and not first.removed
+    a_card, b_card = loader.cards[0], loader.cards[1]
+
+    rows[1]["title"] = "Beta v2"
+    del rows[2]
+    rows.append({"id": "d", "title": "Delta", "domain": "test", "instruction_file": "b.md"})
+    _write_registry(registry, rows)
+    diff = loader.load()
+    assert (diff.added, diff.changed, diff.removed) == (["d"], ["b"], ["c"])
+    assert loader.cards[0] is a_card and loader.cards[1] is not b_card
+    assert loader.fingerprint == registry_fingerprint(load_registry(registry))
+
+    # An instruction edit changes only the cards that use that file.
+    (tmp_path / "a.md").write_text("alpha instructions, revised", encoding="utf-8")
+    diff = loader.load()
+    assert (diff.added, diff.changed, diff.removed) == ([], ["a"], [])
+    assert loader.cards[0].instruction_text == "alpha instructions, revised"
+    assert not loader.load()
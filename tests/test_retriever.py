@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from pathlib import Path
 
+import pytest
+
 import skill_registry_rag.backends.chroma as chroma_backend
 from skill_registry_rag.registry import load_registry
 from skill_registry_rag.retriever import SkillRetriever
@@ -157,7 +159,7 @@ def test_retriever_passes_dense_and_hybrid_defaults_to_chroma(monkeypatch):
         def __init__(self, *args, **kwargs):
             captured.update(kwargs)
 
-        def index(self, cards):
+        def index(self, cards, *, corpus=None):  # noqa: ANN001
             return None
 
         def query(self, text, top_k=3):
@@ -191,3 +193,168 @@ def test_retriever_dense_mode_e2e():
     assert len(hits) > 0
     assert hasattr(hits[0], "score")
     assert hasattr(hits[0], "dense_score")
+
+
+def test_retriever_caches_repeated_normalized_queries():
+    cards = _load_json_cards()
+    retriever = SkillRetriever(cards, use_dense=False, backend="memory")
+    first = retriever.retrieve("opencv contour edge threshold cv2", top_k=2)
+    second = retriever.retrieve("OpenCV  contour, edge threshold CV2", top_k=2)
+
+    assert [h.card.id for h in first] == [h.card.id for h in second]
+    stats = retriever.cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["index_version"] == retriever.index_version
+
+
+def test_retriever_cache_can_be_disabled():
+    cards = _load_json_cards()
+    retriever = SkillRetriever(cards, use_dense=False, backend="memory", cache_size=0)
+    assert retriever.retrieve("opencv contour edge threshold cv2", top_k=1)
+    assert retriever.cache_stats() == {"enabled": False}
+
+
+def test_retriever_store_projects_hits_and_follows_upserts():
+    from dataclasses import replace
+
+    cards = _load_cards()
+    retriever = SkillRetriever(cards, backend="memory")
+    hits = retriever.retrieve("build matplotlib seaborn heatmap", top_k=2)
+    full = retriever.store.project(hits)
+    assert full[0]["invocation"] == hits[0].card.invocation
+    assert full[0]["score"] == hits[0].score
+    assert retriever.store.project(hits, ("id", "score")) == [
+        {"id": h.card.id, "score": h.score} for h in hits
+    ]
+
+    renamed = replace(hits[0].card, title="Renamed heatmap card")
+    retriever.upsert([renamed])
+    (hit,) = retriever.retrieve("build matplotlib seaborn heatmap", top_k=1)
+    assert retriever.store.project([hit], ("id", "title")) == [
+        {"id": renamed.id, "title": "Renamed heatmap card"}
+    ]
+    assert len(retriever.store) == len(cards)
+
+
+@pytest.mark.parametrize("fast_encoder", [True, False])
+def test_retriever_store_splices_serialized_hits(monkeypatch, fast_encoder):
+    import json
+    from dataclasses import replace
+
+    from skill_registry_rag import cardstore
+    from skill_registry_rag.cardstore import dumps, parse_fields
+
+    if not fast_encoder:
+        monkeypatch.setattr(cardstore, "orjson", None)
+    cards = _load_cards()
+    retriever = SkillRetriever(cards, backend="memory")
+    hits = retriever.retrieve("build matplotlib seaborn heatmap", top_k=3)
+    hits.append(replace(hits[0], card=replace(hits[0].card, title="Café"), dense_score=0.5))
+
+    for fields in (parse_fields(None), parse_fields("score,metadata")):
+        expected = {"query": "heatmap", "hits": retriever.store.project(hits, fields), "n": [1]}
+        for pretty in (False, True):
+            spliced = retriever.store.dumps_hits(hits, fields, pretty=pretty)
+            text = dumps({"query": "heatmap", "hits": spliced, "n": [1]}, pretty=pretty)
+            assert json.loads(text) == expected
+            if not fast_encoder:
+                indent = {"indent": 2} if pretty else {"separators": (",", ":")}
+                assert text == json.dumps(expected, **indent)
+
+
+def test_retriever_pins_exact_id_alias_and_name_matches(monkeypatch):
+    from dataclasses import replace
+
+    cards = _load_cards()
+    retriever = SkillRetriever(cards, backend="memory")
+
+    def no_scoring(*_args, **_kwargs):
+        raise AssertionError("exact top-1 lookups must not score")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(retriever._backend, "query", no_scoring)
+        for name in ("viz.matplotlib-seaborn", "Charting", "Viz Matplotlib Seaborn"):
+            (hit,) = retriever.retrieve(name, top_k=1)
+            assert (hit.card.id, hit.mode) == ("viz.matplotlib-seaborn", "exact")
+
+    hits = retriever.retrieve("data-viz", top_k=3)
+    assert hits[0].card.id == "viz.matplotlib-seaborn" and hits[0].mode == "exact"
+    assert len(hits) == 3 and len({h.card.id for h in hits}) == 3
+
+    retriever.upsert([replace(cards[0], aliases=["heatmap-maker"])])
+    assert retriever.retrieve("heatmap maker", top_k=1)[0].mode == "exact"
+    assert retriever.retrieve("charting", top_k=1)[0].mode != "exact"
+    retriever.remove([cards[0].id])
+    assert all(h.card.id != cards[0].id for h in retriever.retrieve("heatmap-maker", top_k=3))
+
+    plain = SkillRetriever(cards, backend="memory", exact_match=False)
+    assert plain.retrieve("viz.matplotlib-seaborn", top_k=1)[0].mode != "exact"
+
+
+def test_deadline_run_queues_while_workers_are_busy(monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from skill_registry_rag import deadline
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(deadline, "_executor", pool)
+    release = threading.Event()
+    with deadline.budget(100) as first:
+        assert deadline.run(release.wait, 5, stage="search") == (False, None)
+    # The first call still holds the only worker: the next one waits in the
+    # queue and is cancelled, never run, when its own budget runs out there.
+    ran: list[int] = []
+    with deadline.budget(100) as second:
+        assert deadline.run(ran.append, 1, stage="search") == (False, None)
+    assert first.skipped == second.skipped == ["search"]
+
+    # A call with budget to spare is answered once the worker frees up.
+    result: list[tuple[bool, object]] = []
+
+    def queued() -> None:
+        with deadline.budget(5_000):
+            result.append(deadline.run(lambda: "done", stage="search"))
+
+    thread = threading.Thread(target=queued)
+    thread.start()
+    release.set()
+    thread.join(5)
+    assert result == [(True, "done")] and ran == []
+    pool.shutdown()
+
+
+def test_retriever_deadline_falls_back_to_last_full_answer(monkeypatch):
+    import threading
+    import time
+
+    from skill_registry_rag import deadline
+
+    retriever = SkillRetriever(_load_cards(), backend="memory", cache_ttl=None)
+    query = "build matplotlib seaborn heatmap"
+    full = retriever.retrieve(query, top_k=2, deadline_ms=10_000)
+    retriever.cache.clear()  # as if the entry had expired
+
+    release = threading.Event()
+    original = retriever._backend.query
+
+    def slow_query(*args, **kwargs):
+        release.wait(5)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(retriever._backend, "query", slow_query)
+    started = time.perf_counter()
+    with deadline.budget(50) as budget:
+        degraded = retriever.retrieve(query, top_k=2)
+        empty = retriever.retrieve("unseen query about terraform", top_k=2)
+    release.set()
+
+    assert time.perf_counter() - started < 2
+    assert budget.skipped == ["search"]
+    assert [h.card.id for h in degraded] == [h.card.id for h in full]
+    assert empty == []
+    # Degraded answers are not cached.
+    assert len(retriever.cache) == 0
+    with pytest.raises(ValueError, match="deadline_ms"):
+        retriever.retrieve(query, deadline_ms=0)
@@ -8,7 +8,12 @@ from pathlib import Path
 import pytest
 
 from skill_registry_rag.cli import main
-from skill_registry_rag.roles import install_role_bundle, list_role_offers
+from skill_registry_rag.roles import (
+    RoleCatalogError,
+    install_role_bundle,
+    list_role_offers,
+    resolve_role_selector,
+)
 from skill_registry_rag.registry import load_registry
 
 
@@ -30,6 +35,22 @@ def test_list_role_offers_includes_roles_and_dependency_counts():
     assert by_id["role.aws-engineer"]["dependency_count"] >= 18
 
 
+def test_resolve_role_selector_uses_the_offers_name_index(monkeypatch):
+    import skill_registry_rag.roles as roles
+
+    offers = list_role_offers(catalog_registry=str(_catalog_path()))
+    # The index is built once, with the offers; selectors are dict lookups.
+    monkeypatch.setattr(roles, "_offer_index", None)
+    assert resolve_role_selector("Data-Engineer", offers) == "role.data-engineer"
+    assert resolve_role_selector("role.aws-engineer", offers) == "role.aws-engineer"
+    with pytest.raises(RoleCatalogError, match="Unknown role selector"):
+        resolve_role_selector("no-such-role", offers)
+    monkeypatch.undo()
+    # A filtered copy is a plain list and is indexed on the fly.
+    plain = [offer for offer in offers if offer["id"] == "role.data-engineer"]
+    assert resolve_role_selector("data engineer", plain) == "role.data-engineer"
+
+
 def test_install_role_bundle_creates_registry_with_role_and_dependencies(tmp_path):
     target = tmp_path / "installed.registry.yaml"
     result = install_role_bundle(
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from skill_registry_rag import timing
+
+
+def test_stage_is_noop_without_collector_or_metrics():
+    timing.enable_metrics(False)
+    assert timing.current() is None
+    with timing.stage("bm25") as ctx:
+        pass
+    assert ctx is None
+
+
+def test_collect_records_stages_and_counters():
+    with timing.collect() as recorder:
+        with timing.stage("bm25"):
+            pass
+        with timing.stage("bm25"):
+            pass
+        timing.count("cache_miss")
+
+    out = recorder.as_dict()
+    assert out["bm25"] >= 0
+    assert out["total"] >= out["bm25"]
+    assert out["counters"] == {"cache_miss": 1}
+    assert timing.current() is None
+
+
+def test_prometheus_text_exports_stage_sums_and_counts():
+    metrics = timing.StageMetrics()
+    metrics.observe("bm25", 2.0)
+    metrics.observe("bm25", 4.0)
+    metrics.count("cache_hit", 3)
+
+    text = metrics.prometheus_text()
+    assert 'skillmesh_stage_seconds_sum{stage="bm25"} 0.006000' in text
+    assert 'skillmesh_stage_seconds_count{stage="bm25"} 2' in text
+    assert 'skillmesh_stage_seconds_max{stage="bm25"} 0.004000' in text
+    assert 'skillmesh_events_total{event="cache_hit"} 3' in text